@@ -1,12 +1,18 @@
 from snap import *
-import random
-import time
+from instrumentation import PhaseRecorder
+from null_model import NULL_MODEL_SEED, ShuffleSynsetConnections
+from wordnet_snapshot import GetSnapshotKey, GetSnapshotDirectory, LoadSnapshot, LoadSnapshotGraph, SaveSnapshot, SaveSnapshotGraph
+from wordnet_csr import BuildCSRGraph, GetInducedSubgraph, GetSubgraphKey, GetSubgraphMasks, UpdateCSRGraph
+from wordnet_parser import IterSynsets, IterSynsetsParallel, ParseSynsetLine, Pointer, Synset
+import json
+import numpy as np
+import os
 
 '''
 This class encapsulates all of the information needed to create, maintain, and analyze an instance of a WordNet graph.
 More specifically, this class contains the following instance variables:
 	1.  parts_of_speech = A container of all included parts of speech in this graph.
-	2.  synsets = A map from keys to synsets
+	2.  synsets = A map from keys to synsets (Synset records, see wordnet_parser.py)
 	3.  graph = A TNEANet graph which holds the populated structure of the WordNet
 	4.  node_to_word = A map from node_ids to words
 	5.  word_to_node = A map from words to node_ids
@@ -23,7 +29,30 @@ More specifically, this class contains the following instance variables:
 	                                   WordNet with time relations between words included and supernodes excluded
     15. node_to_word_directed_no_supernodes = A map from node_ids to words in the directed graph
     16  word_to_node_directed_no_supernodes = A map from wrods to node_ids in the directed graph
-
+    17. word_to_pos = A map from words with time data to the set of their parts of speech in the time data
+    18. csr_graphs = A map from graph names to the compact CSR versions of those graphs (built on demand)
+    19. snapshot_directory = The snapshot directory the WordNet is cached in (None without a cache_dir)
+    20. node_arrays = A map from (kind, graph name) to the dense per-node arrays of GetNodeYears,
+                      GetNodeDecades and GetNodePartsOfSpeech (built on demand)
+    21. word_and_pos_ids = A map from every (word, synset type) pair in the synsets to its interned id,
+                           which the synsets list in their word_ids
+    22. word_and_pos_years = An int16 array with the year (see word_and_pos_to_date) of every interned
+                             id, NO_YEAR if the pair has no time data
+    23. word_and_pos_has_time_data = A bool array telling whether every interned id has time data
+    24. phase_report = A list with the wall time and (optionally) peak RSS and object counts of every
+                       phase of building this instance (see instrumentation.PhaseRecorder), in the
+                       order in which they finished; lazily built graphs add their phases when built
+    25. phase_log = The file the phases are logged to as JSON lines (None to not log them)
+    26. subgraphs = A map from filter keys to the CSR subgraphs of GetSubgraph (built on demand)
+    27. dirty_nodes = A map from graph names to bool arrays (indexed like the CSR graphs) marking the
+                      nodes whose edges or years changed in ApplyTimeDataDiff or ApplySynsetDiff
+                      since their per-node metrics were last recomputed (see GetDirtyNodes)
+    28. is_null_model = Whether the synset connections were shuffled into a null model
+    29. null_model_seed = The seed of the null model (see null_model.py)
+
+The three graph variants (3, 8, 14) and their node/word maps are built on first access (see
+GRAPH_ATTRIBUTES), unless they are requested up front with the graphs argument. The instrumentation
+(24, 25) describes this process only and is not part of snapshots (see TRANSIENT_ATTRIBUTES).
 '''
 class WordNet:
 
@@ -43,32 +72,175 @@ class WordNet:
 		"s": "s"
 	}
 
+	GRAPH_NAMES = ["graph", "time_directed_graph", "time_directed_graph_no_supernodes"]
+
+	# Year (and decade) of super-nodes and of words without time data in the GetNodeYears arrays.
+	NO_YEAR = -1
+
+	# Bit of each time data part of speech in the GetNodePartsOfSpeech arrays.
+	PARTS_OF_SPEECH_CODES = {
+		"n": 1,
+		"v": 2,
+		"adj": 4,
+		"adv": 8,
+		"s": 16
+	}
+
+	# The instance variables created when each graph variant is built.
+	GRAPH_ATTRIBUTES = {
+		"graph": ["graph", "node_to_word", "word_to_node"],
+		"time_directed_graph": ["time_directed_graph", "node_to_word_directed", "word_to_node_directed"],
+		"time_directed_graph_no_supernodes": ["time_directed_graph_no_supernodes", "node_to_word_directed_no_supernodes",
+		                                      "word_to_node_directed_no_supernodes"]
+	}
+
+	# Instance variables describing how this instance was built, which snapshots leave out.
+	TRANSIENT_ATTRIBUTES = ["phase_recorder", "phase_report", "phase_log", "logged_phases"]
+
 	'''
 	Initialzes a WordNet.
 	Args:
 		filenames = list of data.* filenames which contain WordNet data.
 		parts_of_speech = list of the parts of speech this WordNet should include.
 		time_data_file = file containing information about word 'creation' dates
+		is_null_model = whether to randomly shuffle the synset connections.
+		cache_dir = optional directory holding snapshots of previously built WordNets. If a snapshot
+		            for the same input files exists it is loaded instead of rebuilding everything,
+		            otherwise the freshly built WordNet is saved there.
+		processes = number of worker processes used to parse the data.* files (one file per worker,
+		            all cores if None). With 1 the files are parsed one after another in this process.
+		graphs = names of the graph variants (see GRAPH_NAMES) to build right away; all of them if
+		         None. Any other variant is still built (or loaded from the snapshot) on first access.
+		null_model_seed = seed of the null model if |is_null_model| (anything np.random.RandomState
+		                  accepts, e.g. null_model.GetModelSeed(seed, index) for ensemble members).
+		count_objects = whether phase_report also counts the objects tracked by the garbage collector
+		                after every phase (which scans the whole heap each time).
+		phase_log = optional file (e.g. sys.stderr) to write phase_report to as a JSON line once the
+		            WordNet is initialized, and another line for every graph variant built later.
+		measure_memory = whether phase_report also records the memory of every phase, which resets
+		                 the peak RSS of the whole process at every phase boundary (see
+		                 instrumentation.py); always done with a |phase_log|. Otherwise only the wall
+		                 time is recorded and the peak RSS is left alone.
 	'''
-	def __init__(self, filenames, time_data_file, is_null_model = False):
-		self.parts_of_speech = self.__GetPartsOfSpeech(filenames)
-		self.word_and_pos_to_date, self.word_to_date = self.__ReadTimeData(time_data_file)
-		self.synsets, self.synsets_directed = self.__ReadSynsets(filenames)
-		self.synsets_directed = self.__CreateDirectedSynsets(self.synsets_directed)
+	def __init__(self, filenames, time_data_file, is_null_model = False, cache_dir = None, processes = 1, graphs = None,
+	             null_model_seed = NULL_MODEL_SEED, count_objects = False, phase_log = None, measure_memory = False):
+		if graphs is None: graphs = WordNet.GRAPH_NAMES
+		self.phase_recorder = PhaseRecorder(count_objects, measure_memory or phase_log is not None)
+		self.phase_report = self.phase_recorder.phases
+		# Graphs built during initialization are logged together with the rest of it below.
+		self.phase_log = None
+		self.logged_phases = 0
+		measure = self.phase_recorder.Measure
+		self.is_null_model = is_null_model
+		self.null_model_seed = null_model_seed
+
+		if cache_dir is not None:
+			snapshot_directory = GetSnapshotDirectory(cache_dir, GetSnapshotKey(filenames, time_data_file, is_null_model,
+			                                                                  null_model_seed))
+			with measure("LoadSnapshot"):
+				loaded = LoadSnapshot(self, snapshot_directory)
+			if loaded:
+				self.snapshot_directory = snapshot_directory
+				for name in graphs: self.BuildGraph(name)
+				self.__LogPhases(phase_log, "init", filenames, is_null_model)
+				return
+
+		self.snapshot_directory = None
+		self.csr_graphs = {}
+		self.node_arrays = {}
+		self.subgraphs = {}
+		self.dirty_nodes = {}
+		with measure("GetPartsOfSpeech"):
+			self.parts_of_speech = self.__GetPartsOfSpeech(filenames)
+		with measure("ReadTimeData"):
+			self.word_and_pos_to_date, self.word_to_date = self.__ReadTimeData(time_data_file)
+		with measure("ReadSynsets"):
+			self.synsets, self.synsets_directed = self.__ReadSynsets(filenames, processes)
+		with measure("CreateDirectedSynsets"):
+			self.synsets_directed = self.__CreateDirectedSynsets(self.synsets_directed)
 
 		if is_null_model:
-			self.synsets = self.__ShuffleSynsetConnections(self.synsets)
-			self.synsets_directed = self.__ShuffleSynsetConnections(self.synsets_directed)
+			with measure("ShuffleSynsetConnections"):
+				self.synsets = self.__ShuffleSynsetConnections(self.synsets, null_model_seed)
+				self.synsets_directed = self.__ShuffleSynsetConnections(self.synsets_directed, null_model_seed)
+
+		with measure("IndexWords"):
+			self.all_words = set()
+			for synset in self.synsets.values():
+				self.all_words.update(synset["words"])
+			self.all_words_directed = set()
+			for synset in self.synsets_directed.values():
+				self.all_words_directed.update(synset["words"])
+			self.supernodes_in_directed_graph = set(self.synsets_directed.keys())
+
+			self.word_to_synsets = {word : [] for word in self.all_words}
+			for key, synset in self.synsets.items():
+				for word in synset["words"]:
+					self.word_to_synsets[word].append(key)
+
+		if cache_dir is not None:
+			with measure("SaveSnapshot"):
+				SaveSnapshot(self, snapshot_directory)
+			self.snapshot_directory = snapshot_directory
+
+		for name in graphs: self.BuildGraph(name)
+		self.__LogPhases(phase_log, "init", filenames, is_null_model)
 
-		self.graph = self.__CreateGraph(self.synsets, self.parts_of_speech)
-		self.time_directed_graph = self.__CreateTimeDirectedGraph(self.synsets_directed, self.parts_of_speech)
-		self.time_directed_graph_no_supernodes = self.__CreateTimeDirectedGraphNoSuperNodes(self.synsets_directed, self.parts_of_speech)
+	'''
+	Writes the phases recorded since the last call to |phase_log| as one JSON line tagged with
+	|event|, and makes |phase_log| the log for the phases of graphs built from now on.
+	'''
+	def __LogPhases(self, phase_log, event, filenames=None, is_null_model=None):
+		self.phase_log = phase_log
+		if phase_log is None: return
+		extra = {"event": event, "snapshot_directory": self.snapshot_directory}
+		if filenames is not None: extra["files"] = [os.path.basename(filename) for filename in filenames]
+		if is_null_model is not None: extra["is_null_model"] = bool(is_null_model)
+		phase_log.write(self.phase_recorder.ToJSON(self.logged_phases, **extra) + "\n")
+		phase_log.flush()
+		self.logged_phases = len(self.phase_report)
 
+	'''
+	Builds the graph variants on first access of any of their instance variables.
+	'''
+	def __getattr__(self, name):
+		for graph_name, attributes in WordNet.GRAPH_ATTRIBUTES.items():
+			if name in attributes:
+				self.BuildGraph(graph_name)
+				return self.__dict__[name]
+		raise AttributeError(name)
 
-		self.word_to_synsets = {word : [] for word in self.all_words}
-		for key, synset in self.synsets.items():
-			for word in synset["words"]:
-				self.word_to_synsets[word].append(key)
+	'''
+	Makes sure the graph variant with the given name (see GRAPH_NAMES) and its node/word maps exist,
+	loading them from the snapshot if it holds them and building them otherwise (adding them to the
+	snapshot afterwards).
+	'''
+	def BuildGraph(self, name):
+		if name in self.__dict__: return
+		if name not in WordNet.GRAPH_NAMES: raise ValueError("Unknown graph: {0}".format(name))
+		measure = self.phase_recorder.Measure
+		snapshot_directory = self.__dict__.get("snapshot_directory")
+		if snapshot_directory is not None:
+			with measure("LoadSnapshotGraph/" + name):
+				loaded = LoadSnapshotGraph(self, snapshot_directory, name)
+			if loaded:
+				self.__LogPhases(self.phase_log, "build_graph")
+				return
+
+		if name == "graph":
+			with measure("CreateGraph"):
+				self.graph = self.__CreateGraph(self.synsets, self.parts_of_speech)
+		elif name == "time_directed_graph":
+			with measure("CreateTimeDirectedGraph"):
+				self.time_directed_graph = self.__CreateTimeDirectedGraph(self.synsets_directed, self.parts_of_speech)
+		elif name == "time_directed_graph_no_supernodes":
+			with measure("CreateTimeDirectedGraphNoSuperNodes"):
+				self.time_directed_graph_no_supernodes = self.__CreateTimeDirectedGraphNoSuperNodes(self.synsets_directed, self.parts_of_speech)
+
+		if snapshot_directory is not None:
+			with measure("SaveSnapshotGraph/" + name):
+				SaveSnapshotGraph(self, snapshot_directory, name)
+		self.__LogPhases(self.phase_log, "build_graph")
 
 	'''
 	Returns the pointer symbol along the directed edge (node1 -> node2)
@@ -76,20 +248,271 @@ class WordNet:
 	def GetSymbolOnEdge(self, node1, node2):
 		return self.graph.GetStrAttrDatE(self.graph.GetEI(node1, node2), "symbol")
 
+	'''
+	Returns the compact CSR version (see wordnet_csr.py) of the graph variant with the given name
+	("graph", "time_directed_graph" or "time_directed_graph_no_supernodes"). It is built directly
+	from the synsets on first use and cached afterwards.
+	'''
+	def GetCSRGraph(self, name="time_directed_graph_no_supernodes"):
+		if name not in self.csr_graphs:
+			self.csr_graphs[name] = BuildCSRGraph(self, name)
+		return self.csr_graphs[name]
+
+
+	'''
+	Returns an int16 array with the year (see word_to_date) of every node of the given graph variant,
+	indexed like GetCSRGraph(name), which for the no-supernodes graph is by node id. Super-nodes and
+	words without time data get NO_YEAR.
+	'''
+	def GetNodeYears(self, name="time_directed_graph_no_supernodes"):
+		if ("years", name) not in self.node_arrays:
+			csr = self.GetCSRGraph(name)
+			years = np.full(csr.GetNodes(), WordNet.NO_YEAR, dtype=np.int16)
+			for index in csr.GetWordIndices():
+				years[index] = self.word_to_date.get(csr.node_to_word[csr.node_ids[index]], WordNet.NO_YEAR)
+			self.node_arrays[("years", name)] = years
+		return self.node_arrays[("years", name)]
+
+	'''
+	Returns an int16 array with the decade of every node of the given graph variant, indexed like
+	GetNodeYears (NO_YEAR where the year is unknown).
+	'''
+	def GetNodeDecades(self, name="time_directed_graph_no_supernodes"):
+		if ("decades", name) not in self.node_arrays:
+			years = self.GetNodeYears(name)
+			self.node_arrays[("decades", name)] = np.where(years != WordNet.NO_YEAR, years - years % 10, WordNet.NO_YEAR).astype(np.int16)
+		return self.node_arrays[("decades", name)]
+
+	'''
+	Returns a uint8 array with the parts of speech (see word_to_pos) of every node of the given graph
+	variant, indexed like GetNodeYears. Each part of speech sets its bit from PARTS_OF_SPEECH_CODES;
+	super-nodes and words without time data are 0.
+	'''
+	def GetNodePartsOfSpeech(self, name="time_directed_graph_no_supernodes"):
+		if ("parts_of_speech", name) not in self.node_arrays:
+			csr = self.GetCSRGraph(name)
+			codes = np.zeros(csr.GetNodes(), dtype=np.uint8)
+			for index in csr.GetWordIndices():
+				for pos in self.word_to_pos.get(csr.node_to_word[csr.node_ids[index]], ()):
+					codes[index] |= WordNet.PARTS_OF_SPEECH_CODES[pos]
+			self.node_arrays[("parts_of_speech", name)] = codes
+		return self.node_arrays[("parts_of_speech", name)]
+
+	'''
+	Returns the subgraph of the graph variant |name| induced by the nodes which pass the given filters,
+	as a CSR graph (see wordnet_csr.GetInducedSubgraph) whose node_ids are a subset of those of
+	GetCSRGraph(name); the per-node arrays of the full graph map onto it through
+	GetCSRGraph(name).GetIndices(subgraph.node_ids).
+		first_year, last_year = the inclusive range of years of the kept words; words without time
+		                        data are dropped if either is set
+		parts_of_speech = the parts of speech (keys of PARTS_OF_SPEECH_CODES) of which a kept word
+		                  must have at least one
+		symbols = the pointer symbols (see wordnet_csr.EDGE_SYMBOLS) of the kept edges
+		include_supernodes = whether to keep the super-nodes (which the other node filters ignore)
+	The filters are applied as vectorized masks over the arrays of the full graph, and the subgraphs
+	are cached by filter, so every metric asking for the same filter shares one subgraph.
+	'''
+	def GetSubgraph(self, name="time_directed_graph_no_supernodes", first_year=None, last_year=None, parts_of_speech=None,
+	                symbols=None, include_supernodes=True):
+		key = GetSubgraphKey(name, first_year, last_year, parts_of_speech, symbols, include_supernodes)
+		if key not in self.subgraphs:
+			csr = self.GetCSRGraph(name)
+			codes = None if parts_of_speech is None else sum(WordNet.PARTS_OF_SPEECH_CODES[pos] for pos in set(parts_of_speech))
+			node_mask, edge_mask = GetSubgraphMasks(csr, self.GetNodeYears(name), self.GetNodePartsOfSpeech(name), first_year,
+			                                        last_year, codes, symbols, include_supernodes)
+			self.subgraphs[key] = GetInducedSubgraph(csr, node_mask, edge_mask)
+		return self.subgraphs[key]
+
+	'''
+	Returns a sorted int16 array with the year of every word with time data (the values of
+	word_to_date), whether or not the word is a node of the graphs.
+	'''
+	def GetTimeDataYears(self):
+		if ("time_data_years", None) not in self.node_arrays:
+			self.node_arrays[("time_data_years", None)] = np.sort(np.array(self.word_to_date.values(), dtype=np.int16))
+		return self.node_arrays[("time_data_years", None)]
+
+	'''
+	Adds the given lines of time data (in the format of the time data file) to this WordNet, as if
+	they had been appended to the time data file it was built from: every word keeps the earliest of
+	its years. Words which gain time data join the directed synsets, and only the edges of the time
+	directed graphs touching words whose year changed are generated again (see UpdateCSRGraph); the
+	nodes whose edges changed are marked in dirty_nodes. Raises ValueError for null models, whose
+	shuffled connections cannot be updated in place.
+	'''
+	def ApplyTimeDataDiff(self, lines):
+		self.__CheckNotNullModel()
+		changed_keys = set()
+		words = set()
+		for line in lines:
+			word = line.split(' <delim> ')[0]
+			year = self.word_to_date.get(word)
+			changed_keys.update(self.__AddTimeData(line, self.word_and_pos_to_date, self.word_to_date))
+			if self.word_to_date.get(word) != year: words.add(word)
+
+		# The interned (word, synset type) pairs of the changed keys (synset types are one character)
+		changed_pairs = [(key[:-1], key[-1]) for key in changed_keys if (key[:-1], key[-1]) in self.word_and_pos_ids]
+		word_ids = np.array([self.word_and_pos_ids[pair] for pair in changed_pairs], dtype=np.int64)
+		gained = (~self.word_and_pos_has_time_data[word_ids]).tolist()
+		self.word_and_pos_years[word_ids] = [self.word_and_pos_to_date[word + pos] for word, pos in changed_pairs]
+		self.word_and_pos_has_time_data[word_ids] = True
+		words.update(word for word, pos in changed_pairs)
+
+		# The synsets holding a pair which gained time data have new words in the directed graphs
+		keys = set()
+		for (word, pos), word_id, has_gained in zip(changed_pairs, word_ids.tolist(), gained):
+			if not has_gained: continue
+			keys.update(key for key in self.word_to_synsets.get(word, ()) if word_id in self.synsets[key]["word_ids"])
+
+		pointing_keys = self.__GetPointingKeys()
+		self.__UpdateDirectedSynsets(keys, words, pointing_keys)
+		self.__UpdateGraphs(["time_directed_graph", "time_directed_graph_no_supernodes"], words, keys, pointing_keys)
+
+	'''
+	Applies the given synset lines (in the format of the data.* files) to this WordNet: every line
+	replaces the synset with the same key, or adds a new synset. Only the edges of the graph
+	variants touching the words and super-nodes of the changed synsets are generated again (see
+	UpdateCSRGraph); the nodes whose edges changed are marked in dirty_nodes. Raises ValueError for
+	null models.
+	'''
+	def ApplySynsetDiff(self, lines):
+		self.__CheckNotNullModel()
+		years = self.word_and_pos_years.tolist()
+		words = set()
+		keys = set()
+		for line in lines:
+			key, synset = ParseSynsetLine(line, WordNet.PARTS_OF_SPEECH_OFFSET)
+			synset.word_ids = self.__InternWords(synset, years)
+			if key in self.synsets:
+				for word in self.synsets[key]["words"]:
+					self.word_to_synsets[word] = [other for other in self.word_to_synsets[word] if other != key]
+					words.add(word)
+			self.synsets[key] = synset
+			for word in synset["words"]:
+				self.word_to_synsets.setdefault(word, []).append(key)
+				words.add(word)
+			keys.add(key)
+
+		self.word_and_pos_years = np.array(years, dtype=np.int16)
+		self.word_and_pos_has_time_data = self.word_and_pos_years != WordNet.NO_YEAR
+		for word in words:
+			if len(self.word_to_synsets[word]) > 0:
+				self.all_words.add(word)
+			else:
+				del self.word_to_synsets[word]
+				self.all_words.discard(word)
+
+		pointing_keys = self.__GetPointingKeys()
+		self.__UpdateDirectedSynsets(keys, words, pointing_keys)
+		self.__UpdateGraphs(WordNet.GRAPH_NAMES, words, keys, pointing_keys)
+
+	'''
+	Returns the ids of the nodes of the graph variant |name| whose per-node metrics are stale after
+	ApplyTimeDataDiff or ApplySynsetDiff: the nodes whose edges or year changed and, for metrics
+	looking up to |depth| steps ahead along the out-edges (such as branching factors), every node
+	with a path of at most |depth| edges to one of them. Only the CSR graphs built before an update
+	track their dirty nodes.
+	'''
+	def GetDirtyNodes(self, name="time_directed_graph_no_supernodes", depth=0):
+		csr = self.GetCSRGraph(name)
+		if name not in self.dirty_nodes: return np.zeros(0, dtype=np.int64)
+		dirty = self.dirty_nodes[name].copy()
+		sources = csr.GetSources()
+		for step in range(depth):
+			dirty[sources[dirty[csr.targets]]] = True
+		return csr.node_ids[dirty]
+
+	'''
+	Marks every node of the graph variant |name| as clean, once its per-node metrics are recomputed.
+	'''
+	def ClearDirtyNodes(self, name="time_directed_graph_no_supernodes"):
+		self.dirty_nodes.pop(name, None)
+
+	'''
+	Saves this WordNet as the snapshot of the given input files (keyed with its is_null_model and
+	null_model_seed) in |cache_dir|, so that after ApplyTimeDataDiff or ApplySynsetDiff (with the same
+	changes made to the files) the next WordNet built from the updated files loads it instead of
+	rebuilding everything.
+	'''
+	def SaveUpdatedSnapshot(self, filenames, time_data_file, cache_dir):
+		snapshot_directory = GetSnapshotDirectory(cache_dir, GetSnapshotKey(filenames, time_data_file, self.is_null_model,
+		                                                                  self.null_model_seed))
+		SaveSnapshot(self, snapshot_directory)
+		self.snapshot_directory = snapshot_directory
+
+	def __CheckNotNullModel(self):
+		if self.is_null_model:
+			raise ValueError("null models cannot be updated incrementally, build them from the updated files")
+
+	# Returns a map from every synset key to the keys of the synsets with pointers to it.
+	def __GetPointingKeys(self):
+		pointing_keys = {}
+		for key, synset in self.synsets.items():
+			for pointer in synset["pointers"]:
+				pointing_keys.setdefault(pointer["connection"][2], []).append(key)
+		return pointing_keys
+
+	# Rebuilds the directed synsets with the given |keys| (see __CreateDirectedSynsets) after their
+	# words or time data changed, together with the pointers of the synsets pointing to any of them
+	# which became empty or nonempty, and updates all_words_directed for the given |words|.
+	def __UpdateDirectedSynsets(self, keys, words, pointing_keys):
+		has_time_data = self.word_and_pos_has_time_data
+		refiltered = set()
+		for key in keys:
+			synset = self.synsets.get(key)
+			directed = [] if synset is None else [index for index, word_id in enumerate(synset["word_ids"]) if has_time_data[word_id]]
+			was_directed = key in self.synsets_directed
+			if len(directed) > 0:
+				self.synsets_directed[key] = Synset(synset.synset_type, tuple(synset.words[index] for index in directed), [],
+				                                    synset.description, tuple(synset.word_ids[index] for index in directed))
+				refiltered.add(key)
+			elif was_directed:
+				del self.synsets_directed[key]
+			if was_directed != (len(directed) > 0):
+				refiltered.update(pointing_keys.get(key, ()))
+
+		# Directed synsets leave out the pointers to empty synsets
+		for key in refiltered:
+			if key not in self.synsets_directed: continue
+			self.synsets_directed[key]["pointers"] = [pointer for pointer in self.synsets[key]["pointers"]
+			                                          if pointer["connection"][2] in self.synsets_directed
+			                                          or pointer["connection"][2] not in self.synsets]
+
+		self.supernodes_in_directed_graph = set(self.synsets_directed.keys())
+		for word in words:
+			if any(key in self.synsets_directed and word in self.synsets_directed[key]["words"] for key in self.word_to_synsets.get(word, ())):
+				self.all_words_directed.add(word)
+			else:
+				self.all_words_directed.discard(word)
+
+	# Brings the graph variants with the given |names| up to date with the synsets after the edges of
+	# the given |words| and super-node |keys| changed. The CSR graphs built so far are updated in
+	# place (see UpdateCSRGraph); the TNEANet graphs and their maps are dropped and rebuilt from the
+	# synsets on next access, and every cache derived from the graphs is cleared.
+	def __UpdateGraphs(self, names, words, keys, pointing_keys):
+		for name in names:
+			for attribute in WordNet.GRAPH_ATTRIBUTES[name]:
+				self.__dict__.pop(attribute, None)
+			if name in self.csr_graphs:
+				self.csr_graphs[name], self.dirty_nodes[name] = UpdateCSRGraph(self, name, self.csr_graphs[name], words, keys,
+				                                                               pointing_keys, self.dirty_nodes.get(name))
+		self.node_arrays = {}
+		self.subgraphs = {}
+		# The snapshot holds the WordNet as it was before the update (see SaveUpdatedSnapshot)
+		self.snapshot_directory = None
 
 	'''
 	Returns returns a pair of words in age order and whether or not the words
-	have different ages (older, younger, diffAges)
+	have different ages (older, younger, diffAges), given the interned (word, pos) ids of
+	the words and the list of years of all ids
 	'''
-	def __GetWordsInAgeOrder(self, word1, word2, part_of_speech1, part_of_speech2, word_and_pos_to_date):
+	def __GetWordsInAgeOrder(self, word1, word2, id1, id2, years):
 		older = word1
 		newer = word2
-		word1_and_pos = word1 + part_of_speech1
-		word2_and_pos = word2 + part_of_speech2
-		if word_and_pos_to_date[word1_and_pos] > word_and_pos_to_date[word2_and_pos]:
+		if years[id1] > years[id2]:
 			newer = word1
 			older = word2
-		return older, newer, word_and_pos_to_date[word1_and_pos]==word_and_pos_to_date[word2_and_pos]
+		return older, newer, years[id1]==years[id2]
 
 	'''
 	Parses and returns the appropriate parts of speech based upon the given filenames.
@@ -107,78 +530,54 @@ class WordNet:
 				parts_of_speech.add("r")
 		return parts_of_speech
 	'''
-	Reads in synsets from a list of data.* files.
+	Reads in synsets from a list of data.* files. The files are streamed through the parser one
+	synset at a time (see wordnet_parser.py), or parsed by one worker process each if |processes|
+	is not 1, and each directed synset shares the pointers of its synset and keeps only the words
+	that have time data. Every (word, synset type) pair is interned here, once, so that the graph
+	builders can look up years and time data by integer id.
 	'''
-	def __ReadSynsets(self, filenames):
+	def __ReadSynsets(self, filenames, processes=1):
 		synsets = {}
 		directed_synsets = {}
-		for filename in filenames:
-			with open(filename, 'r') as file:
-				# Ignore the Liscense Agreements at beginning of file.
-				while True:
-					last_position = file.tell()
-					if file.readline()[0:2] != "  ":
-						break
-
-				file.seek(last_position)
-				for line in file:
-					key, synset, directed_synset = self.__ConvertToSynset(line.split(' '))
-					synsets[key] = synset
-					directed_synsets[key] = directed_synset
+		self.word_and_pos_ids = {}
+		years = []
+		if processes == 1:
+			parsed_synsets = IterSynsets(filenames, WordNet.PARTS_OF_SPEECH_OFFSET)
+		else:
+			parsed_synsets = IterSynsetsParallel(filenames, WordNet.PARTS_OF_SPEECH_OFFSET, processes)
+		for key, synset in parsed_synsets:
+			word_ids = synset.word_ids = self.__InternWords(synset, years)
 
+			directed = [index for index, word_id in enumerate(word_ids) if years[word_id] != WordNet.NO_YEAR]
+			synsets[key] = synset
+			directed_synsets[key] = Synset(synset.synset_type, tuple(synset.words[index] for index in directed), synset.pointers,
+			                               synset.description, tuple(word_ids[index] for index in directed))
+
+		self.word_and_pos_years = np.array(years, dtype=np.int16)
+		self.word_and_pos_has_time_data = self.word_and_pos_years != WordNet.NO_YEAR
 		return synsets, directed_synsets
 
+	'''
+	Returns the interned (word, synset type) ids of the words of |synset|, interning new pairs with
+	their year (NO_YEAR without time data) appended to |years|.
+	'''
+	def __InternWords(self, synset, years):
+		word_ids = []
+		for word in synset.words:
+			word_id = self.word_and_pos_ids.get((word, synset.synset_type))
+			if word_id is None:
+				word_id = self.word_and_pos_ids[(word, synset.synset_type)] = len(years)
+				years.append(self.word_and_pos_to_date.get(word+synset.synset_type, WordNet.NO_YEAR))
+			word_ids.append(word_id)
+		return tuple(word_ids)
+
 	'''
 	Randomly moves around the connections between supernodes and the connections between words
-	in seperate synsets to generate a null-model.
-	'''
-	def __ShuffleSynsetConnections(self, synsets):
-		# Count the relevant edges and remove all pointers from synsets
-		between_synsets = 0
-		across_synsets = 0
-		
-		for synset in synsets.values():
-			for pointer in synset["pointers"]:
-				src_key, src, dst_key, dst = pointer["connection"]
-				if src == 0 and dst == 0:
-					between_synsets += 1
-				else:
-					across_synsets += 1
-			synset["pointers"] = list()
-		
-		random.seed(7)
-		synset_keys = synsets.keys()
-
-		# Randomly generate between-synset edges
-		for i in range(between_synsets/2):
-			src_key, dst_key = tuple(random.sample(synset_keys, 2))
-			src_synset, dst_synset = synsets[src_key], synsets[dst_key]
-			
-			src_synset["pointers"].append({"symbol": "unknown",
-										   "pos": dst_synset["synset_type"],
-										   "connection": (src_key, 0, dst_key, 0)})
-			dst_synset["pointers"].append({"symbol": "unknown",
-										   "pos": src_synset["synset_type"],
-										   "connection": (dst_key, 0, src_key, 0)})
-
-		# Randomly generate across-synset edges
-		for i in range(across_synsets/2):
-			src_key, dst_key = tuple(random.sample(synset_keys, 2))
-			src_synset, dst_synset = synsets[src_key], synsets[dst_key]
-			src_word = random.randint(1, len(src_synset["words"]))
-			dst_word = random.randint(1, len(dst_synset["words"]))
-			
-			src_synset["pointers"].append({"symbol": "unknown",
-										   "pos": dst_synset["synset_type"],
-										   "connection": (src_key, src_word, dst_key, dst_word)})
-			dst_synset["pointers"].append({"symbol": "unknown",
-										   "pos": src_synset["synset_type"],
-										   "connection": (dst_key, dst_word, src_key, src_word)})
-	
-		for key, synset in synsets.items():
-			if synset["pointers"] == None:
-				print key
-		return synsets
+	in seperate synsets to generate a null-model. The edges are drawn in bulk from a random stream
+	seeded with |seed| (see null_model.ShuffleSynsetConnections).
+	'''
+	def __ShuffleSynsetConnections(self, synsets, seed):
+		return ShuffleSynsetConnections(synsets, np.random.RandomState(seed))
 
 	'''
 	Reads in time data for words from the given file.
@@ -187,32 +586,36 @@ class WordNet:
 		word_and_pos_to_date = {}
 		word_to_date = {}
 		self.words_with_time_data = set()
-		words = set()
+		self.word_to_pos = {}
 		with open(filename, 'r') as file:
 			for line in file:
-				word, parts_of_speech, year = line.split(' <delim> ')
-				parts_of_speech = set(parts_of_speech.split(' and '))
-				if "adj" in  parts_of_speech: parts_of_speech.add("s")
-				for pos in set(parts_of_speech):
-					# ignore interjections and pronouns
-					if pos in WordNet.PARTS_OF_SPEECH_TRANSLATION.keys():
-						key = word+pos
-						# add earliest year for repeat keys in data
-						if word in words:
-							if word_to_date[word] > int(year):
-								word_to_date[word] = int(year)
-						else:
-							words.add(word)
-							word_to_date[word] = int(year)
-
-						if key in self.words_with_time_data:
-							if word_and_pos_to_date[key] > int(year):
-								word_and_pos_to_date[key] = int(year)
-						else:
-							self.words_with_time_data.add(key)
-							word_and_pos_to_date[key] = int(year)
+				self.__AddTimeData(line, word_and_pos_to_date, word_to_date)
 		return word_and_pos_to_date, word_to_date
 
+	'''
+	Adds one line of time data to the given maps and returns the word+pos keys whose year changed.
+	'''
+	def __AddTimeData(self, line, word_and_pos_to_date, word_to_date):
+		changed_keys = []
+		word, parts_of_speech, year = line.split(' <delim> ')
+		year = int(year)
+		parts_of_speech = set(parts_of_speech.split(' and '))
+		if "adj" in  parts_of_speech: parts_of_speech.add("s")
+		for pos in parts_of_speech:
+			# ignore interjections and pronouns
+			if pos in WordNet.PARTS_OF_SPEECH_TRANSLATION:
+				key = word+pos
+				self.word_to_pos.setdefault(word, set()).add(pos)
+				# add earliest year for repeat keys in data
+				if word not in word_to_date or word_to_date[word] > year:
+					word_to_date[word] = year
+
+				if key not in self.words_with_time_data or word_and_pos_to_date[key] > year:
+					self.words_with_time_data.add(key)
+					word_and_pos_to_date[key] = year
+					changed_keys.append(key)
+		return changed_keys
+
 
 	'''
 	Updates synsets_directed by removing empty synsets
@@ -240,46 +643,6 @@ class WordNet:
 		return directed_synsets
 
 
-	'''
-	Takes a single line of a data file and converts it into a meaningful representation
-	of a synset. A synset contains the following info:
-		1. synset_type = the part of speech of synset.
-	 	2. words = list of the words in the synset.
-	 	3. pointers = list of pointers between this synset and others.
-	 	4. description = given description for the synset.
-	'''
-	def __ConvertToSynset(self, line):
-		synset_type = line[2]
-		
-		key = int(line[0]) + WordNet.PARTS_OF_SPEECH_OFFSET[synset_type]
-
-		word_count = int(line[3], 16)
-		word_start_index = 4
-		pointer_count = int(line[word_start_index + 2 * word_count])
-		pointer_start_index = word_start_index + 2 * word_count + 1
-		
-		words = []
-		words_directed = []
-		for index in range(word_start_index, word_start_index + 2 * word_count, 2):
-			words.append(line[index])
-			if line[index]+synset_type in self.words_with_time_data:
-				words_directed.append(line[index])
-
-		pointers = []
-		for index in range(pointer_start_index, pointer_start_index + 4 * pointer_count, 4):
-			src = int(line[index+3][0:2], 16)
-			dst = int(line[index+3][2:], 16)
-			pos = line[index+2]
-			dst_key = int(line[index+1]) + WordNet.PARTS_OF_SPEECH_OFFSET[pos]
-			pointers.append({"symbol": line[index], "pos": pos,
-					   		 "connection": (key, src, dst_key, dst)})
-
-		description = " ".join(line[line.index("|")+1:]).strip()
-		
-		return key, {"synset_type": synset_type, "words": words,
-				  	  "pointers": pointers, "description": description}, {"synset_type": synset_type, "words": words_directed,
-				  	  "pointers": pointers, "description": description}
-
 	'''
 	Create the basic version of the WordNet graph.
 	'''
@@ -287,9 +650,7 @@ class WordNet:
 		graph = TNEANet.New()
 
 		# Create the super-nodes for each synset
-		self.all_words = set()
 		for key, synset in synsets.items():
-			self.all_words.update(synset["words"])
 			graph.AddNode(key)
 
 		# Create the nodes for the individual words
@@ -338,12 +699,8 @@ class WordNet:
 	def __CreateTimeDirectedGraph(self, synsets_directed, parts_of_speech):
 		directed_graph = TNEANet.New()
 		# Create the super-nodes for each synset
-		self.all_words_directed = set()
-		self.supernodes_in_directed_graph = set()
 		for key, synset in synsets_directed.items():
-			self.all_words_directed.update(synset["words"])
-			self.supernodes_in_directed_graph.add(key)
-		 	directed_graph.AddNode(key)
+			directed_graph.AddNode(key)
 
 		# Create the nodes for the individual words
 		self.node_to_word_directed = {}
@@ -354,6 +711,10 @@ class WordNet:
 			self.node_to_word_directed[node_id] = word
 			self.word_to_node_directed[word] = node_id
 
+		# Years and time data flags by interned (word, pos) id, as lists for fast scalar access
+		years = self.word_and_pos_years.tolist()
+		has_time_data = self.word_and_pos_has_time_data.tolist()
+
 		# Add in edges between words
 		for key, synset in synsets_directed.items():
 			# Add in connections from words to supernode for synset
@@ -362,10 +723,10 @@ class WordNet:
 				self.__AddEdge(directed_graph, key, self.word_to_node_directed[word], "synset")
 			
 			# Add connections between indiviual words in synset
-			for word1 in synset["words"]:
-				for word2 in synset["words"]:
+			for word1, id1 in zip(synset["words"], synset["word_ids"]):
+				for word2, id2 in zip(synset["words"], synset["word_ids"]):
 					if word1 == word2: continue
-					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, synset["synset_type"], synset["synset_type"], self.word_and_pos_to_date)
+					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, id1, id2, years)
 
 					node1 = self.word_to_node_directed[older]
 					node2 = self.word_to_node_directed[newer]
@@ -382,10 +743,10 @@ class WordNet:
 				else:
 					word1 = self.synsets[key1]["words"][src-1]
 					word2 = self.synsets[key2]["words"][dst-1]
-					pos1 = self.synsets[key1]["synset_type"]
-					pos2 = self.synsets[key2]["synset_type"]
-					if word1+pos1 not in self.words_with_time_data or word2+pos2 not in self.words_with_time_data: continue
-					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, pos1, pos2, self.word_and_pos_to_date)
+					id1 = self.synsets[key1]["word_ids"][src-1]
+					id2 = self.synsets[key2]["word_ids"][dst-1]
+					if not has_time_data[id1] or not has_time_data[id2]: continue
+					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, id1, id2, years)
 					node1 = self.word_to_node_directed[older]
 					node2 = self.word_to_node_directed[newer]
 					self.__AddEdge(directed_graph, node1, node2, pointer["symbol"], directed=not diffAges)
@@ -395,8 +756,6 @@ class WordNet:
 
 	'''
 	Create the time directed version of the WordNet graph with no supernodes 
-	Note this graph should be created after the version with supernodes since it
-	relies on data generated from that graph
 	'''
 	def __CreateTimeDirectedGraphNoSuperNodes(self, synsets_directed, parts_of_speech):
 		directed_graph_no_supernodes = TNEANet.New()
@@ -410,18 +769,25 @@ class WordNet:
 			self.node_to_word_directed_no_supernodes[node_id] = word
 			self.word_to_node_directed_no_supernodes[word] = node_id
 
+		# Collect the largest weight of every edge first, so that each edge is added to the graph only once
+		edge_weights = {}
+
+		# Years and time data flags by interned (word, pos) id, as lists for fast scalar access
+		years = self.word_and_pos_years.tolist()
+		has_time_data = self.word_and_pos_has_time_data.tolist()
+
 		# Add in edges between words
 		for key, synset in synsets_directed.items():
 			# Add connections between indiviual words in synset with weight 1
-			for word1 in synset["words"]:
-				for word2 in synset["words"]:
+			for word1, id1 in zip(synset["words"], synset["word_ids"]):
+				for word2, id2 in zip(synset["words"], synset["word_ids"]):
 					if word1 == word2: continue
-					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, synset["synset_type"], synset["synset_type"], self.word_and_pos_to_date)
+					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, id1, id2, years)
 
 					node1 = self.word_to_node_directed_no_supernodes[older]
 					node2 = self.word_to_node_directed_no_supernodes[newer]
 					
-					self.__AddEdgeWithWeight(directed_graph_no_supernodes, node1, node2, 1, directed=not diffAges)
+					self.__AddEdgeWeight(edge_weights, node1, node2, 1, directed=not diffAges)
 
 			# Add connections for pointers
 			for pointer in synset["pointers"]:
@@ -430,29 +796,30 @@ class WordNet:
 				key1, src, key2, dst = pointer["connection"]
 				# if 2 supernodes are connected, connect all words in each synset with weight .5
 				if src == 0 and dst == 0:
-					word_set1 = synset["words"]
-					word_set2 = synsets_directed[key2]["words"]
-					pos1 = self.synsets[key1]["synset_type"]
-					pos2 = self.synsets[key2]["synset_type"]
-					for word1 in word_set1:
-						for word2 in word_set2:
-							if word1+pos1 not in self.words_with_time_data or word2+pos2 not in self.words_with_time_data: continue
-							older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, pos1, pos2, self.word_and_pos_to_date)
+					word_set1 = zip(synset["words"], synset["word_ids"])
+					word_set2 = zip(synsets_directed[key2]["words"], synsets_directed[key2]["word_ids"])
+					for word1, id1 in word_set1:
+						for word2, id2 in word_set2:
+							if not has_time_data[id1] or not has_time_data[id2]: continue
+							older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, id1, id2, years)
 							node1 = self.word_to_node_directed_no_supernodes[older]
 							node2 = self.word_to_node_directed_no_supernodes[newer]
-							self.__AddEdgeWithWeight(directed_graph_no_supernodes, node1, node2, .5, directed=not diffAges)
+							self.__AddEdgeWeight(edge_weights, node1, node2, .5, directed=not diffAges)
 				
 				# if two words are directly related(antonym, hypernym, hyponym, cause, etc) connected them with weight 1
 				else:
 					word1 = self.synsets[key1]["words"][src-1]
 					word2 = self.synsets[key2]["words"][dst-1]
-					pos1 = self.synsets[key1]["synset_type"]
-					pos2 = self.synsets[key2]["synset_type"]
-					if word1+pos1 not in self.words_with_time_data or word2+pos2 not in self.words_with_time_data: continue
-					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, pos1, pos2, self.word_and_pos_to_date)
+					id1 = self.synsets[key1]["word_ids"][src-1]
+					id2 = self.synsets[key2]["word_ids"][dst-1]
+					if not has_time_data[id1] or not has_time_data[id2]: continue
+					older, newer, diffAges = self.__GetWordsInAgeOrder(word1, word2, id1, id2, years)
 					node1 = self.word_to_node_directed_no_supernodes[older]
 					node2 = self.word_to_node_directed_no_supernodes[newer]
-					self.__AddEdgeWithWeight(directed_graph_no_supernodes, node1, node2, 1, directed=not diffAges)
+					self.__AddEdgeWeight(edge_weights, node1, node2, 1, directed=not diffAges)
+
+		for node1, node2 in sorted(edge_weights.keys()):
+			directed_graph_no_supernodes.AddFltAttrDatE(directed_graph_no_supernodes.AddEdge(node1, node2), edge_weights[(node1, node2)], "weight")
 
 		return directed_graph_no_supernodes
 	'''
@@ -464,24 +831,14 @@ class WordNet:
 			self.__AddEdge(graph, node2, node1, symbol, True)
 
 	'''
-	Adds an edge with the given symbol and given weight from node1 to node2 (and vice versa if directed = True)
-	or increases weight of existing edge btw node1 and node2 if edge already exists and given weight is larger
-	than existing weight.
+	Records an edge with the given weight from node1 to node2 (and vice versa if directed = False) in
+	|edge_weights|, a map from (node1, node2) to weight, keeping the larger weight if the edge was
+	already recorded. Only the weight is recorded, so edges of equal weight are interchangeable and the
+	result does not depend on the order they are added in; the CSR version breaks such ties by the
+	smallest symbol code (see wordnet_csr._EdgeList.GetArrays).
 	'''
-	def __AddEdgeWithWeight(self, graph, node1, node2, weight, directed=False):
-		if not graph.IsEdge(node1, node2):
-			graph.AddFltAttrDatE(graph.AddEdge(node1, node2), weight, "weight")
-			if not directed:
-				graph.AddFltAttrDatE(graph.AddEdge(node2, node1), weight, "weight")
-		else:
-			e = graph.GetEI(node1, node2)
-			curr = graph.GetFltAttrDatE(e, "weight")
-			if curr < weight:
-				graph.AddFltAttrDatE(e, weight, "weight")
-				if not directed:
-					if not graph.IsEdge(node2, node1):
-						graph.AddFltAttrDatE(graph.AddEdge(node2, node1), weight, "weight")
-					else:
-						e = graph.GetEI(node2, node1)
-						graph.AddFltAttrDatE(e, weight, "weight")
-
+	def __AddEdgeWeight(self, edge_weights, node1, node2, weight, directed=False):
+		if edge_weights.get((node1, node2), 0) < weight:
+			edge_weights[(node1, node2)] = weight
+		if not directed:
+			self.__AddEdgeWeight(edge_weights, node2, node1, weight, True)
@@ -0,0 +1,267 @@
+from WordNet import WordNet
+from branching_engine import ComputeBranchingFactors, ComputeInfluenceSetMeanYears
+from centrality_engine import ApproximateBetweenness, ComputeClosenessCentralities
+from clustering_engine import ComputeClusteringCoefficients
+from instrumentation import PhaseRecorder
+from node_stats_engine import ComputeNodeStatistics
+from null_model import DoubleEdgeSwap, ShuffleSynsetConnections
+from wordnet_parser import IterSynsetLines, Synset
+import argparse
+import json
+import multiprocessing
+import numpy as np
+import os
+import platform
+import subprocess
+import sys
+
+'''
+Reproducible benchmarks of the WordNet pipeline: the phases of WordNet.__init__ (parsing, time data,
+directed synsets), every graph build, branching factors and speeds at depths 1-3, closeness,
+betweenness, clustering coefficients, fused node statistics and null-model generation. Every
+benchmark records wall time and peak memory (see instrumentation.py) and the results are written
+as JSON, tagged with the git commit, so that runs on different commits can be compared:
+	python benchmark.py run --dataset both --output before.json
+	python benchmark.py run --dataset both --output after.json
+	python benchmark.py compare before.json after.json
+The "full" dataset is the dictionary the analysis scripts use; "fixture" is a downsampled copy of
+it (a fixed random subset of the synsets, see CreateFixture) which runs in a fraction of the time.
+All random choices are seeded, so repeated runs do the same work.
+'''
+
+DATA_FILES = ["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"]
+TIME_DATA_FILE = "data/word_to_year_formatted.txt"
+FIXTURE_DIRECTORY = "data/cache/benchmark-fixture"
+
+# Bump whenever the benchmarks change, so that results are only compared with comparable ones.
+BENCHMARK_VERSION = 1
+DEPTHS = [1, 2, 3]
+# Fixed number of shortest paths sampled by the betweenness benchmark, so that it always does the same work.
+BETWEENNESS_SAMPLES = 1024
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_KB = 4096
+
+def __main__():
+	parser = argparse.ArgumentParser(description="Benchmarks the WordNet pipeline.")
+	subparsers = parser.add_subparsers(dest="command")
+	run_parser = subparsers.add_parser("run", help="run the benchmarks and write the results as JSON")
+	run_parser.add_argument("--dataset", choices=["full", "fixture", "both"], default="both")
+	run_parser.add_argument("--output", help="JSON file for the results (printed if omitted)")
+	run_parser.add_argument("--fixture-fraction", type=float, default=0.1, help="fraction of synsets kept in the fixture")
+	run_parser.add_argument("--sources", type=int, default=4096,
+	                        help="number of (seeded, random) source nodes for closeness and branching speed; 0 for all")
+	run_parser.add_argument("--processes", type=int, default=1, help="worker processes (1 for stable timings)")
+	run_parser.add_argument("--seed", type=int, default=0)
+	compare_parser = subparsers.add_parser("compare", help="compare two result files")
+	compare_parser.add_argument("old")
+	compare_parser.add_argument("new")
+	compare_parser.add_argument("--threshold", type=float, default=0.1,
+	                            help="relative slowdown (or memory growth) reported as a regression")
+	arguments = parser.parse_args()
+
+	if arguments.command == "run":
+		results = RunBenchmarks(arguments.dataset, arguments.fixture_fraction, arguments.sources, arguments.processes,
+		                        arguments.seed)
+		if arguments.output is not None:
+			with open(arguments.output, 'w') as file:
+				json.dump(results, file, indent=1, sort_keys=True)
+		else:
+			print json.dumps(results, indent=1, sort_keys=True)
+	else:
+		with open(arguments.old, 'r') as file: old = json.load(file)
+		with open(arguments.new, 'r') as file: new = json.load(file)
+		sys.exit(1 if CompareResults(old, new, arguments.threshold) else 0)
+
+'''
+Runs the benchmarks on the given |dataset| ("full", "fixture" or "both") and returns the results.
+'''
+def RunBenchmarks(dataset, fixture_fraction, num_sources, processes, seed):
+	results = {"benchmark_version": BENCHMARK_VERSION, "commit": GetCommit(), "python": platform.python_version(),
+	           "cpus": multiprocessing.cpu_count(), "datasets": {},
+	           "parameters": {"fixture_fraction": fixture_fraction, "sources": num_sources, "processes": processes,
+	                          "seed": seed, "depths": DEPTHS}}
+	data_files = [filename for filename in DATA_FILES if os.path.exists(filename)]
+	for filename in sorted(set(DATA_FILES) - set(data_files)):
+		print >> sys.stderr, "Warning: {0} is missing and left out of the benchmarks".format(filename)
+
+	if dataset in ["full", "both"]:
+		results["datasets"]["full"] = _RunIsolated(BenchmarkDataset, data_files, TIME_DATA_FILE, num_sources, processes, seed)
+	if dataset in ["fixture", "both"]:
+		fixture_files, fixture_time_data_file = CreateFixture(data_files, TIME_DATA_FILE, FIXTURE_DIRECTORY, fixture_fraction, seed)
+		results["datasets"]["fixture"] = _RunIsolated(BenchmarkDataset, fixture_files, fixture_time_data_file, num_sources,
+		                                              processes, seed)
+	return results
+
+# Runs function(*args) in a fresh worker process, so that memory freed by earlier benchmarks (and
+# kept by the allocator) does not hide the memory used by later ones.
+def _RunIsolated(function, *args):
+	pool = multiprocessing.Pool(1)
+	try:
+		return pool.apply(function, args)
+	finally:
+		pool.close()
+		pool.join()
+
+'''
+Returns the current git commit (with "-dirty" appended if there are uncommitted changes), or None
+outside of a git checkout.
+'''
+def GetCommit():
+	try:
+		commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=open(os.devnull, 'w')).strip()
+		status = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], stderr=open(os.devnull, 'w'))
+		return commit + ("-dirty" if len(status.strip()) > 0 else "")
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+'''
+Writes a downsampled copy of the given data.* files into |directory|, keeping every synset with
+probability |fraction| (decided by a random stream seeded with |seed|, so the fixture is always the
+same) and dropping the pointers to synsets which were not kept. The time data file is copied as
+is. Returns the new data filenames and time data filename; existing fixture files are reused.
+'''
+def CreateFixture(filenames, time_data_file, directory, fraction, seed):
+	directory = os.path.join(directory, "{0}-{1}".format(fraction, seed))
+	fixture_files = [os.path.join(directory, os.path.basename(filename)) for filename in filenames]
+	fixture_time_data_file = os.path.join(directory, os.path.basename(time_data_file))
+	if all(os.path.exists(filename) for filename in fixture_files + [fixture_time_data_file]):
+		return fixture_files, fixture_time_data_file
+	if not os.path.isdir(directory): os.makedirs(directory)
+
+	# Decide which synsets (by part of speech and offset) to keep before filtering their pointers.
+	random_state = np.random.RandomState(seed)
+	kept = set()
+	file_lines = []
+	for filename in filenames:
+		lines = list(IterSynsetLines(filename))
+		keep = random_state.random_sample(len(lines)) < fraction
+		for line, is_kept in zip(lines, keep.tolist()):
+			if is_kept: kept.add(_GetSynsetId(line.split(' ')[0], line.split(' ')[2]))
+		file_lines.append([line for line, is_kept in zip(lines, keep.tolist()) if is_kept])
+
+	for fixture_file, lines in zip(fixture_files, file_lines):
+		with open(fixture_file + ".tmp", 'w') as file:
+			for line in lines:
+				file.write(_FilterPointers(line, kept))
+		os.rename(fixture_file + ".tmp", fixture_file)
+	with open(time_data_file, 'r') as source, open(fixture_time_data_file + ".tmp", 'w') as destination:
+		destination.write(source.read())
+	os.rename(fixture_time_data_file + ".tmp", fixture_time_data_file)
+	return fixture_files, fixture_time_data_file
+
+# Satellite adjectives ("s") live in data.adj and are pointed to as "a" or "s", so both map to "a".
+def _GetSynsetId(offset, pos):
+	return ("a" if pos == "s" else pos, int(offset))
+
+# Rewrites a synset line keeping only the pointers to synsets in |kept|.
+def _FilterPointers(line, kept):
+	fields = line.split(' ')
+	pointer_count_index = 4 + 2 * int(fields[3], 16)
+	pointer_start_index = pointer_count_index + 1
+	pointer_end_index = pointer_start_index + 4 * int(fields[pointer_count_index])
+	pointers = []
+	for index in range(pointer_start_index, pointer_end_index, 4):
+		if _GetSynsetId(fields[index+1], fields[index+2]) in kept:
+			pointers.extend(fields[index:index+4])
+	return " ".join(fields[:pointer_count_index] + ["%03d" % (len(pointers) // 4)] + pointers + fields[pointer_end_index:])
+
+'''
+Runs every benchmark on the given files and returns {"files": ..., "phases": ...}, where phases maps
+every benchmark name to its measurements (see instrumentation.PhaseRecorder). The phases of
+WordNet.__init__ come from its own phase_report.
+'''
+def BenchmarkDataset(filenames, time_data_file, num_sources, processes, seed):
+	print >> sys.stderr, "Benchmarking {0}".format(", ".join(filenames))
+	recorder = PhaseRecorder()
+	random_state = np.random.RandomState(seed)
+
+	with recorder.Measure("init/total"):
+		wordnet = WordNet(filenames, time_data_file, processes=processes, graphs=[], measure_memory=True)
+	phases = {"init/" + phase["name"]: phase for phase in wordnet.phase_report}
+
+	for name in WordNet.GRAPH_NAMES:
+		with recorder.Measure("graph/" + name):
+			wordnet.BuildGraph(name)
+		with recorder.Measure("csr/" + name):
+			wordnet.GetCSRGraph(name)
+
+	csr = wordnet.GetCSRGraph("time_directed_graph_no_supernodes")
+	years = wordnet.GetNodeYears()
+	sources = _SampleSources(csr.GetNodes(), num_sources, random_state)
+	for depth in DEPTHS:
+		with recorder.Measure("branching_factor/depth_{0}".format(depth)):
+			ComputeBranchingFactors(csr, [depth])
+		with recorder.Measure("branching_speed/depth_{0}".format(depth)):
+			ComputeInfluenceSetMeanYears(csr, years, [depth], sources, processes=processes)
+
+	# Centralities as compute_centralities.py computes them: on the undirected "graph" variant by era.
+	graph_csr = wordnet.GetCSRGraph("graph")
+	graph_years = wordnet.GetNodeYears("graph")
+	eras = np.where(graph_years != WordNet.NO_YEAR, graph_years - graph_years % 100, -1)
+	with recorder.Measure("closeness"):
+		ComputeClosenessCentralities(graph_csr, _SampleSources(graph_csr.GetNodes(), num_sources, random_state),
+		                             directed=False, processes=processes)
+	with recorder.Measure("betweenness"):
+		ApproximateBetweenness(graph_csr, eras, 100, directed=False, initial_samples=BETWEENNESS_SAMPLES,
+		                       max_samples=BETWEENNESS_SAMPLES, seed=seed, processes=processes)
+
+	# Clustering coefficients of every node, as wordnet_stats.py computes them
+	with recorder.Measure("clustering"):
+		ComputeClusteringCoefficients(wordnet.GetCSRGraph("time_directed_graph"), processes=processes)
+	with recorder.Measure("node_statistics"):
+		directed_csr = wordnet.GetCSRGraph("time_directed_graph")
+		ComputeNodeStatistics(directed_csr, _SampleSources(directed_csr.GetNodes(), num_sources, random_state), processes=processes)
+
+	synsets = {key: Synset(synset["synset_type"], synset["words"], list(synset["pointers"]), synset["description"],
+	                       synset["word_ids"]) for key, synset in wordnet.synsets.items()}
+	with recorder.Measure("null_model/shuffle"):
+		ShuffleSynsetConnections(synsets, np.random.RandomState(seed))
+	with recorder.Measure("null_model/double_edge_swap"):
+		DoubleEdgeSwap(csr, 10, np.random.RandomState(seed))
+
+	return {"files": [{"name": os.path.basename(filename), "bytes": os.path.getsize(filename)}
+	                  for filename in filenames + [time_data_file]],
+	        "nodes": {name: wordnet.GetCSRGraph(name).GetNodes() for name in WordNet.GRAPH_NAMES},
+	        "edges": {name: wordnet.GetCSRGraph(name).GetEdges() for name in WordNet.GRAPH_NAMES},
+	        "phases": dict(phases, **recorder.GetReport())}
+
+def _SampleSources(num_nodes, num_sources, random_state):
+	if num_sources <= 0 or num_sources >= num_nodes: return np.arange(num_nodes)
+	return np.sort(random_state.choice(num_nodes, num_sources, replace=False))
+
+'''
+Prints the phases of every dataset in both result sets side by side and returns whether any phase
+got slower (or used more memory) by more than |threshold|. Changes below MIN_REGRESSION_SECONDS and
+MIN_REGRESSION_KB are timer and allocator noise and never count as regressions.
+'''
+def CompareResults(old, new, threshold):
+	if old.get("benchmark_version") != new.get("benchmark_version"):
+		print "Warning: benchmark versions differ ({0} vs {1})".format(old.get("benchmark_version"), new.get("benchmark_version"))
+	if old.get("parameters") != new.get("parameters"):
+		print "Warning: benchmark parameters differ"
+
+	regression = False
+	print "{0} -> {1}".format(old.get("commit"), new.get("commit"))
+	for dataset in sorted(set(old["datasets"].keys()) & set(new["datasets"].keys())):
+		old_phases = old["datasets"][dataset]["phases"]
+		new_phases = new["datasets"][dataset]["phases"]
+		if old["datasets"][dataset]["files"] != new["datasets"][dataset]["files"]:
+			print "Warning: the {0} dataset has different input files".format(dataset)
+		print "\n{0:<40} {1:>10} {2:>10} {3:>7} {4:>12} {5:>12}".format(dataset, "old s", "new s", "ratio", "old peak kB", "new peak kB")
+		for name in sorted(set(old_phases.keys()) | set(new_phases.keys())):
+			if name not in old_phases or name not in new_phases:
+				print "{0:<40} only in the {1} results".format(name, "old" if name in old_phases else "new")
+				continue
+			old_phase, new_phase = old_phases[name], new_phases[name]
+			ratio = new_phase["seconds"] / max(old_phase["seconds"], 1e-9)
+			slower = ratio > 1 + threshold and new_phase["seconds"] - old_phase["seconds"] > MIN_REGRESSION_SECONDS
+			old_peak, new_peak = old_phase["peak_rss_increase_kb"], new_phase["peak_rss_increase_kb"]
+			larger = new_peak > (1 + threshold) * old_peak and new_peak - old_peak > MIN_REGRESSION_KB
+			flags = (" SLOWER" if slower else "") + (" MORE MEMORY" if larger else "")
+			regression = regression or slower or larger
+			print "{0:<40} {1:>10.3f} {2:>10.3f} {3:>7.2f} {4:>12} {5:>12}{6}".format(name, old_phase["seconds"], new_phase["seconds"],
+			      ratio, old_phase["peak_rss_increase_kb"], new_phase["peak_rss_increase_kb"], flags)
+	return regression
+
+if __name__ == "__main__":
+	__main__()
@@ -0,0 +1,76 @@
+import numpy as np
+
+'''
+Bit-parallel breadth first search over the CSR graphs from wordnet_csr.py. Up to LANES searches run
+at once: every node holds one uint64 word for its frontier and one for its visited set, and bit i
+of those words belongs to the search started from the i-th source. A level of all 64 searches is
+then a handful of array operations over the edges instead of 64 separate traversals.
+'''
+
+LANES = 64
+
+# np.unpackbits emits the bits of every byte most significant first, so column 8*b + j of the
+# unpacked bytes of a little-endian uint64 holds bit 8*b + (7 - j).
+_LANE_COLUMNS = np.array([8 * (lane // 8) + 7 - lane % 8 for lane in range(LANES)])
+
+'''
+Returns a (len(words), LANES) boolean matrix whose column i holds bit i of every word.
+'''
+def UnpackLanes(words):
+	octets = np.ascontiguousarray(words, dtype='<u8').view(np.uint8).reshape(-1, 8)
+	return np.unpackbits(octets, axis=1)[:, _LANE_COLUMNS].astype(bool)
+
+'''
+Returns the number of set bits of every lane, i.e. how many of the given words have bit i set.
+'''
+def CountLanes(words):
+	if len(words) == 0: return np.zeros(LANES, dtype=np.int64)
+	return UnpackLanes(words).sum(axis=0)
+
+'''
+Runs one breadth first search (following out-edges) from each of the given source indices (at
+most LANES, all distinct) simultaneously. Yields (depth, reached) for depth = 1, 2, ... where
+reached[v] has bit i set iff node v is first reached at that depth by the search from sources[i].
+Stops after |max_depth| levels (if given) or once every search is exhausted.
+
+If |include_sources| is False the sources are not marked as visited up front, so a source shows up
+again at the first depth at which one of its paths returns to it. This gives the "nodes within
+max_depth steps" sets used for branching speed.
+'''
+def BitParallelBFS(csr, sources, max_depth=None, include_sources=True):
+	transpose = csr.GetTranspose()
+	num_nodes = csr.GetNodes()
+	# Rows of the transpose with at least one in-edge, for the dense (pull) step below.
+	has_in_edges = np.diff(transpose.offsets) > 0
+	in_edge_starts = transpose.offsets[:-1][has_in_edges]
+
+	frontier = np.zeros(num_nodes, dtype=np.uint64)
+	lane_bits = np.left_shift(np.uint64(1), np.arange(len(sources), dtype=np.uint64))
+	frontier[np.asarray(sources)] = lane_bits
+	visited = frontier.copy() if include_sources else np.zeros(num_nodes, dtype=np.uint64)
+
+	depth = 0
+	active = np.nonzero(frontier)[0]
+	while len(active) > 0 and (max_depth is None or depth < max_depth):
+		depth += 1
+		edges = csr.GetOutEdgeIndices(active)
+
+		reached = np.zeros(num_nodes, dtype=np.uint64)
+		if len(edges) * 8 < csr.GetEdges():
+			# Sparse frontier: push the frontier bits along its out-edges only.
+			targets = csr.targets[edges]
+			values = frontier[csr.GetSources()[edges]]
+			order = np.argsort(targets, kind='mergesort')
+			targets, values = targets[order], values[order]
+			if len(targets) > 0:
+				starts = np.concatenate(([0], np.nonzero(targets[1:] != targets[:-1])[0] + 1))
+				reached[targets[starts]] = np.bitwise_or.reduceat(values, starts)
+		elif len(in_edge_starts) > 0:
+			# Dense frontier: every node pulls the bits of all of its in-neighbors.
+			reached[has_in_edges] = np.bitwise_or.reduceat(frontier[transpose.targets], in_edge_starts)
+
+		reached &= ~visited
+		visited |= reached
+		frontier = reached
+		active = np.nonzero(frontier)[0]
+		yield depth, frontier
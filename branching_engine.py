@@ -0,0 +1,92 @@
+import numpy as np
+
+from bfs_engine import BitParallelBFS, LANES, UnpackLanes
+from checkpoint import GetArrayDigest, RunCheckpointed
+from parallel import ConcatenateResults, RunParallel
+
+'''
+Vectorized engines for the per-node branching metrics, operating on the CSR graphs from
+wordnet_csr.py. All results are arrays indexed by the dense node index of the CSR graph.
+'''
+
+# Sources per checkpoint chunk (a multiple of LANES, so every chunk is whole BFS batches).
+CHECKPOINT_CHUNK_SIZE = 64 * LANES
+
+'''
+Computes the branching factor of every node for each of the given |depths| in one pass.
+
+The recursive definition (each traversed edge contributes its weight times the product of the
+weights of the edges leading to it) is exactly the weighted walk count
+	branching_factor_d = sum over k = 1..d of the row sums of W^k
+where W is the weighted adjacency matrix, so it is evaluated with one sparse matrix-vector product
+per depth: walks_k = W * walks_(k-1), starting from the all-ones vector.
+Returns a map from depth to a float64 array of branching factors.
+'''
+def ComputeBranchingFactors(csr, depths):
+	walks = np.ones(csr.GetNodes(), dtype=np.float64)
+	branching_factors = np.zeros(csr.GetNodes(), dtype=np.float64)
+
+	depth_to_branching_factors = {}
+	for depth in range(1, max(depths) + 1):
+		walks = csr.MatVec(walks)
+		branching_factors += walks
+		if depth in depths:
+			depth_to_branching_factors[depth] = branching_factors.copy()
+
+	return depth_to_branching_factors
+
+'''
+Computes, for each of the given |depths|, the mean year of every node's influence set: the nodes
+within that many steps of it (the node itself included if a path leads back to it) whose year is
+no earlier than its own. All depths come out of a single bit-parallel BFS per batch of 64 sources,
+and the batches are spread over |processes| workers (see parallel.py).
+|years| holds the year of every node. Returns a map from depth to a float64 array with the mean
+year for each of the |sources| (all nodes by default), which is 0 if the influence set is empty.
+
+With a |checkpoint_directory| the results of every |checkpoint_chunk_size| sources are saved there
+as they complete, and a rerun with the same inputs only computes the missing ones (see
+checkpoint.py). The checkpoints are kept until the caller removes them.
+'''
+def ComputeInfluenceSetMeanYears(csr, years, depths, sources=None, processes=1, verbose=False, checkpoint_directory=None,
+                                 checkpoint_chunk_size=CHECKPOINT_CHUNK_SIZE):
+	if sources is None: sources = np.arange(csr.GetNodes())
+	# Build the lazily computed arrays once here so that forked workers share them.
+	csr.GetSources(); csr.GetTranspose()
+
+	shared = (csr, np.asarray(years), sorted(depths), np.asarray(sources))
+	if checkpoint_directory is not None:
+		key = "ComputeInfluenceSetMeanYears;depths={0};{1}".format(sorted(depths), GetArrayDigest(csr.offsets, csr.targets, *shared[1:]))
+		results = RunCheckpointed(_ComputeInfluenceSetMeanYearsRange, shared, len(sources), checkpoint_directory, key,
+		                          checkpoint_chunk_size, processes, verbose)
+	else:
+		results = RunParallel(_ComputeInfluenceSetMeanYearsRange, shared, len(sources), processes, align=LANES, verbose=verbose)
+	return ConcatenateResults(results)
+
+def _ComputeInfluenceSetMeanYearsRange(shared, start, end):
+	csr, years, depths, sources = shared
+	sources = sources[start:end]
+	max_depth = max(depths)
+	counts = np.zeros((max_depth + 1, len(sources)), dtype=np.int64)
+	totals = np.zeros((max_depth + 1, len(sources)), dtype=np.float64)
+
+	for batch_start in range(0, len(sources), LANES):
+		batch = sources[batch_start:batch_start + LANES]
+		lanes = slice(batch_start, batch_start + len(batch))
+		source_years = years[batch]
+		for depth, reached in BitParallelBFS(csr, batch, max_depth, include_sources=False):
+			nodes = np.nonzero(reached)[0]
+			in_influence_set = UnpackLanes(reached[nodes])[:, :len(batch)]
+			in_influence_set &= years[nodes][:, None] >= source_years[None, :]
+			counts[depth, lanes] = in_influence_set.sum(axis=0)
+			totals[depth, lanes] = np.dot(years[nodes].astype(np.float64), in_influence_set)
+
+	counts = np.cumsum(counts, axis=0)
+	totals = np.cumsum(totals, axis=0)
+	depth_to_mean_years = {}
+	for depth in depths:
+		mean_years = np.zeros(len(sources), dtype=np.float64)
+		nonempty = counts[depth] > 0
+		mean_years[nonempty] = totals[depth][nonempty] / counts[depth][nonempty]
+		depth_to_mean_years[depth] = mean_years
+
+	return depth_to_mean_years
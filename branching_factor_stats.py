@@ -1,114 +1,59 @@
 from snap import *
 
-from WordNet import WordNet
+from branching_engine import ComputeBranchingFactors
+from era_stats import AggregateByEra
+from graph_store import OpenGraphStore
+from metric_store import GetMetricColumn, LoadMetricTable, SaveMetricTable
 import matplotlib.pyplot as plt
-import pickle
 
 def __main__():
 	depths = [1, 2, 3] # What depths to run for computing the branching factors
-	filename_template = "branching_graphs/null_branching_factor_by_decade_{0}.txt" #filenames where data is saved
+	filename = "branching_graphs/null_branching_metrics.npz" #metric table where data is saved (see metric_store.py)
 
 	# The next couple lines lines compute all of the branching factors for the graph and then saves them to a file
 	# CAN COMMENT THEM OUT to avoid recomputing when just trying to tweak the graphs
 	#wordnet = LoadWordNet(is_null_model=True)
-	#SaveBranchingFactorsToFile(wordnet, depths, filename_template)
+	#SaveBranchingFactorsToFile(wordnet, depths, filename)
 
-	# This section manipulates the computed branching factors and produces a graph
+	# This section manipulates the computed branching factors and produces a graph, averaging them by century
+	# (see era_stats.py) straight from the memory-mapped columns
+	metrics = LoadMetricTable(filename)
+	years = metrics["year"]
 	for max_depth in depths:
-		branching_factor_by_era = GroupDecades(pickle.load(open(filename_template.format(max_depth), "r")), 10)
+		branching_factors = metrics[GetMetricColumn("branching_factor", max_depth)]
 
-		average_by_era = []
-		for era in sorted(branching_factor_by_era.keys()):
-			if len(branching_factor_by_era[era]) == 0:
-				average_by_era.append(0)
-				continue
+		# I made a seperate graph for each of the below branching factor definitions.
+		# This is the standard "branching factor" as we defined at our meeting. To weight the branching factor by the
+		# out degree of the node (removing the bias of high-degree nodes), divide by metrics["out_degree"]**max_depth
+		# where the out degree is nonzero
+		branching_factor_by_era = AggregateByEra(branching_factors, years, 100)
 
-			avg = 0.0
-			for word, year, branching_factor, out_degree in branching_factor_by_era[era]:
-				if out_degree == 0: continue
-				
-				# I made a seperate graph for each of the below branching factor definitions.
-				avg += branching_factor #This is the standard "branching factor" as we defined at our meeting
-				#avg += (branching_factor/out_degree**max_depth) #This weights the branching factor by the out degree of the node to remove bias of high-degree nodes
-				
-			avg = avg / len(branching_factor_by_era[era])
-			average_by_era.append(avg)
-			
-			#print "{0} -> {1}".format(decade, branching_factor_by_decade[decade])
-			#print "{0}\n".format(avg)
-
-		plt.plot(sorted(branching_factor_by_era.keys()), normalize(average_by_era), label="Max Depth = {0}".format(max_depth))
+		plt.plot(branching_factor_by_era["eras"], normalize(branching_factor_by_era["mean"]), label="Max Depth = {0}".format(max_depth))
 	
 	plt.title('Normalized Average Branching Factor by Century')
 	plt.xlabel('Century'); plt.ylabel('Normalized Average Branching Factor')
 	plt.legend()
 	plt.show()
 
+# Opens the memory-mapped export of the WordNet graphs (see graph_store.py), exporting it on first use. Every script
+# running at the same time shares the one copy of the export in the page cache
 def LoadWordNet(is_null_model=False):
 	print "Loading WordNet Graph..."
-	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
+	wordnet = OpenGraphStore(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
 	print "Finished Loading Graph!"
 	return wordnet
 
-# Computes the branching factor for each node (or word) at each of the given |depths|, then saves them to a file
-# based upon the given |filename_template|
-def SaveBranchingFactorsToFile(wordnet, depths, filename_template):
-	graph = wordnet.time_directed_graph_no_supernodes
-	for max_depth in depths:
-		print "Calculating Branching Factors (Depth = {0})".format(max_depth)
-		node_to_branching_factor = ComputeBranchingFactor(graph, max_depth)
-		
-		branching_factor_by_decade = {decade: list() for decade in range(600, 2001, 10)}
-
-		for node in node_to_branching_factor.keys():
-			word = wordnet.node_to_word_directed_no_supernodes[node]
-			year = wordnet.word_to_date[word]
-			branching_factor = node_to_branching_factor[node]
-			out_degree = graph.GetNI(node).GetOutDeg()
-
-			decade = year - year % 10
-			branching_factor_by_decade[decade].append((word, year, branching_factor, out_degree))
-
-		pickle.dump(branching_factor_by_decade, open(filename_template.format(max_depth), "w"))
-
-# Compute the branching factor for each node using the given |max_depth|
-def ComputeBranchingFactor(graph, max_depth):
-	node_to_branching_factor = {}
-	nodes = [node.GetId() for node in graph.Nodes()]
-	
-	for i in range(len(nodes)):
-		if i % 10000 == 0: print "{0} of {1}".format(i, len(nodes))
-		node_to_branching_factor[nodes[i]] = ComputeBranchingFactorHelper(graph, nodes[i], max_depth)
-	
-	return node_to_branching_factor
-
-# Recursive helper function for the above method. the weight multiplier is used so that when you
-# traverse an edge with weight != 1, it reduces the weight of all subsequent edges in the traversal
-def ComputeBranchingFactorHelper(graph, node, max_depth, weight_multiplier=1.0):
-	if max_depth == 0: return 0
-	
-	branching_factor = 0;
-	for neighbor in graph.GetNI(node).GetOutEdges():
-		edge = graph.GetEI(node, neighbor)
-		edge_weight = graph.GetFltAttrDatE(edge, "weight")
-		
-		branching_factor += edge_weight*weight_multiplier
-		branching_factor += ComputeBranchingFactorHelper(graph, neighbor, max_depth-1, edge_weight*weight_multiplier)
-
-	return branching_factor
+# Computes the branching factor for each node (or word) at each of the given |depths|, then saves them (and the out
+# degrees) as columns of the metric table in |filename|, next to any other metrics already in it
+def SaveBranchingFactorsToFile(wordnet, depths, filename):
+	csr = wordnet.GetCSRGraph("time_directed_graph_no_supernodes")
 
-# This method is used to smooth the data from "by-decade" data to some other time period. For example:
-# if num_to_group = 5, the data will now be grouped by half-century (aka 50-year intervals/buckets) 
-def GroupDecades(branching_factor_by_decade, num_to_group):
-	grouped_data = {}
-	decades = sorted(branching_factor_by_decade.keys())
-	for i in range(0, len(decades), num_to_group):
-		start_decade = decades[i]
-		grouped_data[start_decade] = list()
-		for j in range(i, min(i+num_to_group, len(decades))):
-			grouped_data[start_decade].extend(branching_factor_by_decade[decades[j]])
+	print "Calculating Branching Factors (Depths = {0})".format(depths)
+	depth_to_branching_factors = ComputeBranchingFactors(csr, depths)
 
-	return grouped_data
+	columns = {GetMetricColumn("branching_factor", depth): depth_to_branching_factors[depth] for depth in depths}
+	columns["out_degree"] = csr.GetOutDegrees()
+	SaveMetricTable(filename, csr.node_ids, wordnet.GetNodeYears(), wordnet.GetNodePartsOfSpeech(), columns)
 
 # Returns a normalized version of the input |vector|
 def normalize(vector):
@@ -1,144 +1,105 @@
 from snap import *
 
 from WordNet import WordNet
+from branching_engine import ComputeInfluenceSetMeanYears
+from checkpoint import RemoveCheckpoints
+from era_stats import AggregateByEra
+from graph_store import OpenGraphStore
+from metric_store import GetMetricColumn, LoadMetricTable, SaveMetricTable
 import matplotlib.pyplot as plt
-import pickle
+import numpy as np
+import os
 import math
 
 POS_LIST = ['s', 'adj', 'n', 'adv', 'v']
 
 def __main__():
 	depths = [1,2,3] # What depths to run for computing the branching speeds
-	filename_template = "branching_graphs/null_branching_speed_by_decade_{0}.txt" #filenames where data is saved
-	filename_template2 = "branching_graphs/null_branching_speed_by_pos_{0}.txt"
+	filename = "branching_graphs/null_branching_metrics.npz" #metric table where data is saved (see metric_store.py)
 	
 
 	# CAN COMMENT THIS LINE OUT to avoid recomputing when just trying to tweak the graphs
 #	wordnet = LoadWordNet()
-#	SaveBranchingSpeedsToFile(wordnet, depths, filename_template, filename_template2)
+#	SaveBranchingSpeedsToFile(wordnet, depths, filename)
 
-	# This section manipulates the computed branching factors and produces a graph
+	# This section manipulates the computed branching speeds and produces a graph, averaging them by decade
+	# (see era_stats.py) straight from the memory-mapped columns
+	metrics = LoadMetricTable(filename)
+	years = metrics["year"]
+	parts_of_speech = metrics["parts_of_speech"]
 	for max_depth in depths:
-		branching_speed_by_era = GroupDecades(pickle.load(open(filename_template.format(max_depth), "r")), 1)
-        branching_speed_by_pos = pickle.load(open(filename_template2.format(max_depth), "r"))
-
-        # Part of speech calculations
-        print "Current Max Depth:", max_depth
-        for elem in POS_LIST:
-            branching_speeds = []
-            for word, pos, branching_speed in branching_speed_by_pos[elem]:
-                branching_speeds.append(branching_speed)
-            print elem, "Average Branching Speed:", mean(branching_speeds), "| Sample Size:", len(branching_speed_by_pos[elem])
-
-        average_by_era = []
-        for era in sorted(branching_speed_by_era.keys()):
-			if len(branching_speed_by_era[era]) == 0:
-				average_by_era.append(0)
-				continue
-
-			branching_speeds = []
-			for word, year, branching_speed in branching_speed_by_era[era]:
-				branching_speeds.append(branching_speed)
-			
-			average_by_era.append(mean(branching_speeds))
-			
-			#print "{0} -> {1}".format(decade, branching_factor_by_decade[decade])
-			#print "{0}\n".format(avg)
-
-        plt.plot(sorted(branching_speed_by_era.keys()), average_by_era, label="Max Depth = {0}".format(max_depth))
+		branching_speeds = metrics[GetMetricColumn("branching_speed", max_depth)]
+
+		# Part of speech calculations
+		print "Current Max Depth:", max_depth
+		for elem in POS_LIST:
+			is_pos = (parts_of_speech & WordNet.PARTS_OF_SPEECH_CODES[elem]) != 0
+			print elem, "Average Branching Speed:", branching_speeds[is_pos].mean() if is_pos.any() else 0, "| Sample Size:", is_pos.sum()
+
+		branching_speed_by_era = AggregateByEra(branching_speeds, years, 10)
+
+		plt.plot(branching_speed_by_era["eras"], branching_speed_by_era["mean"], label="Max Depth = {0}".format(max_depth))
 
 	plt.title('Average Branching Speed by Decade')
 	plt.xlabel('Decade'); plt.ylabel('Average Branching Speed')
 	plt.legend(loc=2)
 	plt.show()
 
+# Opens the memory-mapped export of the WordNet graphs (see graph_store.py), exporting it on first use. Every script
+# running at the same time shares the one copy of the export in the page cache
 def LoadWordNet(is_null_model=False):
 	print "Loading WordNet Graph..."
-	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
+	wordnet = OpenGraphStore(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
 	print "Finished Loading Graph!"
 	return wordnet
 
-# Computes the branching speed for each node (or word) at each of the given |depths|, then saves them to a file
-# based upon the given |filename_template|
-def SaveBranchingSpeedsToFile(wordnet, depths, filename_template, filename_template2):
+# Computes the branching speed for each node (or word) at each of the given |depths|, then saves them as columns of
+# the metric table in |filename|, next to any other metrics already in it. The table holds the parts of speech of
+# every word, so the averages by part of speech are computed from it as well. Partial results are checkpointed next
+# to the table while the speeds are computed, so a rerun after a crash picks up where the last one stopped
+def SaveBranchingSpeedsToFile(wordnet, depths, filename):
 	# all_years_histogram contains the expected average distance between a word in a given year
 	# and all words that follow it in time.
-	all_years = sorted(wordnet.word_to_date.values())
+	all_years = wordnet.GetTimeDataYears().tolist()
 	all_years_histogram = {}
 	for i in range(len(all_years)):
 		if i < len(all_years)-1 and all_years[i] == all_years[i+1]: continue
 		all_years_histogram[all_years[i]] = mean(all_years[i:]) - all_years[i] 
 
-	for max_depth in depths:
-		print "Calculating Branching Speeds (Depth = {0})".format(max_depth)
-		node_to_branching_speed, node_to_influence_set_words = ComputeBranchingSpeed(wordnet, all_years_histogram, max_depth)
-
-		'''
-		for node, branching_speed in sorted(node_to_branching_speed.items(), reverse=True, key=lambda x: x[1])[:20]:
-			word = wordnet.node_to_word_directed_no_supernodes[node]
-			year = wordnet.word_to_date[word]
-			print "{0} ({1}) = {2} --- {3}".format(word, year, branching_speed, node_to_influence_set_words[node])
-		for node, branching_speed in sorted(node_to_branching_speed.items(), reverse=True, key=lambda x: x[1])[-20:]:
-			word = wordnet.node_to_word_directed_no_supernodes[node]
-			year = wordnet.word_to_date[word]
-			print "{0} ({1}) = {2} --- {3}".format(word, year, branching_speed, node_to_influence_set_words[node])
-		'''
-
-        branching_speed_by_decade = {decade: list() for decade in range(600, 2001, 10)}
-        branching_speed_by_pos = {pos: list() for pos in POS_LIST}
-
-        for node in node_to_branching_speed.keys():
-			word = wordnet.node_to_word_directed_no_supernodes[node]
-			year = wordnet.word_to_date[word]
-			branching_speed = node_to_branching_speed[node]
-
-			decade = year - year % 10
-			branching_speed_by_decade[decade].append((word, year, branching_speed))
-        
-            # Part of speech calculations
-			for pos in wordnet.word_to_pos[word]:
-				if pos in POS_LIST:
-					branching_speed_by_pos[pos].append((word, pos, branching_speed))
-
-        pickle.dump(branching_speed_by_decade, open(filename_template.format(max_depth), "w"))
-        pickle.dump(branching_speed_by_pos, open(filename_template2.format(max_depth), "w"))
-
-# Compute the branching speed for each node using the given |max_depth|
-def ComputeBranchingSpeed(wordnet, all_years_histogram, max_depth):
-	node_to_branching_speed = {}
-	node_to_influence_set_words = {}
-	graph = wordnet.time_directed_graph_no_supernodes
-	nodes = [node.GetId() for node in graph.Nodes()]
-	for i in range(len(nodes)):
-		if i % 10000 == 0: print "{0} of {1}".format(i, len(nodes))
-
-		# Computing average distance between word and its influence set (in years)
-		influence_set = ComputeInfluenceSet(graph, nodes[i], max_depth)
-		influence_set_years = []
-		influence_set_words = []
-
-		current_word = wordnet.node_to_word_directed_no_supernodes[nodes[i]]
-		current_year = wordnet.word_to_date[current_word]
-
-		for node in influence_set:
-			word = wordnet.node_to_word_directed_no_supernodes[node]
-			year = wordnet.word_to_date[word]
-			if year >= current_year:
-				influence_set_years.append(year)
-				influence_set_words.append((word, year))
-
-		average_year_in_influence_set = mean(influence_set_years)
-		
+	csr = wordnet.GetCSRGraph("time_directed_graph_no_supernodes")
+	years = wordnet.GetNodeYears()
+
+	print "Calculating Branching Speeds (Depths = {0})".format(depths)
+	checkpoint_directory = os.path.splitext(filename)[0] + "_speed_checkpoints"
+	depth_to_branching_speeds = ComputeBranchingSpeeds(csr, years, all_years_histogram, depths,
+	                                                   checkpoint_directory=checkpoint_directory)
+
+	columns = {GetMetricColumn("branching_speed", depth): depth_to_branching_speeds[depth] for depth in depths}
+	SaveMetricTable(filename, csr.node_ids, years, wordnet.GetNodePartsOfSpeech(), columns)
+
+	RemoveCheckpoints(checkpoint_directory)
+
+# Compute the branching speed for each node at each of the given |depths|. The mean years of all influence sets
+# come out of a single BFS sweep (see branching_engine.ComputeInfluenceSetMeanYears) spread over |processes| cores,
+# checkpointed in |checkpoint_directory| if given
+def ComputeBranchingSpeeds(csr, years, all_years_histogram, depths, processes=None, checkpoint_directory=None):
+	expected_distances = np.array([all_years_histogram[year] for year in years])
+	depth_to_mean_years = ComputeInfluenceSetMeanYears(csr, years, depths, processes=processes, verbose=True,
+	                                                   checkpoint_directory=checkpoint_directory)
+
+	depth_to_branching_speeds = {}
+	for depth in depths:
+		average_year_in_influence_set = depth_to_mean_years[depth]
+
 		# Branching Speed = 1 - (true avg dist to words in influence set) / (expected avg dist to words in influence)
-		if average_year_in_influence_set > 0:
-			branching_speed = 1 - (average_year_in_influence_set - current_year) / all_years_histogram[current_year]
-			node_to_branching_speed[nodes[i]] = branching_speed
-			#print (word, year, branching_speed, influence_set_words)
-		else:
-			node_to_branching_speed[nodes[i]] = 0
-		node_to_influence_set_words[nodes[i]] = influence_set_words
-	
-	return node_to_branching_speed, node_to_influence_set_words
+		branching_speeds = np.zeros(csr.GetNodes())
+		# Words of the last year have no later words to expect (an expected distance of 0): their speed is 0 as
+		# for an empty influence set
+		has_influence = (average_year_in_influence_set > 0) & (expected_distances != 0)
+		branching_speeds[has_influence] = 1 - (average_year_in_influence_set[has_influence] - years[has_influence]) / expected_distances[has_influence]
+		depth_to_branching_speeds[depth] = branching_speeds
+
+	return depth_to_branching_speeds
 
 def mean(vector):
 	return sum(vector) / float(len(vector)) if len(vector) != 0 else 0
@@ -152,31 +113,6 @@ def median(vector):
 		upper_index = int(math.ceil((len(vector) - 1)/2.0))
 		return (sorted_vector[lower_index] + sorted_vector[upper_index])/2.0
 
-# Find all of the nodes in the graph which are with |max_depth| steps of |node|
-def ComputeInfluenceSet(graph, node, max_depth):
-	influence_set = set()
-	
-	if max_depth == 0: return influence_set
-	
-	for neighbor in graph.GetNI(node).GetOutEdges():
-		influence_set.add(neighbor)
-		influence_set.update(ComputeInfluenceSet(graph, neighbor, max_depth-1))
-
-	return influence_set
-
-# This method is used to smooth the data from "by-decade" data to some other time period. For example:
-# if num_to_group = 5, the data will now be grouped by half-century (aka 50-year intervals/buckets) 
-def GroupDecades(branching_speed_by_decade, num_to_group):
-	grouped_data = {}
-	decades = sorted(branching_speed_by_decade.keys())
-	for i in range(0, len(decades), num_to_group):
-		start_decade = decades[i]
-		grouped_data[start_decade] = list()
-		for j in range(i, min(i+num_to_group, len(decades))):
-			grouped_data[start_decade].extend(branching_speed_by_decade[decades[j]])
-
-	return grouped_data
-
 def GetExpectedBranchingSpeed(year, all_years):
 	for i in range(len(all_years)):
 		if all_years[i] > year: break
@@ -0,0 +1,233 @@
+import numpy as np
+
+from bfs_engine import BitParallelBFS, CountLanes, LANES
+from parallel import ConcatenateResults, RunParallel
+from wordnet_csr import CSRFromEdges
+
+'''
+Whole-graph centrality computations over the CSR graphs from wordnet_csr.py, replacing the
+per-node SNAP calls. Results are arrays aligned with the given source indices.
+'''
+
+'''
+Returns a graph holding every edge of |csr| in both directions, for searches which ignore the
+direction of the edges (SNAP's IsDir = False).
+'''
+def GetUndirectedCSR(csr):
+	sources = np.concatenate((csr.GetSources(), csr.targets))
+	targets = np.concatenate((csr.targets, csr.GetSources()))
+	symbols = np.concatenate((csr.symbols, csr.symbols))
+	weights = np.concatenate((csr.weights, csr.weights))
+	return CSRFromEdges(csr.node_ids, sources, targets, symbols, weights, csr.node_to_word, csr.word_to_node)
+
+'''
+Computes the exact closeness centrality of each of the given |sources| (all nodes by default),
+with the same definition as SNAP's GetClosenessCentr(graph, node, normalized, directed):
+	closeness = reached / (sum of distances to the reached nodes)
+multiplied by reached / (number of nodes - 1) if |normalized|, where reached is the number of
+nodes reachable from the source. The searches run 64 sources at a time (see bfs_engine.py) and the
+batches are spread over |processes| workers.
+'''
+def ComputeClosenessCentralities(csr, sources=None, normalized=True, directed=True, processes=None, verbose=False):
+	if sources is None: sources = np.arange(csr.GetNodes())
+	if not directed: csr = GetUndirectedCSR(csr)
+	# Build the lazily computed arrays once here so that forked workers share them.
+	csr.GetSources(); csr.GetTranspose()
+
+	shared = (csr, np.asarray(sources), normalized)
+	results = RunParallel(_ComputeClosenessRange, shared, len(sources), processes, align=LANES, verbose=verbose)
+	return ConcatenateResults(results)
+
+def _ComputeClosenessRange(shared, start, end):
+	csr, sources, normalized = shared
+	return ComputeClosenessBatches(csr, sources[start:end], normalized)
+
+'''
+Computes the closeness of the given |sources| in this process, 64 sources per BFS (the work of one
+ComputeClosenessCentralities worker). |csr| must be directed as wanted and have its transpose built.
+'''
+def ComputeClosenessBatches(csr, sources, normalized=True):
+	closeness = np.zeros(len(sources), dtype=np.float64)
+
+	for batch_start in range(0, len(sources), LANES):
+		batch = sources[batch_start:batch_start + LANES]
+		reached = np.zeros(len(batch), dtype=np.int64)
+		distance_sums = np.zeros(len(batch), dtype=np.int64)
+		for depth, frontier in BitParallelBFS(csr, batch):
+			counts = CountLanes(frontier[np.nonzero(frontier)[0]])[:len(batch)]
+			reached += counts
+			distance_sums += depth * counts
+
+		batch_closeness = np.zeros(len(batch), dtype=np.float64)
+		has_reached = distance_sums > 0
+		batch_closeness[has_reached] = reached[has_reached] / distance_sums[has_reached].astype(np.float64)
+		if normalized and csr.GetNodes() > 1:
+			batch_closeness *= reached / float(csr.GetNodes() - 1)
+		closeness[batch_start:batch_start + len(batch)] = batch_closeness
+
+	return closeness
+
+'''
+Estimates the vertex diameter (number of nodes on a longest shortest path) as 2 * e + 1, where e
+is the largest eccentricity seen from LANES random sources. For undirected graphs this is an upper
+bound, for directed graphs a heuristic.
+'''
+def EstimateVertexDiameter(csr, random_state):
+	sources = random_state.choice(csr.GetNodes(), min(LANES, csr.GetNodes()), replace=False)
+	eccentricity = 0
+	for depth, frontier in BitParallelBFS(csr, sources):
+		eccentricity = depth
+	return 2 * eccentricity + 1
+
+'''
+Returns the Riondato-Kornaropoulos sample size which guarantees that every estimated (normalized)
+betweenness is within |epsilon| of the truth with probability 1 - |delta|.
+'''
+def GetBetweennessSampleSize(vertex_diameter, epsilon, delta, c=0.5):
+	log_term = np.floor(np.log2(max(vertex_diameter - 2, 1))) + 1
+	return int(np.ceil(c / epsilon ** 2 * (log_term + np.log(1.0 / delta))))
+
+'''
+Approximates the betweenness centrality of every node by sampling shortest paths in the style of
+Riondato and Kornaropoulos: each sample picks a uniformly random ordered pair of distinct nodes
+and a uniformly random shortest path between them, and every interior node of that path gets one
+hit. hits / samples is an unbiased estimate of the normalized betweenness, which is rescaled to
+SNAP's GetBetweennessCentr scale (half the sum over ordered pairs) before it is returned.
+
+Rather than guessing a sample fraction, samples are added in doubling rounds until the average
+betweenness of every group of nodes (|groups| holds a group label per node, e.g. its decade, and a
+negative label for nodes to ignore) is known to within +/- |epsilon| (in SNAP units) with
+probability 1 - |delta|, using an empirical Bernstein bound per group and round. Sampling never
+goes beyond the Riondato-Kornaropoulos sample size for the same epsilon and delta, which already
+bounds the error of every single node (or |max_samples|, if smaller).
+
+Returns the betweenness array and a report map with the number of samples drawn, the sample cap,
+the estimated vertex diameter, whether every group converged and the +/- bound achieved for each
+group (in SNAP units).
+'''
+def ApproximateBetweenness(csr, groups, epsilon, delta=0.1, directed=True, initial_samples=1024, max_samples=None,
+                           seed=0, processes=None, verbose=False):
+	if not directed: csr = GetUndirectedCSR(csr)
+	csr.GetSources(); csr.GetTranspose()
+	num_nodes = csr.GetNodes()
+	scale = num_nodes * (num_nodes - 1) / 2.0
+
+	random_state = np.random.RandomState(seed)
+	vertex_diameter = EstimateVertexDiameter(csr, random_state)
+	uniform_samples = GetBetweennessSampleSize(vertex_diameter, epsilon / scale, delta)
+	sample_cap = uniform_samples if max_samples is None else min(uniform_samples, max_samples)
+
+	groups = np.asarray(groups)
+	group_labels = np.unique(groups[groups >= 0])
+	group_index = np.full(num_nodes, -1, dtype=np.int64)
+	group_index[groups >= 0] = np.searchsorted(group_labels, groups[groups >= 0])
+	group_sizes = np.bincount(group_index[group_index >= 0], minlength=len(group_labels)).astype(np.float64)
+	# Largest possible per-sample contribution to a group average (a path has at most
+	# vertex_diameter - 2 interior nodes).
+	group_ranges = np.minimum(group_sizes, max(vertex_diameter - 2, 1)) / np.maximum(group_sizes, 1)
+	num_rounds = int(np.ceil(np.log2(max(float(sample_cap) / initial_samples, 1)))) + 1
+	round_delta = delta / (max(1, len(group_labels)) * num_rounds)
+
+	hits = np.zeros(num_nodes, dtype=np.int64)
+	group_sums = np.zeros(len(group_labels))
+	group_squares = np.zeros(len(group_labels))
+	samples = 0
+	target_samples = min(initial_samples, sample_cap)
+	while True:
+		shared = (csr, group_index, len(group_labels), group_sizes, seed, samples)
+		for range_hits, range_sums, range_squares in RunParallel(_SampleShortestPathsRange, shared, target_samples - samples,
+		                                                         processes, chunk_size=_SAMPLES_PER_RANGE):
+			hits += np.bincount(range_hits, minlength=num_nodes)
+			group_sums += range_sums
+			group_squares += range_squares
+		samples = target_samples
+
+		means = group_sums / samples
+		variances = np.maximum(group_squares / samples - means ** 2, 0) * samples / max(samples - 1, 1)
+		log_term = np.log(4.0 / round_delta)
+		bounds = np.sqrt(2 * variances * log_term / samples) + 7 * group_ranges * log_term / (3 * max(samples - 1, 1))
+		bounds *= scale
+		if samples >= uniform_samples:
+			bounds = np.minimum(bounds, epsilon)
+		converged = bool(np.all(bounds <= epsilon))
+		if verbose: print "{0} samples, worst group bound +/- {1}".format(samples, bounds.max() if len(bounds) else 0)
+
+		if converged or samples >= sample_cap: break
+		target_samples = min(2 * samples, sample_cap)
+
+	report = {"samples": samples, "max_samples": sample_cap, "vertex_diameter": vertex_diameter,
+	          "epsilon": epsilon, "delta": delta, "converged": converged,
+	          "group_bounds": dict(zip(group_labels.tolist(), bounds.tolist()))}
+	return hits * (scale / samples), report
+
+# Fixed so that the random streams (seeded per range) do not depend on the number of processes.
+_SAMPLES_PER_RANGE = 256
+
+def _SampleShortestPathsRange(shared, start, end):
+	csr, group_index, num_groups, group_sizes, seed, offset = shared
+	random_state = np.random.RandomState([seed, offset + start])
+	num_nodes = csr.GetNodes()
+	distances = np.full(num_nodes, -1, dtype=np.int32)
+	sigmas = np.zeros(num_nodes, dtype=np.float64)
+
+	range_hits = []
+	group_sums = np.zeros(num_groups)
+	group_squares = np.zeros(num_groups)
+	for i in range(end - start):
+		source = random_state.randint(num_nodes)
+		target = random_state.randint(num_nodes - 1)
+		if target >= source: target += 1
+
+		path = _SampleShortestPath(csr, source, target, random_state, distances, sigmas)
+		if len(path) == 0: continue
+		range_hits.append(path)
+		path_groups = group_index[path]
+		path_groups = path_groups[path_groups >= 0]
+		contributions = np.bincount(path_groups, minlength=num_groups) / np.maximum(group_sizes, 1)
+		group_sums += contributions
+		group_squares += contributions ** 2
+
+	range_hits = np.concatenate(range_hits) if len(range_hits) > 0 else np.zeros(0, dtype=np.int64)
+	return range_hits, group_sums, group_squares
+
+'''
+Runs a BFS from |source| until the level of |target| is complete, counting shortest paths, then
+walks back from |target| choosing each predecessor with probability proportional to its number of
+shortest paths. Returns the interior nodes of the resulting uniformly random shortest path (empty
+if |target| is unreachable). |distances| and |sigmas| are scratch arrays which are restored to -1
+and 0 before returning.
+'''
+def _SampleShortestPath(csr, source, target, random_state, distances, sigmas):
+	sources = csr.GetSources()
+	transpose = csr.GetTranspose()
+	distances[source] = 0
+	sigmas[source] = 1.0
+	touched = [np.array([source])]
+
+	frontier = touched[0]
+	depth = 0
+	while len(frontier) > 0 and distances[target] < 0:
+		depth += 1
+		edges = csr.GetOutEdgeIndices(frontier)
+		heads = csr.targets[edges]
+		unvisited = distances[heads] < 0
+		heads, tails = heads[unvisited], sources[edges][unvisited]
+		frontier, inverse = np.unique(heads, return_inverse=True)
+		distances[frontier] = depth
+		sigmas[frontier] = np.bincount(inverse, weights=sigmas[tails])
+		touched.append(frontier)
+
+	path = []
+	if distances[target] > 0:
+		node = target
+		while distances[node] > 1:
+			predecessors = transpose.GetOutNeighbors(node)
+			predecessors = predecessors[distances[predecessors] == distances[node] - 1]
+			cumulative = np.cumsum(sigmas[predecessors])
+			node = predecessors[np.searchsorted(cumulative, random_state.random_sample() * cumulative[-1], side='right')]
+			path.append(node)
+
+	for nodes in touched:
+		distances[nodes] = -1
+		sigmas[nodes] = 0
+	return np.array(path, dtype=np.int64)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+
+from parallel import IterParallel, SplitRange
+
+'''
+Checkpointed per-node metric runs. A run is split into fixed node ranges as in parallel.py, and the
+result of every range is written to its own chunk file in a checkpoint directory as soon as it is
+computed (append-only: chunks are never rewritten). A run which is restarted after a crash skips
+the ranges whose chunks exist and only computes the rest, and the chunks are merged in range order
+once all of them are there. The directory also holds a manifest identifying the run (the metric,
+its parameters and a digest of its input arrays), so chunks of a different run are never reused.
+'''
+
+MANIFEST_FILENAME = "manifest.json"
+
+'''
+Returns a hex digest of the contents, types and shapes of the given arrays, to tell whether two
+runs have the same inputs.
+'''
+def GetArrayDigest(*arrays):
+	digest = hashlib.sha1()
+	for array in arrays:
+		array = np.ascontiguousarray(array)
+		digest.update("{0}{1};".format(array.dtype.str, array.shape))
+		digest.update(array.view(np.uint8).data if array.size > 0 else "")
+	return digest.hexdigest()
+
+def _GetChunkFilename(directory, start, end):
+	return os.path.join(directory, "chunk-{0:010d}-{1:010d}.npz".format(start, end))
+
+'''
+Writes |result| (an array, or a map from keys such as depths to arrays) as the chunk of the range
+[start, end). The chunk is written under a temporary name and renamed into place, so a chunk file
+is always complete.
+'''
+def _SaveChunk(directory, start, end, result):
+	filename = _GetChunkFilename(directory, start, end)
+	with open(filename + ".tmp", 'wb') as file:
+		if isinstance(result, dict):
+			keys = sorted(result.keys())
+			np.savez(file, keys=np.array(keys), **{"value_{0}".format(i): result[key] for i, key in enumerate(keys)})
+		else:
+			np.savez(file, result=result)
+	os.rename(filename + ".tmp", filename)
+
+def _LoadChunk(directory, start, end):
+	with np.load(_GetChunkFilename(directory, start, end)) as chunk:
+		if "result" in chunk.files: return chunk["result"]
+		return {key: chunk["value_{0}".format(i)] for i, key in enumerate(chunk["keys"].tolist())}
+
+'''
+Creates the checkpoint directory of a run, or checks that an existing one belongs to the same run.
+'''
+def _OpenCheckpoints(directory, manifest):
+	manifest_filename = os.path.join(directory, MANIFEST_FILENAME)
+	if os.path.isfile(manifest_filename):
+		with open(manifest_filename, 'r') as file:
+			if json.load(file) != manifest:
+				raise ValueError("{0} holds the checkpoints of a different run; remove it to start over".format(directory))
+		return
+
+	if not os.path.isdir(directory): os.makedirs(directory)
+	with open(manifest_filename + ".tmp", 'w') as file:
+		json.dump(manifest, file, sort_keys=True)
+	os.rename(manifest_filename + ".tmp", manifest_filename)
+
+'''
+Like parallel.RunParallel, but checkpointed in |directory|: runs function(shared, start, end) over
+the ranges of |chunk_size| items covering [0, num_items) which have no chunk yet, saving each
+result as soon as it is done, and returns the results of all ranges in range order. |key| names the
+run (e.g. the metric, its parameters and GetArrayDigest of its inputs); a directory with the
+checkpoints of another key, item count or chunk size raises a ValueError.
+'''
+def RunCheckpointed(function, shared, num_items, directory, key, chunk_size, processes=None, verbose=False):
+	_OpenCheckpoints(directory, {"key": key, "num_items": num_items, "chunk_size": chunk_size})
+	ranges = SplitRange(num_items, chunk_size)
+	missing = [(start, end) for start, end in ranges if not os.path.isfile(_GetChunkFilename(directory, start, end))]
+	if verbose: print "{0} of {1} chunks already computed".format(len(ranges) - len(missing), len(ranges))
+
+	done = num_items - sum(end - start for start, end in missing)
+	for start, end, result in IterParallel(function, shared, missing, processes):
+		_SaveChunk(directory, start, end, result)
+		done += end - start
+		if verbose: print "{0} of {1}".format(done, num_items)
+
+	return [_LoadChunk(directory, start, end) for start, end in ranges]
+
+'''
+Deletes the checkpoints in |directory|, once their results have been merged into the final output.
+'''
+def RemoveCheckpoints(directory):
+	if os.path.isdir(directory):
+		shutil.rmtree(directory)
@@ -0,0 +1,153 @@
+import numpy as np
+
+from parallel import RunParallel
+from wordnet_csr import CSRFromEdges
+
+'''
+Local clustering coefficients of every node of the CSR graphs from wordnet_csr.py, replacing SNAP's
+per-node GetNodeClustCf and GetClustCf. As in SNAP, the clustering coefficient of a node of a
+directed graph is the one of the underlying simple undirected graph: the neighbors of a node are its
+in- and out-neighbors other than itself, and
+	clustering = (edges between its neighbors) / (pairs of its neighbors)
+whatever the direction or multiplicity of the edges (0 for nodes with fewer than two neighbors).
+
+Triangles are counted with the compact-forward algorithm: the nodes are ranked by degree, every
+edge is kept only from its lower to its higher ranked end, and each triangle is found exactly once
+from its lowest ranked node, as a pair of its (rank-sorted) forward neighbors which are connected
+themselves. Every node has at most sqrt(2 * edges) forward neighbors, so hubs such as super-nodes
+do not blow up the number of pairs examined.
+'''
+
+# Maximum number of pairs of forward neighbors examined at once by a worker.
+WEDGE_BATCH_SIZE = 1 << 20
+
+'''
+Returns the simple undirected version of |csr|: every edge in both directions, without self-loops
+and with parallel edges merged, so that every node has sorted, distinct neighbors. Edge symbols and
+weights are not kept.
+'''
+def GetSimpleUndirectedCSR(csr):
+	num_nodes = csr.GetNodes()
+	sources = np.concatenate((csr.GetSources(), csr.targets)).astype(np.int64)
+	targets = np.concatenate((csr.targets, csr.GetSources())).astype(np.int64)
+	not_loop = sources != targets
+	edge_ids = np.unique(sources[not_loop] * num_nodes + targets[not_loop])
+	return CSRFromEdges(csr.node_ids, edge_ids // num_nodes, edge_ids % num_nodes, np.zeros(len(edge_ids), dtype=np.uint8),
+	                    np.ones(len(edge_ids), dtype=np.float32), csr.node_to_word, csr.word_to_node)
+
+'''
+Returns the number of triangles through every node of |csr| (see above for directed graphs), with
+the nodes spread over |processes| workers.
+'''
+def ComputeTriangleCounts(csr, processes=None, verbose=False):
+	return _CountTriangles(GetSimpleUndirectedCSR(csr), processes, verbose)
+
+'''
+Returns the local clustering coefficient of every node of |csr|, with the same definition as SNAP's
+GetNodeClustCf (see above), as a float64 array indexed like the nodes of |csr|.
+'''
+def ComputeClusteringCoefficients(csr, processes=None, verbose=False):
+	undirected = GetSimpleUndirectedCSR(csr)
+	return GetClusteringCoefficients(_CountTriangles(undirected, processes, verbose), undirected.GetOutDegrees())
+
+'''
+Returns the clustering coefficients of nodes with the given numbers of |triangles| and of distinct
+neighbors (|degrees| in the simple undirected graph).
+'''
+def GetClusteringCoefficients(triangles, degrees):
+	pairs = degrees.astype(np.float64) * (degrees - 1) / 2
+	clustering = np.zeros(len(pairs), dtype=np.float64)
+	has_pairs = pairs > 0
+	clustering[has_pairs] = triangles[has_pairs] / pairs[has_pairs]
+	return clustering
+
+'''
+Returns the average clustering coefficient over all nodes of |csr|, like SNAP's GetClustCf.
+'''
+def GetAverageClusteringCoefficient(csr, processes=None, verbose=False):
+	if csr.GetNodes() == 0: return 0.0
+	return float(ComputeClusteringCoefficients(csr, processes, verbose).mean())
+
+def _CountTriangles(undirected, processes, verbose):
+	shared = GetForwardGraph(undirected)
+	return AddTriangleCounts(undirected.GetNodes(), RunParallel(_CountTrianglesRange, shared, undirected.GetNodes(), processes,
+	                                                            verbose=verbose))
+
+def _CountTrianglesRange(shared, start, end):
+	forward, edge_ids = shared
+	return CountForwardTriangles(forward, edge_ids, start, end)
+
+'''
+Returns (forward, edge_ids) for CountForwardTriangles: the graph holding every edge of the simple
+|undirected| graph (see GetSimpleUndirectedCSR) from its lower to its higher ranked end, with each
+row sorted by rank, and the sorted ids (source * nodes + target) of its edges.
+'''
+def GetForwardGraph(undirected):
+	num_nodes = undirected.GetNodes()
+	degrees = undirected.GetOutDegrees()
+	ranks = np.empty(num_nodes, dtype=np.int64)
+	ranks[np.lexsort((np.arange(num_nodes), degrees))] = np.arange(num_nodes)
+
+	sources, targets = undirected.GetSources().astype(np.int64), undirected.targets.astype(np.int64)
+	forward = ranks[sources] < ranks[targets]
+	sources, targets = sources[forward], targets[forward]
+	order = np.lexsort((ranks[targets], sources))
+	forward = CSRFromEdges(undirected.node_ids, sources[order], targets[order], np.zeros(len(order), dtype=np.uint8),
+	                       np.ones(len(order), dtype=np.float32), None, None)
+	# Build the lazily computed arrays once here so that forked workers share them.
+	forward.GetSources()
+	return forward, np.sort(sources * num_nodes + targets)
+
+'''
+Returns the numbers of triangles through every node of a simple undirected graph with |num_nodes|
+nodes, given the CountForwardTriangles results of ranges covering all nodes.
+'''
+def AddTriangleCounts(num_nodes, results):
+	triangles = np.zeros(num_nodes, dtype=np.int64)
+	for nodes, counts in results:
+		triangles[nodes] += counts
+	return triangles
+
+'''
+Counts the triangles whose lowest ranked node is in [start, end) (given the result of
+GetForwardGraph) and returns them as (nodes, counts): the sorted, distinct nodes of those triangles
+and the number of them through each. Only the nodes touched by the range are listed, so the result
+of a range is as large as its triangles rather than the graph (see AddTriangleCounts).
+'''
+def CountForwardTriangles(forward, edge_ids, start, end):
+	num_nodes = forward.GetNodes()
+	offsets = forward.offsets.astype(np.int64)
+	nodes, counts = [], []
+
+	# Split the range so that no batch examines many more than WEDGE_BATCH_SIZE pairs
+	degrees = offsets[start+1:end+1] - offsets[start:end]
+	wedge_ends = np.cumsum(degrees * (degrees - 1) // 2)
+	batch_start = start
+	while batch_start < end:
+		done = wedge_ends[batch_start - start - 1] if batch_start > start else 0
+		batch_end = start + np.searchsorted(wedge_ends, done + WEDGE_BATCH_SIZE, side='right')
+		batch_end = min(end, max(batch_end, batch_start + 1))
+
+		# Every pair (first, second) of forward edges of the same node with first before second
+		edges = np.arange(offsets[batch_start], offsets[batch_end])
+		later = offsets[forward.GetSources()[edges] + 1] - edges - 1
+		first = np.repeat(edges, later)
+		second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(later) - later, later)
+
+		# The pair is a triangle if its ends are connected (from the lower to the higher ranked one)
+		lower, higher = forward.targets[first].astype(np.int64), forward.targets[second].astype(np.int64)
+		closed = _IsEdge(lower * num_nodes + higher, edge_ids)
+		batch_nodes, batch_counts = np.unique(np.concatenate((forward.GetSources()[first[closed]], lower[closed], higher[closed])),
+		                                      return_counts=True)
+		nodes.append(batch_nodes); counts.append(batch_counts)
+		batch_start = batch_end
+
+	if len(nodes) == 0: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+	nodes, positions = np.unique(np.concatenate(nodes), return_inverse=True)
+	return nodes, np.bincount(positions, weights=np.concatenate(counts), minlength=len(nodes)).astype(np.int64)
+
+# Returns whether each of |queries| is in the sorted array |edge_ids|.
+def _IsEdge(queries, edge_ids):
+	if len(edge_ids) == 0: return np.zeros(len(queries), dtype=bool)
+	positions = np.minimum(np.searchsorted(edge_ids, queries), len(edge_ids) - 1)
+	return edge_ids[positions] == queries
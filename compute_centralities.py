@@ -1,8 +1,11 @@
 from snap import *
 
 from WordNet import WordNet
+from centrality_engine import ApproximateBetweenness, ComputeClosenessCentralities
+from era_stats import AggregateByEra, GetEraMap
+from graph_store import OpenGraphStore
 import matplotlib.pyplot as plt
-import random
+import numpy as np
 import time
 
 def __main__():
@@ -37,57 +40,31 @@ def __main__():
 	plt.legend()
 	plt.show()
 
-def GetCentralityByEra(wordnet, centrality_type):
-	graph = wordnet.graph
-	centrality_map = {}
+def GetCentralityByEra(wordnet, centrality_type, betweenness_epsilon=100, betweenness_delta=0.1):
+	era_length = 100
+	csr = wordnet.GetCSRGraph("graph")
+	years = wordnet.GetNodeYears("graph")
+	dated = years != WordNet.NO_YEAR
+	node_eras = np.where(dated, years - years % era_length, -1)
+	centralities = np.zeros(csr.GetNodes())
 
 	if centrality_type == 'Degree':
-		for node in graph.Nodes():
-			if node.GetId() not in wordnet.node_to_word: continue
-			word = wordnet.node_to_word[node.GetId()]
-			
-			if word not in wordnet.word_to_date: continue
-			centrality_map[word] = node.GetOutDeg()
+		centralities = csr.GetOutDegrees().astype(np.float64)
 
 	if centrality_type == 'Closeness':
-		count = 0
-		node_ids = [node.GetId() for node in graph.Nodes()]
-		random.shuffle(node_ids)
-
-		for node_id in node_ids[:int(len(node_ids)/10)]:
-			if node_id not in wordnet.node_to_word: continue
-			word = wordnet.node_to_word[node_id]
-			
-			if word not in wordnet.word_to_date: continue
-			centrality_map[word] = GetClosenessCentr(graph, node_id)
-			count += 1
-			print "{0} out of {1}".format(count, len(wordnet.node_to_word)/10)
+		# Exact closeness for every dated word node, 64 BFS sources at a time (see centrality_engine.py)
+		word_indices = np.nonzero(dated)[0]
+		centralities[word_indices] = ComputeClosenessCentralities(csr, word_indices, directed=False, verbose=True)
 	
 	if centrality_type == 'Betweenness':
-		Nodes = TIntFltH()
-		Edges = TIntPrFltH()
-		GetBetweennessCentr(graph, Nodes, Edges, 0.001)
-		for node_id in Nodes:
-			if node_id not in wordnet.node_to_word: continue
-			word = wordnet.node_to_word[node_id]
-			
-			if word not in wordnet.word_to_date: continue
-			centrality_map[word] = Nodes[node_id]
-
-	era_length = 100
-	centrality_by_era = {era: list() for era in range(600, 2001, era_length)}
-	for word, centrality in centrality_map.items():
-		year = wordnet.word_to_date[word]
-		era = year - year % era_length
-		centrality_by_era[era].append(centrality)
-
-	for era in centrality_by_era.keys():
-		centrality_by_era[era] = mean(centrality_by_era[era])
-
-	return centrality_by_era
+		# Sample shortest paths until the average betweenness of every era is known to within +/- betweenness_epsilon
+		# with probability 1 - betweenness_delta (see centrality_engine.ApproximateBetweenness)
+		centralities, report = ApproximateBetweenness(csr, node_eras, betweenness_epsilon, betweenness_delta, directed=False, verbose=True)
+		print "Betweenness from {0} sampled paths (converged: {1}, vertex diameter ~{2})".format(report["samples"], report["converged"], report["vertex_diameter"])
+		print "Bounds by era = {0}".format(report["group_bounds"])
 
-def mean(vector):
-	return sum(vector) / float(len(vector)) if len(vector) != 0 else 0
+	# Average over the dated words of every era (0 for eras without words)
+	return GetEraMap(AggregateByEra(centralities, years, era_length), "mean")
 
 def scale_by_max(vector):
 	return normalize(vector)
@@ -99,10 +76,12 @@ def normalize(vector):
 	total = float(sum(vector))
 	return [elem / total for elem in vector]
 
+# Opens the memory-mapped export of the WordNet graphs (see graph_store.py), exporting it on first use. Every script
+# running at the same time shares the one copy of the export in the page cache
 def LoadWordNet(is_null_model=False):
 	print "Loading WordNet Graph..."
-	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
-	#wordnet = WordNet(["data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
+	wordnet = OpenGraphStore(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
+	#wordnet = OpenGraphStore(["data/dict/data.adv"], "data/word_to_year_formatted.txt", is_null_model)
 	print "Finished Loading Graph!"
 	return wordnet
 
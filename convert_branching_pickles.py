@@ -0,0 +1,74 @@
+from WordNet import WordNet
+from metric_store import GetMetricColumn, SaveMetricTable
+import numpy as np
+import os
+import pickle
+
+'''
+One-off conversion of the branching factor and branching speed results which the branching scripts
+used to pickle as {decade: [(word, year, value[, out_degree]), ...]} into the metric tables they now
+read (see metric_store.py). The pickles hold every node of time_directed_graph_no_supernodes, so the
+node ids are assigned like that graph does (the words in sorted order, from 0; see
+wordnet_csr._AssignNodeIds) and the parts of speech are read from the time data, without building
+the WordNet.
+
+The committed tables were converted with this script, after which the pickles were deleted since
+nothing reads them anymore. To convert them again, check the branching_graphs/*_by_decade_*.txt
+files out of the history first.
+'''
+
+DEPTHS = [1, 2, 3]
+
+def __main__():
+	for prefix in ["", "null_"]:
+		ConvertBranchingPickles("branching_graphs/" + prefix + "branching_{0}_by_decade_{1}.txt",
+		                        "branching_graphs/" + prefix + "branching_metrics.npz", "data/word_to_year_formatted.txt")
+
+'''
+Converts the pickles named by |filename_template| (formatted with the metric, "factor" or "speed",
+and the depth) into the metric table in |filename|.
+'''
+def ConvertBranchingPickles(filename_template, filename, time_data_file, depths=DEPTHS):
+	columns = {}
+	word_to_year = None
+	for metric in ["factor", "speed"]:
+		for depth in depths:
+			rows = [row for decade_rows in LoadPickle(filename_template.format(metric, depth)).values() for row in decade_rows]
+			if word_to_year is None:
+				word_to_year = {row[0]: row[1] for row in rows}
+				words = sorted(word_to_year.keys())
+				word_to_node = {word: node_id for node_id, word in enumerate(words)}
+			if len(rows) != len(words) or any(word_to_year.get(row[0]) != row[1] for row in rows):
+				raise ValueError("{0} holds different words".format(filename_template.format(metric, depth)))
+
+			node_ids = np.array([word_to_node[row[0]] for row in rows], dtype=np.int64)
+			values = np.zeros(len(words), dtype=np.float64)
+			values[node_ids] = [row[2] for row in rows]
+			columns[GetMetricColumn("branching_" + metric, depth)] = values
+			if metric == "factor":
+				out_degrees = np.zeros(len(words), dtype=np.int64)
+				out_degrees[node_ids] = [row[3] for row in rows]
+				columns["out_degree"] = out_degrees
+
+	word_to_pos = ReadPartsOfSpeech(time_data_file)
+	parts_of_speech = [sum(WordNet.PARTS_OF_SPEECH_CODES[pos] for pos in word_to_pos.get(word, ())) for word in words]
+	if os.path.isfile(filename): os.remove(filename)
+	SaveMetricTable(filename, np.arange(len(words)), [word_to_year[word] for word in words], parts_of_speech, columns)
+	print "Converted {0} words into {1}".format(len(words), filename)
+
+def LoadPickle(filename):
+	with open(filename, 'r') as file:
+		return pickle.load(file)
+
+# Returns a map from every word of the time data file to its parts of speech, as in WordNet.word_to_pos.
+def ReadPartsOfSpeech(time_data_file):
+	word_to_pos = {}
+	with open(time_data_file, 'r') as file:
+		for line in file:
+			word, parts_of_speech, year = line.split(' <delim> ')
+			parts_of_speech = set(parts_of_speech.split(' and '))
+			if "adj" in parts_of_speech: parts_of_speech.add("s")
+			word_to_pos.setdefault(word, set()).update(pos for pos in parts_of_speech if pos in WordNet.PARTS_OF_SPEECH_TRANSLATION)
+	return word_to_pos
+
+__main__()
@@ -0,0 +1,83 @@
+import numpy as np
+
+'''
+Vectorized per-era statistics of per-node values. The nodes are bucketed by year into eras of
+|era_length| years (era_length = 10 gives decades, 100 centuries) starting at first_year, and the
+count, sum, mean, standard deviation, median and quantiles of every era come out of one bincount
+pass and one sort, instead of a dict of lists per era. Eras without nodes get 0 for every statistic.
+'''
+
+FIRST_YEAR = 600
+LAST_YEAR = 2000
+DEFAULT_QUANTILES = [0.25, 0.5, 0.75]
+
+'''
+Aggregates one array of per-node |values| by the |years| of the nodes (arrays indexed alike, e.g. a
+metric and WordNet.GetNodeYears). The eras run from first_year to the era holding last_year; nodes
+before first_year or after the end of that era, such as super-nodes and words without time data
+(WordNet.NO_YEAR), are left out. The values are sorted once here, so Aggregate can be called for
+many era lengths in a row.
+'''
+class EraAggregator:
+
+	def __init__(self, values, years, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+		values = np.asarray(values, dtype=np.float64)
+		years = np.asarray(years, dtype=np.int64)
+		in_range = years >= first_year
+		order = np.argsort(values[in_range], kind='mergesort')
+		self.values = values[in_range][order]
+		self.years = years[in_range][order]
+		self.first_year = first_year
+		self.last_year = last_year
+
+	'''
+	Returns a map with the statistics of every era of |era_length| years:
+		"eras" = the first year of every era
+		"count", "sum", "mean", "std" (population standard deviation), "median" = arrays by era
+		"quantiles" = an array with one row per level of |quantiles| (linearly interpolated, as
+		              np.percentile does) and one column per era
+	'''
+	def Aggregate(self, era_length=10, quantiles=DEFAULT_QUANTILES):
+		eras = np.arange(self.first_year, self.last_year + 1, era_length)
+		values = self.values
+		era_indices = (self.years - self.first_year) // era_length
+		in_range = era_indices < len(eras)
+		if not in_range.all():
+			values, era_indices = values[in_range], era_indices[in_range]
+		counts = np.bincount(era_indices, minlength=len(eras))
+		divisors = np.maximum(counts, 1)
+		sums = np.bincount(era_indices, weights=values, minlength=len(eras))
+		means = sums / divisors
+		deviations = values - means[era_indices]
+		stds = np.sqrt(np.bincount(era_indices, weights=deviations * deviations, minlength=len(eras)) / divisors)
+
+		# The values are sorted, so a stable sort by era leaves the values of every era sorted
+		sorted_values = values[np.argsort(era_indices, kind='mergesort')]
+		era_starts = np.cumsum(counts) - counts
+		return {"eras": eras, "count": counts, "sum": sums, "mean": means, "std": stds,
+		        "median": _GetQuantile(sorted_values, era_starts, counts, 0.5),
+		        "quantiles": np.array([_GetQuantile(sorted_values, era_starts, counts, level) for level in quantiles]).reshape(len(quantiles), len(eras))}
+
+# Returns the |level| quantile of every era, given the values sorted by era and then by value.
+def _GetQuantile(sorted_values, era_starts, counts, level):
+	quantile = np.zeros(len(counts), dtype=np.float64)
+	nonempty = counts > 0
+	positions = era_starts[nonempty] + level * (counts[nonempty] - 1)
+	lower = np.floor(positions).astype(np.int64)
+	upper = np.ceil(positions).astype(np.int64)
+	fraction = positions - lower
+	quantile[nonempty] = sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+	return quantile
+
+'''
+Returns the statistics of |values| by eras of |era_length| years (see EraAggregator.Aggregate).
+'''
+def AggregateByEra(values, years, era_length=10, first_year=FIRST_YEAR, last_year=LAST_YEAR, quantiles=DEFAULT_QUANTILES):
+	return EraAggregator(values, years, first_year, last_year).Aggregate(era_length, quantiles)
+
+'''
+Returns a map from the first year of every era to its |statistic| (e.g. "mean" or "count") in the
+result of AggregateByEra.
+'''
+def GetEraMap(stats, statistic="mean"):
+	return dict(zip(stats["eras"].tolist(), stats[statistic].tolist()))
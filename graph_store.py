@@ -0,0 +1,257 @@
+from WordNet import WordNet
+from metric_store import MapArchive
+from null_model import NULL_MODEL_SEED
+from wordnet_csr import CSRGraph, GetInducedSubgraph, GetSubgraphKey, GetSubgraphMasks
+from wordnet_snapshot import GetSnapshotKey
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+
+'''
+Read-only exports of the WordNet graph variants which any number of processes can open at once. An
+export is a directory holding one uncompressed .npz file per graph variant with the arrays of its
+CSR graph and transpose (see wordnet_csr.py), its per-node years and parts of speech, and its words
+(as one byte blob with offsets), plus the years of the time data and a manifest.
+
+Every array is memory-mapped in place when an export is opened (see metric_store.MapArchive), so
+opening it is instant, nothing is copied into the heap of the process, and all processes reading
+the same export (e.g. wordnet_stats.py, compute_centralities.py and the branching scripts running
+side by side) share a single physical copy of it through the page cache, instead of holding their
+own TNEANet graphs and node/word dicts. The arrays are read-only: an export never changes once
+written, and exports are keyed like the snapshots of wordnet_snapshot.py, so changed input files
+result in a fresh export.
+'''
+
+# Bump whenever the layout or the contents of the exported arrays change.
+GRAPH_STORE_VERSION = 2
+
+MANIFEST_FILENAME = "manifest.json"
+TIME_DATA_FILENAME = "time_data.npz"
+
+'''
+Returns the directory in which the export with the given key (see GetSnapshotKey) lives.
+'''
+def GetGraphStoreDirectory(cache_dir, key):
+	return os.path.join(cache_dir, "graphs-" + key)
+
+'''
+Opens the export of the WordNet built from the given files (see WordNet.__init__ for the arguments)
+in |cache_dir|, exporting it first if it does not exist yet. The WordNet is only built (or loaded
+from its snapshot in the same |cache_dir|) for the export.
+'''
+def OpenGraphStore(filenames, time_data_file, is_null_model=False, cache_dir="data/cache", null_model_seed=NULL_MODEL_SEED):
+	key = GetSnapshotKey(filenames, time_data_file, is_null_model, null_model_seed)
+	directory = GetGraphStoreDirectory(cache_dir, key)
+	manifest = _ReadManifest(directory)
+	if manifest is None or manifest["version"] != GRAPH_STORE_VERSION:
+		wordnet = WordNet(filenames, time_data_file, is_null_model, cache_dir=cache_dir, graphs=[], null_model_seed=null_model_seed)
+		ExportGraphStore(wordnet, directory, key)
+		del wordnet
+	return GraphStore(directory)
+
+'''
+Exports the graph variants with the given |names| of |wordnet| to |directory|, replacing any export
+there. The export is assembled in a temporary directory and then renamed into place so that a crash
+never leaves a half-written export behind; processes which still map a replaced export keep reading
+its (unlinked) files.
+'''
+def ExportGraphStore(wordnet, directory, key=None, names=WordNet.GRAPH_NAMES):
+	parent = os.path.dirname(os.path.abspath(directory))
+	if not os.path.isdir(parent):
+		os.makedirs(parent)
+
+	temp_directory = tempfile.mkdtemp(dir=parent)
+	try:
+		for name in names:
+			_ExportGraph(wordnet, name, os.path.join(temp_directory, name + ".npz"))
+		np.savez(os.path.join(temp_directory, TIME_DATA_FILENAME), years=wordnet.GetTimeDataYears())
+		with open(os.path.join(temp_directory, MANIFEST_FILENAME), 'w') as file:
+			json.dump({"version": GRAPH_STORE_VERSION, "key": key, "graphs": list(names)}, file)
+
+		if os.path.isdir(directory):
+			shutil.rmtree(directory)
+		os.rename(temp_directory, directory)
+	except:
+		shutil.rmtree(temp_directory, ignore_errors=True)
+		raise
+
+def _ExportGraph(wordnet, name, filename):
+	csr = wordnet.GetCSRGraph(name)
+	transpose = csr.GetTranspose()
+	word_node_ids = np.array(sorted(csr.node_to_word.keys()), dtype=np.int64)
+	words = [csr.node_to_word[node_id] for node_id in word_node_ids.tolist()]
+	word_offsets = np.zeros(len(words) + 1, dtype=np.int64)
+	np.cumsum([len(word) for word in words], out=word_offsets[1:])
+
+	np.savez(filename, node_ids=csr.node_ids, offsets=csr.offsets, targets=csr.targets, symbols=csr.symbols,
+	         weights=csr.weights, sources=csr.GetSources(),
+	         transpose_offsets=transpose.offsets, transpose_targets=transpose.targets, transpose_symbols=transpose.symbols,
+	         transpose_weights=transpose.weights, transpose_sources=transpose.GetSources(),
+	         years=wordnet.GetNodeYears(name), parts_of_speech=wordnet.GetNodePartsOfSpeech(name),
+	         word_node_ids=word_node_ids, word_offsets=word_offsets,
+	         word_bytes=np.array(bytearray("".join(words)), dtype=np.uint8),
+	         word_order=np.array(sorted(range(len(words)), key=words.__getitem__), dtype=np.int64))
+
+# Returns the manifest of the export in |directory|, or None if there is no (complete) export there.
+def _ReadManifest(directory):
+	filename = os.path.join(directory, MANIFEST_FILENAME)
+	if not os.path.isfile(filename): return None
+	with open(filename, 'r') as file:
+		return json.load(file)
+
+'''
+An export opened by OpenGraphStore (or directly from its |directory|). It offers the read-only
+accessors of WordNet which work on the CSR graphs (GetCSRGraph, GetNodeYears, GetNodeDecades,
+GetNodePartsOfSpeech, GetSubgraph and GetTimeDataYears), so it can stand in for a WordNet in the
+analysis scripts. Contains the following instance variables:
+	1. directory = the directory holding the export
+	2. manifest = the version, key and graph names of the export
+	3. csr_graphs = a map from graph names to CSR graphs over the mapped arrays (opened on first use)
+	4. node_arrays = a map from (kind, graph name) to the mapped per-node arrays
+	5. subgraphs = a map from filter keys to the CSR subgraphs of GetSubgraph (built on demand)
+'''
+class GraphStore:
+
+	def __init__(self, directory):
+		self.manifest = _ReadManifest(directory)
+		if self.manifest is None:
+			raise IOError("no graph export in {0}".format(directory))
+		if self.manifest["version"] != GRAPH_STORE_VERSION:
+			raise ValueError("{0} holds an export of version {1}, not {2}".format(directory, self.manifest["version"], GRAPH_STORE_VERSION))
+		self.directory = directory
+		self.csr_graphs = {}
+		self.node_arrays = {}
+		self.subgraphs = {}
+
+	def GetGraphNames(self):
+		return list(self.manifest["graphs"])
+
+	'''
+	Returns the CSR graph of the given variant, with node_to_word and word_to_node maps (see
+	MappedWordTable) and a precomputed transpose, all over the mapped arrays.
+	'''
+	def GetCSRGraph(self, name="time_directed_graph_no_supernodes"):
+		if name not in self.csr_graphs:
+			self.__OpenGraph(name)
+		return self.csr_graphs[name]
+
+	def GetNodeYears(self, name="time_directed_graph_no_supernodes"):
+		self.GetCSRGraph(name)
+		return self.node_arrays[("years", name)]
+
+	def GetNodeDecades(self, name="time_directed_graph_no_supernodes"):
+		if ("decades", name) not in self.node_arrays:
+			years = self.GetNodeYears(name)
+			self.node_arrays[("decades", name)] = np.where(years != WordNet.NO_YEAR, years - years % 10, WordNet.NO_YEAR).astype(np.int16)
+		return self.node_arrays[("decades", name)]
+
+	def GetNodePartsOfSpeech(self, name="time_directed_graph_no_supernodes"):
+		self.GetCSRGraph(name)
+		return self.node_arrays[("parts_of_speech", name)]
+
+	'''
+	Returns the cached subgraph with the given filters (see WordNet.GetSubgraph).
+	'''
+	def GetSubgraph(self, name="time_directed_graph_no_supernodes", first_year=None, last_year=None, parts_of_speech=None,
+	                symbols=None, include_supernodes=True):
+		key = GetSubgraphKey(name, first_year, last_year, parts_of_speech, symbols, include_supernodes)
+		if key not in self.subgraphs:
+			csr = self.GetCSRGraph(name)
+			codes = None if parts_of_speech is None else sum(WordNet.PARTS_OF_SPEECH_CODES[pos] for pos in set(parts_of_speech))
+			node_mask, edge_mask = GetSubgraphMasks(csr, self.GetNodeYears(name), self.GetNodePartsOfSpeech(name), first_year,
+			                                        last_year, codes, symbols, include_supernodes)
+			self.subgraphs[key] = GetInducedSubgraph(csr, node_mask, edge_mask)
+		return self.subgraphs[key]
+
+	def GetTimeDataYears(self):
+		if ("time_data_years", None) not in self.node_arrays:
+			self.node_arrays[("time_data_years", None)] = MapArchive(os.path.join(self.directory, TIME_DATA_FILENAME))["years"]
+		return self.node_arrays[("time_data_years", None)]
+
+	def __OpenGraph(self, name):
+		if name not in self.manifest["graphs"]:
+			raise ValueError("{0} does not hold the graph {1}".format(self.directory, name))
+		arrays = MapArchive(os.path.join(self.directory, name + ".npz"))
+		node_to_word = MappedWordTable(arrays)
+		word_to_node = MappedWordTable(arrays, by_word=True)
+
+		csr = CSRGraph(arrays["node_ids"], arrays["offsets"], arrays["targets"], arrays["symbols"], arrays["weights"],
+		               node_to_word, word_to_node)
+		csr.sources = arrays["sources"]
+		csr.transpose = CSRGraph(arrays["node_ids"], arrays["transpose_offsets"], arrays["transpose_targets"],
+		                         arrays["transpose_symbols"], arrays["transpose_weights"], node_to_word, word_to_node)
+		csr.transpose.sources = arrays["transpose_sources"]
+		self.csr_graphs[name] = csr
+		self.node_arrays[("years", name)] = arrays["years"]
+		self.node_arrays[("parts_of_speech", name)] = arrays["parts_of_speech"]
+
+'''
+A read-only map between the word nodes of an exported graph and their words, looked up in the mapped
+word arrays of the export instead of a dict. Maps node ids to words like the node_to_word maps of
+WordNet, or words to node ids like word_to_node if |by_word|. Node ids are found by binary search in
+the sorted word_node_ids, and words by binary search in word_order (the word positions sorted by
+word).
+'''
+class MappedWordTable:
+
+	def __init__(self, arrays, by_word=False):
+		self.node_ids = arrays["word_node_ids"]
+		self.offsets = arrays["word_offsets"]
+		self.word_bytes = arrays["word_bytes"]
+		self.word_order = arrays["word_order"]
+		self.by_word = by_word
+
+	def __len__(self):
+		return len(self.node_ids)
+
+	def __contains__(self, key):
+		return self.__Find(key) is not None
+
+	def __getitem__(self, key):
+		position = self.__Find(key)
+		if position is None: raise KeyError(key)
+		return self.__GetValue(position)
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def get(self, key, default=None):
+		position = self.__Find(key)
+		return default if position is None else self.__GetValue(position)
+
+	def keys(self):
+		if self.by_word:
+			return [self.GetWord(position) for position in range(len(self))]
+		return self.node_ids.tolist()
+
+	def values(self):
+		return [self.__GetValue(position) for position in range(len(self))]
+
+	def items(self):
+		return zip(self.keys(), self.values())
+
+	'''
+	Returns the word at the given position (in node id order).
+	'''
+	def GetWord(self, position):
+		return self.word_bytes[self.offsets[position]:self.offsets[position+1]].tostring()
+
+	def __GetValue(self, position):
+		return int(self.node_ids[position]) if self.by_word else self.GetWord(position)
+
+	# Returns the position (in node id order) of the given node id or word, or None if it is not in the table.
+	def __Find(self, key):
+		if not self.by_word:
+			position = int(np.searchsorted(self.node_ids, key))
+			if position < len(self.node_ids) and self.node_ids[position] == key: return position
+			return None
+
+		low, high = 0, len(self.word_order)
+		while low < high:
+			middle = (low + high) // 2
+			if self.GetWord(self.word_order[middle]) < key: low = middle + 1
+			else: high = middle
+		if low < len(self.word_order) and self.GetWord(self.word_order[low]) == key: return int(self.word_order[low])
+		return None
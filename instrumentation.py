@@ -0,0 +1,113 @@
+import contextlib
+import gc
+import json
+import resource
+import time
+
+'''
+Wall time and memory measurements for named phases of a run. Peak memory is read from the kernel's
+RSS high-water mark (VmHWM), which is reset at the start of every phase through
+/proc/self/clear_refs, so each phase reports its own peak rather than the peak of the whole
+process. Where that is unavailable (e.g. not on Linux) the process-wide ru_maxrss is reported
+instead and "peak_is_process_wide" is set. Since resetting the high-water mark also resets it for
+anyone else watching the peak of the process (callers, external monitors), memory is only measured
+by recorders which ask for it; the others only record wall time.
+'''
+
+# Peaks of the phases which are still running (of every recorder, since they share the high-water
+# mark), outermost first. A nested phase resets the high-water mark, so the peaks it saw are folded
+# into the enclosing phases whenever it starts or ends.
+_running_peaks = []
+
+'''
+Returns the current and peak resident set size of this process in kB as (rss, peak).
+'''
+def GetMemoryUsage():
+	rss, peak = None, None
+	try:
+		with open("/proc/self/status", 'r') as file:
+			for line in file:
+				if line.startswith("VmRSS:"): rss = int(line.split()[1])
+				elif line.startswith("VmHWM:"): peak = int(line.split()[1])
+	except IOError:
+		pass
+	if peak is None: peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if rss is None: rss = peak
+	return rss, peak
+
+'''
+Resets the peak resident set size of this process to its current size. Returns False if the
+kernel does not support it.
+'''
+def ResetPeakMemoryUsage():
+	try:
+		with open("/proc/self/clear_refs", 'w') as file:
+			file.write("5")
+		return True
+	except IOError:
+		return False
+
+def _FoldPeak():
+	rss, peak = GetMemoryUsage()
+	_running_peaks[:] = [max(running_peak, peak) for running_peak in _running_peaks]
+	return rss, peak
+
+'''
+Records phases measured with Measure() in the order in which they finish. Contains the following
+instance variables:
+	1. phases = list with one map per finished phase: its name, seconds of wall time and, if
+	            |measure_memory|, the peak and final resident set size and their increase over the
+	            size at its start (kB) and, if |count_objects|, the number of objects tracked by the
+	            garbage collector at its end and their increase.
+	2. count_objects = whether to count objects (a full scan of the heap per phase boundary).
+	3. measure_memory = whether to measure memory (which resets the peak RSS of the process at
+	                    every phase boundary, see above).
+'''
+class PhaseRecorder:
+
+	def __init__(self, count_objects=False, measure_memory=True):
+		self.phases = []
+		self.count_objects = count_objects
+		self.measure_memory = measure_memory
+
+	'''
+	Context manager measuring the phase |name| (phases may be nested).
+	'''
+	@contextlib.contextmanager
+	def Measure(self, name):
+		if self.measure_memory:
+			_FoldPeak()
+			exact_peak = ResetPeakMemoryUsage()
+			start_rss, start_peak = GetMemoryUsage()
+			_running_peaks.append(start_peak)
+		start_objects = len(gc.get_objects()) if self.count_objects else None
+		start_time = time.time()
+		try:
+			yield
+		finally:
+			seconds = time.time() - start_time
+			phase = {"name": name, "seconds": seconds}
+			if self.measure_memory:
+				rss, peak = _FoldPeak()
+				peak = _running_peaks.pop()
+				phase.update({"peak_rss_kb": peak, "rss_kb": rss, "peak_rss_increase_kb": peak - start_rss,
+				              "rss_increase_kb": rss - start_rss})
+				if not exact_peak: phase["peak_is_process_wide"] = True
+			if self.count_objects:
+				phase["objects"] = len(gc.get_objects())
+				phase["objects_increase"] = phase["objects"] - start_objects
+			self.phases.append(phase)
+
+	'''
+	Returns a map from phase name to its measurements.
+	'''
+	def GetReport(self):
+		return {phase["name"]: phase for phase in self.phases}
+
+	'''
+	Returns the phases (from the |start|-th on) and the |extra| fields as a single JSON line.
+	'''
+	def ToJSON(self, start=0, **extra):
+		report = dict(extra)
+		report["phases"] = self.phases[start:]
+		return json.dumps(report, sort_keys=True)
@@ -0,0 +1,129 @@
+import numpy as np
+import os
+import zipfile
+
+'''
+Columnar on-disk store for per-node metrics. A metric table is an uncompressed .npz file with one
+array per column: node_id, year and parts_of_speech (the bitmask of WordNet.GetNodePartsOfSpeech)
+for every node, plus any number of value columns, e.g. "branching_factor_2" (see GetMetricColumn).
+Several metrics share one table, each adding its own columns. The rows are sorted by year (then
+node id), so the nodes of any range of years are a contiguous slice of every column.
+
+Because np.savez stores every array uncompressed, LoadMetricTable memory-maps the columns in place
+instead of reading them: opening a table is instant, only the columns (and rows) which are used get
+paged in, and year buckets are plain slices of the mapped arrays.
+'''
+
+BASE_COLUMNS = ["node_id", "year", "parts_of_speech"]
+
+'''
+Returns the name of the column holding |metric| at the given |depth| (just |metric| without one).
+'''
+def GetMetricColumn(metric, depth=None):
+	return metric if depth is None else "{0}_{1}".format(metric, depth)
+
+'''
+A metric table loaded by LoadMetricTable. Contains the following instance variables:
+	1. filename = the .npz file holding the table
+	2. columns = a map from column names to (read-only, memory-mapped) arrays
+'''
+class MetricTable:
+
+	def __init__(self, filename, columns):
+		self.filename = filename
+		self.columns = columns
+
+	def __getitem__(self, name):
+		return self.columns[name]
+
+	def __contains__(self, name):
+		return name in self.columns
+
+	def GetRows(self):
+		return len(self.columns["node_id"])
+
+	'''
+	Returns the names of the value columns (every column but BASE_COLUMNS).
+	'''
+	def GetValueColumns(self):
+		return sorted(name for name in self.columns.keys() if name not in BASE_COLUMNS)
+
+	'''
+	Returns the slice of rows whose year is in [first_year, last_year].
+	'''
+	def GetYearSlice(self, first_year, last_year):
+		years = self.columns["year"]
+		return slice(np.searchsorted(years, first_year, side='left'), np.searchsorted(years, last_year, side='right'))
+
+	'''
+	Returns a list of (bucket start year, slice of rows) for the buckets of |width| years starting
+	at first_year, first_year + width, ... up to the bucket holding |last_year|.
+	'''
+	def GetYearBuckets(self, width, first_year, last_year):
+		starts = np.arange(first_year, last_year + 1, width)
+		bounds = np.searchsorted(self.columns["year"], np.append(starts, starts[-1] + width), side='left')
+		return [(int(start), slice(int(bounds[i]), int(bounds[i+1]))) for i, start in enumerate(starts)]
+
+'''
+Adds the value |columns| (a map from column names to arrays aligned with |node_ids|) to the metric
+table in |filename|, creating the table if it does not exist. Columns of the same names are
+replaced and the other columns are kept; an existing table must hold the same nodes. The table is
+written under a temporary name and renamed into place.
+'''
+def SaveMetricTable(filename, node_ids, years, parts_of_speech, columns):
+	node_ids = np.asarray(node_ids, dtype=np.int64)
+	order = np.lexsort((node_ids, years))
+	table = {"node_id": node_ids[order], "year": np.asarray(years, dtype=np.int16)[order],
+	         "parts_of_speech": np.asarray(parts_of_speech, dtype=np.uint8)[order]}
+
+	if os.path.isfile(filename):
+		existing = LoadMetricTable(filename)
+		if not np.array_equal(existing["node_id"], table["node_id"]) or not np.array_equal(existing["year"], table["year"]):
+			raise ValueError("{0} holds the metrics of different nodes".format(filename))
+		for name in existing.GetValueColumns():
+			table[name] = np.array(existing[name])
+		del existing
+
+	for name, values in columns.items():
+		if name in BASE_COLUMNS: raise ValueError("{0} is not a value column".format(name))
+		table[name] = np.asarray(values)[order]
+
+	directory = os.path.dirname(os.path.abspath(filename))
+	if not os.path.isdir(directory): os.makedirs(directory)
+	with open(filename + ".tmp", 'wb') as file:
+		np.savez(file, **table)
+	os.rename(filename + ".tmp", filename)
+
+'''
+Opens the metric table in |filename|, memory-mapping every column.
+'''
+def LoadMetricTable(filename):
+	return MetricTable(filename, MapArchive(filename))
+
+'''
+Returns a map from the array names of the uncompressed .npz file |filename| (as written by np.savez)
+to read-only memory maps of the arrays. Every process mapping the same file shares the pages of the
+arrays through the page cache.
+'''
+def MapArchive(filename):
+	arrays = {}
+	with zipfile.ZipFile(filename, 'r') as archive, open(filename, 'rb') as file:
+		for info in archive.infolist():
+			if info.compress_type != zipfile.ZIP_STORED:
+				raise ValueError("{0} is compressed and cannot be memory-mapped".format(filename))
+			arrays[os.path.splitext(info.filename)[0]] = _MapArray(filename, file, info)
+	return arrays
+
+# Maps the .npy member |info| of an uncompressed zip archive. The member's data starts after its
+# local file header (30 bytes plus the name and extra fields) and the .npy header.
+def _MapArray(filename, file, info):
+	file.seek(info.header_offset + 26)
+	name_length, extra_length = np.frombuffer(file.read(4), dtype='<u2')
+	file.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+	version = np.lib.format.read_magic(file)
+	if version == (1, 0):
+		shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+	else:
+		shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+	if np.prod(shape) == 0: return np.zeros(shape, dtype=dtype)
+	return np.memmap(filename, dtype=dtype, mode='r', offset=file.tell(), shape=shape, order='F' if fortran_order else 'C')
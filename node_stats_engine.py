@@ -0,0 +1,65 @@
+import numpy as np
+
+from bfs_engine import LANES
+from centrality_engine import ComputeClosenessBatches
+from clustering_engine import AddTriangleCounts, CountForwardTriangles, GetClusteringCoefficients, GetForwardGraph, GetSimpleUndirectedCSR
+from parallel import RunParallel
+
+'''
+Fused per-node statistics over one CSR graph from wordnet_csr.py, replacing the separate SNAP passes
+of the stats scripts (GetNodeOutDegV, GetNodeInDegV, a GetNodeClustCf and a GetDegreeCentr call per
+node on a ConvertGraph copy, and one closeness search per node). Every node range of the process
+pool counts the triangles of its nodes (see clustering_engine.py) and runs the closeness searches
+of its nodes (see centrality_engine.py) over the same shared arrays, and the degrees come straight
+from the CSR offsets, so the graph is only traversed once and never copied into SNAP.
+'''
+
+# The columns of the ComputeNodeStatistics array.
+NODE_STATISTICS = ["in_degree", "out_degree", "degree_centrality", "clustering", "closeness"]
+
+'''
+Computes every statistic of NODE_STATISTICS for all nodes of |csr| and returns them as the columns
+of one structured float64 array indexed like the nodes of |csr|:
+	in_degree, out_degree = the numbers of in- and out-edges, parallel edges included (as SNAP's
+	                        GetNodeInDegV and GetNodeOutDegV on the TNEANet graphs)
+	degree_centrality = the degree of the node in the undirected copy of the graph over the number
+	                    of other nodes (as SNAP's GetDegreeCentr on ConvertGraph(PUNGraph, graph))
+	clustering = the local clustering coefficient (as SNAP's GetNodeClustCf)
+	closeness = the normalized, directed closeness centrality (as SNAP's GetClosenessCentr); only
+	            computed for the given |sources| (all nodes by default) and 0 for the others
+'''
+def ComputeNodeStatistics(csr, sources=None, processes=None, verbose=False):
+	num_nodes = csr.GetNodes()
+	is_source = np.zeros(num_nodes, dtype=bool)
+	is_source[np.arange(num_nodes) if sources is None else np.asarray(sources)] = True
+
+	undirected = GetSimpleUndirectedCSR(csr)
+	forward, edge_ids = GetForwardGraph(undirected)
+	# Build the lazily computed arrays once here so that forked workers share them.
+	csr.GetSources(); csr.GetTranspose()
+
+	shared = (csr, forward, edge_ids, is_source)
+	results = RunParallel(_ComputeNodeStatisticsRange, shared, num_nodes, processes, align=LANES, verbose=verbose)
+
+	statistics = np.zeros(num_nodes, dtype=[(name, np.float64) for name in NODE_STATISTICS])
+	statistics["in_degree"] = csr.GetInDegrees()
+	statistics["out_degree"] = csr.GetOutDegrees()
+	# The undirected copy has one edge per pair of neighbors, and a self-loop adds 1 to the degree
+	has_loop = np.zeros(num_nodes, dtype=bool)
+	has_loop[csr.GetSources()[csr.GetSources() == csr.targets]] = True
+	if num_nodes > 1:
+		statistics["degree_centrality"] = (undirected.GetOutDegrees() + has_loop) / float(num_nodes - 1)
+	if len(results) > 0:
+		statistics["clustering"] = GetClusteringCoefficients(AddTriangleCounts(num_nodes, [triangles for triangles, closeness in results]),
+		                                                     undirected.GetOutDegrees())
+		statistics["closeness"] = np.concatenate([closeness for triangles, closeness in results])
+	return statistics
+
+def _ComputeNodeStatisticsRange(shared, start, end):
+	csr, forward, edge_ids, is_source = shared
+	triangles = CountForwardTriangles(forward, edge_ids, start, end)
+
+	closeness = np.zeros(end - start, dtype=np.float64)
+	sources = np.nonzero(is_source[start:end])[0]
+	closeness[sources] = ComputeClosenessBatches(csr, sources + start)
+	return triangles, closeness
@@ -0,0 +1,363 @@
+import numpy as np
+
+from parallel import RunParallel
+from wordnet_csr import CSRFromEdges
+from wordnet_parser import Pointer
+
+'''
+Vectorized null-model generators. Random edges are drawn in bulk with NumPy and de-duplicated by
+sorting their encoded ids (source * num_nodes + target) instead of being drawn and checked one at
+a time. Every generator takes a np.random.RandomState, so each null model is reproducible from its
+seed, and RunEnsemble produces several independently seeded null models in parallel so that real
+statistics can be compared against a confidence interval rather than a single random draw.
+DoubleEdgeSwap randomizes a CSR graph while keeping the degree of every node, and
+RunDoubleEdgeSwapEnsemble builds seeded ensembles of such graphs.
+'''
+
+# Seed of the null model built by WordNet(..., is_null_model=True) unless another one is given.
+NULL_MODEL_SEED = 7
+
+'''
+Returns the ids of the given edges: source * num_nodes + target, with the smaller endpoint first if
+the edges are undirected.
+'''
+def EncodeEdges(sources, targets, num_nodes, directed=True):
+	sources = np.asarray(sources, dtype=np.int64)
+	targets = np.asarray(targets, dtype=np.int64)
+	if not directed:
+		sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+	return sources * num_nodes + targets
+
+'''
+Returns the (sources, targets) arrays of the given edge ids.
+'''
+def DecodeEdges(edge_ids, num_nodes):
+	return edge_ids // num_nodes, edge_ids % num_nodes
+
+'''
+Draws |num_edges| distinct edges without self-loops. |draw|(random_state, count) returns the
+(sources, targets) arrays of |count| candidate edges. Every round draws exactly as many candidates
+as are still missing and keeps the new distinct ones, which yields the same distribution as drawing
+one edge at a time and rejecting repeats. Edges whose ids are in the sorted array |exclude| are
+rejected too. Returns the sorted array of edge ids.
+'''
+def DrawDistinctEdges(draw, num_edges, num_nodes, random_state, directed=True, exclude=None):
+	edge_ids = np.zeros(0, dtype=np.int64)
+	while len(edge_ids) < num_edges:
+		sources, targets = draw(random_state, num_edges - len(edge_ids))
+		loops = sources == targets
+		candidates = EncodeEdges(sources[~loops], targets[~loops], num_nodes, directed)
+		if exclude is not None and len(exclude) > 0:
+			candidates = candidates[~np.in1d(candidates, exclude)]
+		edge_ids = np.union1d(edge_ids, candidates)
+	return edge_ids
+
+'''
+Returns a draw function for DrawDistinctEdges picking both endpoints uniformly among |num_nodes|
+nodes (offset by |first_node|).
+'''
+def UniformEdges(num_nodes, first_node=0):
+	def draw(random_state, count):
+		return random_state.randint(num_nodes, size=count) + first_node, random_state.randint(num_nodes, size=count) + first_node
+	return draw
+
+'''
+Draws |count| ordered pairs of distinct integers in [0, num_items).
+'''
+def DrawDistinctPairs(num_items, count, random_state):
+	first = random_state.randint(num_items, size=count)
+	second = random_state.randint(num_items - 1, size=count)
+	second += second >= first
+	return first, second
+
+'''
+Randomly moves around the connections between supernodes and the connections between words in
+seperate synsets to generate a null-model (see WordNet.__ShuffleSynsetConnections). The number of
+pointers of each kind is kept, and so is the way they are drawn: two distinct synsets uniformly at
+random, and for word pointers a uniformly random word of each. Repeated connections are redrawn, so
+the null model has no parallel edges.
+'''
+def ShuffleSynsetConnections(synsets, random_state):
+	# Count the relevant edges and remove all pointers from synsets
+	between_synsets = 0
+	across_synsets = 0
+	for synset in synsets.values():
+		for pointer in synset["pointers"]:
+			src_key, src, dst_key, dst = pointer["connection"]
+			if src == 0 and dst == 0:
+				between_synsets += 1
+			else:
+				across_synsets += 1
+		synset["pointers"] = list()
+
+	keys = sorted(synsets.keys())
+	if len(keys) < 2: return synsets
+	word_counts = np.array([len(synsets[key]["words"]) for key in keys], dtype=np.int64)
+	slot_offsets = np.concatenate(([0], np.cumsum(word_counts)))
+
+	def AddPointers(src_key, src, dst_key, dst):
+		src_synset, dst_synset = synsets[src_key], synsets[dst_key]
+		src_synset["pointers"].append(Pointer("unknown", dst_synset["synset_type"], (src_key, src, dst_key, dst)))
+		dst_synset["pointers"].append(Pointer("unknown", src_synset["synset_type"], (dst_key, dst, src_key, src)))
+
+	# Randomly generate between-synset edges
+	edge_ids = DrawDistinctEdges(lambda state, count: DrawDistinctPairs(len(keys), count, state), between_synsets/2,
+	                             len(keys), random_state, directed=False)
+	for index1, index2 in zip(*[indices.tolist() for indices in DecodeEdges(edge_ids, len(keys))]):
+		AddPointers(keys[index1], 0, keys[index2], 0)
+
+	# Randomly generate across-synset edges. Words are identified by their slot (offset of their
+	# synset + position in it) so that repeated word pairs can be found by their encoded ids.
+	def DrawWordPairs(state, count):
+		first, second = DrawDistinctPairs(len(keys), count, state)
+		first_words = (state.random_sample(count) * word_counts[first]).astype(np.int64)
+		second_words = (state.random_sample(count) * word_counts[second]).astype(np.int64)
+		return slot_offsets[first] + first_words, slot_offsets[second] + second_words
+
+	num_slots = int(slot_offsets[-1])
+	edge_ids = DrawDistinctEdges(DrawWordPairs, across_synsets/2, num_slots, random_state, directed=False)
+	for slot1, slot2 in zip(*[slots.tolist() for slots in DecodeEdges(edge_ids, num_slots)]):
+		index1 = np.searchsorted(slot_offsets, slot1, side='right') - 1
+		index2 = np.searchsorted(slot_offsets, slot2, side='right') - 1
+		AddPointers(keys[index1], slot1 - int(slot_offsets[index1]) + 1, keys[index2], slot2 - int(slot_offsets[index2]) + 1)
+
+	return synsets
+
+'''
+Generates the synset null model of nullmodeldir.py / nullmodelundir.py as edge arrays. The graph
+has |num_supernodes| super-nodes (ids 0 .. num_supernodes - 1) followed by |num_words| word nodes:
+	1. |num_supernode_edges| distinct random edges between super-nodes.
+	2. |synset_sizes|[size] synsets of each size on distinct random super-nodes, each connected to
+	   that many random words (in both directions if |directed|).
+	3. Edges between every two words of a synset (in a random direction if |directed|).
+	4. |num_across_edges| edges between a random word of each of two distinct random synsets.
+Returns (num_nodes, sources, targets) with every edge listed once (duplicates removed).
+'''
+def GenerateSynsetNullModel(num_supernodes, num_words, num_supernode_edges, synset_sizes, num_across_edges,
+                            directed, random_state):
+	num_nodes = num_supernodes + num_words
+	sizes = np.repeat(np.array(sorted(synset_sizes.keys()), dtype=np.int64),
+	                  [synset_sizes[size] for size in sorted(synset_sizes.keys())])
+	edge_ids = [DrawDistinctEdges(UniformEdges(num_supernodes), num_supernode_edges, num_nodes, random_state, directed)]
+
+	# Synsets with their (possibly repeated) random words
+	supernodes = random_state.choice(num_supernodes, len(sizes), replace=False)
+	starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+	member_synsets = np.repeat(np.arange(len(sizes)), sizes)
+	members = random_state.randint(num_supernodes, num_nodes, size=len(member_synsets))
+	edge_ids.append(EncodeEdges(supernodes[member_synsets], members, num_nodes, directed))
+	if directed:
+		edge_ids.append(EncodeEdges(members, supernodes[member_synsets], num_nodes, directed))
+
+	# Every ordered pair of positions within each synset
+	counts = sizes[member_synsets]
+	first = np.repeat(np.arange(len(members)), counts)
+	second = starts[member_synsets[first]] + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+	keep = members[first] != members[second]
+	first, second = members[first[keep]], members[second[keep]]
+	if directed:
+		flip = random_state.random_sample(len(first)) < 0.5
+		first, second = np.where(flip, second, first), np.where(flip, first, second)
+	edge_ids.append(EncodeEdges(first, second, num_nodes, directed))
+
+	# Edges across synsets
+	first, second = DrawDistinctPairs(len(sizes), num_across_edges, random_state)
+	first = members[starts[first] + (random_state.random_sample(num_across_edges) * sizes[first]).astype(np.int64)]
+	second = members[starts[second] + (random_state.random_sample(num_across_edges) * sizes[second]).astype(np.int64)]
+	loops = first == second
+	edge_ids.append(EncodeEdges(first[~loops], second[~loops], num_nodes, directed))
+
+	sources, targets = DecodeEdges(np.unique(np.concatenate(edge_ids)), num_nodes)
+	return num_nodes, sources, targets
+
+'''
+Returns the seed of the null model with the given |index| in an ensemble seeded with |seed|.
+Seeds of this form (accepted by np.random.RandomState and WordNet's null_model_seed) give
+independent random streams for every model.
+'''
+def GetModelSeed(seed, index):
+	return [seed, index]
+
+def _RunEnsembleRange(shared, start, end):
+	function, function_shared, seed = shared
+	return [function(function_shared, GetModelSeed(seed, index)) for index in range(start, end)]
+
+'''
+Builds |num_models| null models on |processes| workers (see parallel.py) and returns the list of
+function(shared, model_seed) results in model order, where model_seed = GetModelSeed(seed, index).
+|function| typically generates one null model from its seed and returns the statistics to compare.
+'''
+def RunEnsemble(function, shared, num_models, seed=NULL_MODEL_SEED, processes=None, verbose=False):
+	results = RunParallel(_RunEnsembleRange, (function, shared, seed), num_models, processes, chunk_size=1, verbose=verbose)
+	return [result for range_results in results for result in range_results]
+
+'''
+Returns (mean, lower, upper) of a statistic over an ensemble of null models, where [lower, upper]
+is the central |confidence| interval of the ensemble values.
+'''
+def GetConfidenceInterval(values, confidence=0.95):
+	values = np.asarray(values, dtype=np.float64)
+	lower, upper = np.percentile(values, [50 * (1 - confidence), 50 * (1 + confidence)])
+	return values.mean(), lower, upper
+
+'''
+Returns a boolean array telling which of the given edge ids are in the sorted array |sorted_ids|.
+The ids are looked up in sorted order, which keeps the binary searches cache friendly.
+'''
+def _IsMember(edge_ids, sorted_ids):
+	if len(sorted_ids) == 0: return np.zeros(len(edge_ids), dtype=bool)
+	order = np.argsort(edge_ids)
+	positions = np.empty(len(edge_ids), dtype=np.int64)
+	positions[order] = np.searchsorted(sorted_ids, edge_ids[order])
+	return sorted_ids[np.minimum(positions, len(sorted_ids) - 1)] == edge_ids
+
+'''
+Returns a boolean array telling which of the given values occur more than once.
+'''
+def _IsRepeated(values):
+	unique, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+	return counts[inverse] > 1
+
+'''
+Returns the number of swaps per edge after which |key| (a diagnostic of DoubleEdgeSwap) stays
+within |tolerance| of its final value, i.e. an estimate of how long the chain takes to mix.
+'''
+def GetMixingTime(diagnostics, key="original_edges", tolerance=0.01):
+	if len(diagnostics) == 0: return 0.0
+	final = diagnostics[-1][key]
+	mixing_time = diagnostics[-1]["swaps_per_edge"]
+	for diagnostic in reversed(diagnostics):
+		if abs(diagnostic[key] - final) > tolerance: break
+		mixing_time = diagnostic["swaps_per_edge"]
+	return mixing_time
+
+'''
+Generates a degree-preserving null model of the CSR graph |csr| (see wordnet_csr.py) with a
+double-edge-swap Markov chain: two random edges a -> b and c -> d become a -> d and c -> b, which
+keeps the in- and out-degree of every node. If |directed| is False the graph must hold every edge
+in both directions (as the undirected graphs from centrality_engine.GetUndirectedCSR do); each pair
+{a, b}, {c, d} then becomes {a, d}, {c, b} or {a, c}, {b, d} with equal probability, keeping every
+degree, and self-loops stay where they are. Edges keep their symbol and weight.
+
+Swaps are attempted in batches of |batch_fraction| * edges at once. A swap is rejected if it would
+create a self-loop or an edge which is already in the graph, or if another swap of its batch uses
+the same edge or creates the same edge, so the chain never adds parallel edges. Runs
+|swaps_per_edge| * edges attempted swaps in total.
+
+Returns the randomized CSRGraph and a report map with the attempted and accepted swaps, the
+diagnostics after every batch (swaps per edge so far, the acceptance rate of the batch, the fraction
+of the original edges still present and the degree assortativity) and the mixing time estimated
+from the original edge fraction with |tolerance| (see GetMixingTime). "mixed" is False if that
+fraction only settled in the second half of the run, in which case more swaps per edge are needed.
+'''
+def DoubleEdgeSwap(csr, swaps_per_edge, random_state, directed=True, batch_fraction=0.05, tolerance=0.01):
+	num_nodes = csr.GetNodes()
+	sources = csr.GetSources().astype(np.int64)
+	targets = csr.targets.astype(np.int64)
+	symbols, weights = csr.symbols, csr.weights
+	if directed:
+		fixed = np.zeros(len(sources), dtype=bool)
+		source_degrees, target_degrees = csr.GetOutDegrees(), csr.GetInDegrees()
+	else:
+		fixed = sources == targets
+		source_degrees = target_degrees = csr.GetOutDegrees()
+	# As float64, so that the sums of degree products below cannot overflow.
+	source_degrees, target_degrees = source_degrees.astype(np.float64), target_degrees.astype(np.float64)
+	pairs = sources < targets if not directed else ~fixed
+	sources, targets = sources[pairs], targets[pairs]
+	num_edges = len(sources)
+
+	edge_ids = EncodeEdges(sources, targets, num_nodes, directed)
+	sorted_ids = np.sort(edge_ids)
+	original_ids = sorted_ids
+	is_original = np.ones(num_edges, dtype=bool)
+	num_original = num_edges
+
+	# The degree assortativity is the correlation of the degrees at both ends of the edges. Swaps
+	# keep the degrees and which edges they sit on, so only the sum of the products changes.
+	if directed:
+		x, y = source_degrees[sources], target_degrees[targets]
+	else:
+		x = source_degrees[np.concatenate((sources, targets))]
+		y = source_degrees[np.concatenate((targets, sources))]
+	x_mean, y_mean, deviations = x.mean(), y.mean(), x.std() * y.std()
+	product_sum = np.dot(x, y)
+	product_scale = 1 if directed else 2
+	batch_size = max(1, int(batch_fraction * num_edges))
+	num_swaps = int(swaps_per_edge * num_edges) if num_edges >= 2 else 0
+
+	attempted = 0
+	accepted = 0
+	diagnostics = []
+	while attempted < num_swaps:
+		count = min(batch_size, num_swaps - attempted)
+		first = random_state.randint(num_edges, size=count)
+		second = random_state.randint(num_edges, size=count)
+		a, b = sources[first], targets[first]
+		c, d = sources[second], targets[second]
+		if not directed:
+			flip = random_state.random_sample(count) < 0.5
+			c, d = np.where(flip, d, c), np.where(flip, c, d)
+		new_first = EncodeEdges(a, d, num_nodes, directed)
+		new_second = EncodeEdges(c, b, num_nodes, directed)
+
+		valid = (first != second) & (a != d) & (c != b) & (new_first != new_second)
+		valid &= ~_IsMember(new_first, sorted_ids) & ~_IsMember(new_second, sorted_ids)
+		indices = np.nonzero(valid)[0]
+		repeated = _IsRepeated(np.concatenate((first[indices], second[indices]))).reshape(2, -1).any(axis=0)
+		repeated |= _IsRepeated(np.concatenate((new_first[indices], new_second[indices]))).reshape(2, -1).any(axis=0)
+		indices = indices[~repeated]
+
+		changed = np.concatenate((first[indices], second[indices]))
+		product_sum -= product_scale * np.dot(source_degrees[sources[changed]], target_degrees[targets[changed]])
+		sources[second[indices]] = c[indices]
+		targets[second[indices]] = b[indices]
+		targets[first[indices]] = d[indices]
+		edge_ids[first[indices]] = new_first[indices]
+		edge_ids[second[indices]] = new_second[indices]
+		sorted_ids = np.sort(edge_ids)
+		product_sum += product_scale * np.dot(source_degrees[sources[changed]], target_degrees[targets[changed]])
+		num_original -= is_original[changed].sum()
+		is_original[changed] = _IsMember(edge_ids[changed], original_ids)
+		num_original += is_original[changed].sum()
+		attempted += count
+		accepted += len(indices)
+
+		assortativity = (product_sum / len(x) - x_mean * y_mean) / deviations if deviations > 0 else 0.0
+		diagnostics.append({"swaps_per_edge": attempted / float(num_edges), "acceptance": len(indices) / float(count),
+		                    "original_edges": num_original / float(num_edges), "assortativity": assortativity})
+
+	if directed:
+		sources, targets = [sources], [targets]
+		edge_symbols, edge_weights = [symbols[pairs]], [weights[pairs]]
+	else:
+		sources, targets = [sources, targets], [targets, sources]
+		edge_symbols, edge_weights = [symbols[pairs]] * 2, [weights[pairs]] * 2
+	loops = np.nonzero(fixed)[0]
+	sources.append(csr.GetSources()[loops].astype(np.int64))
+	targets.append(csr.targets[loops].astype(np.int64))
+	edge_symbols.append(symbols[loops]); edge_weights.append(weights[loops])
+
+	randomized = CSRFromEdges(csr.node_ids, np.concatenate(sources), np.concatenate(targets), np.concatenate(edge_symbols),
+	                          np.concatenate(edge_weights), csr.node_to_word, csr.word_to_node)
+	mixing_time = GetMixingTime(diagnostics, tolerance=tolerance)
+	report = {"attempted": attempted, "accepted": accepted, "diagnostics": diagnostics, "mixing_swaps_per_edge": mixing_time,
+	          "mixed": mixing_time <= swaps_per_edge / 2.0}
+	return randomized, report
+
+def _RunDoubleEdgeSwapModel(shared, model_seed):
+	function, csr, swaps_per_edge, directed = shared
+	return function(*DoubleEdgeSwap(csr, swaps_per_edge, np.random.RandomState(model_seed), directed))
+
+'''
+Builds an ensemble of |num_models| degree-preserving null models of |csr| with DoubleEdgeSwap on
+|processes| workers (see RunEnsemble), the one with index i randomized by the seed
+GetModelSeed(|seed|, i), and returns the list of function(randomized, report) results in model
+order. |function| typically returns the statistics of the randomized graph to compare against the
+real one, so that whole graphs are not sent back from the workers.
+'''
+def RunDoubleEdgeSwapEnsemble(function, csr, num_models, swaps_per_edge, seed=NULL_MODEL_SEED, directed=True, processes=None,
+                              verbose=False):
+	# Build the lazily computed arrays once here so that forked workers share them.
+	csr.GetSources()
+	return RunEnsemble(_RunDoubleEdgeSwapModel, (function, csr, swaps_per_edge, directed), num_models, seed, processes, verbose)
@@ -0,0 +1,95 @@
+import multiprocessing
+import numpy as np
+
+'''
+Shared process-pool driver for per-node metrics. Work is described by a module-level function
+	function(shared, start, end)
+which computes the results for the items (usually nodes) in [start, end). The |shared| state
+(graphs, CSR arrays, year tables, ...) is handed to the workers by fork inheritance rather than by
+pickling, so every worker reads the parent's copy. Results always come back in range order, so the
+merged output does not depend on which worker finished first.
+'''
+
+# State inherited by forked workers; only set while a pool is running.
+_shared = None
+# Longer than any range takes; see IterParallel.
+_WAIT_SECONDS = 365 * 24 * 3600
+
+def _RunRange(arguments):
+	function, start, end = arguments
+	return start, end, function(_shared, start, end)
+
+'''
+Splits [0, num_items) into consecutive ranges of |chunk_size| items (the last one may be shorter).
+'''
+def SplitRange(num_items, chunk_size):
+	return [(start, min(start + chunk_size, num_items)) for start in range(0, num_items, chunk_size)]
+
+'''
+Returns a chunk size giving every process several chunks to work on (for load balancing), rounded
+up to a multiple of |align| (e.g. 64 for the bit-parallel BFS batches).
+'''
+def GetChunkSize(num_items, processes, align=1, chunks_per_process=4):
+	chunk_size = max(1, num_items // max(1, processes * chunks_per_process))
+	return ((chunk_size + align - 1) // align) * align
+
+def GetNumProcesses(processes=None):
+	return processes if processes is not None else multiprocessing.cpu_count()
+
+'''
+Runs function(shared, start, end) over the given (start, end) |ranges| on a pool of |processes|
+forked workers (all cores if None, in-process if 1) and yields (start, end, result) as soon as each
+range is done, in completion order. If a range raises, the run is interrupted or the caller stops
+iterating, the pool is terminated at once rather than after the remaining ranges.
+'''
+def IterParallel(function, shared, ranges, processes=None):
+	global _shared
+	processes = GetNumProcesses(processes)
+	if processes == 1 or len(ranges) <= 1:
+		for start, end in ranges:
+			yield start, end, function(shared, start, end)
+		return
+
+	_shared = shared
+	pool = multiprocessing.Pool(processes)
+	try:
+		results = pool.imap_unordered(_RunRange, [(function, start, end) for start, end in ranges])
+		for _ in ranges:
+			# Waiting with a timeout keeps the wait interruptible by Ctrl-C.
+			yield results.next(_WAIT_SECONDS)
+	except:
+		# A failed range, an interrupt or a caller which stopped iterating must not wait for the
+		# ranges still queued or running.
+		pool.terminate()
+		raise
+	else:
+		pool.close()
+	finally:
+		pool.join()
+		_shared = None
+
+'''
+Runs function(shared, start, end) over consecutive ranges covering [0, num_items) on a pool of
+|processes| forked workers (all cores if None, in-process if 1) and returns the list of results
+in range order. Prints "{done} of {num_items}" as ranges complete if |verbose|.
+'''
+def RunParallel(function, shared, num_items, processes=None, chunk_size=None, align=1, verbose=False):
+	if chunk_size is None: chunk_size = GetChunkSize(num_items, GetNumProcesses(processes), align)
+	ranges = SplitRange(num_items, chunk_size)
+
+	start_to_result = {}
+	done = 0
+	for start, end, result in IterParallel(function, shared, ranges, processes):
+		start_to_result[start] = result
+		done += end - start
+		if verbose: print "{0} of {1}".format(done, num_items)
+
+	return [start_to_result[start] for start, end in ranges]
+
+'''
+Concatenates per-range results which are arrays, or maps from keys (e.g. depths) to arrays.
+'''
+def ConcatenateResults(results):
+	if len(results) > 0 and isinstance(results[0], dict):
+		return {key: np.concatenate([result[key] for result in results]) for key in results[0].keys()}
+	return np.concatenate(results)
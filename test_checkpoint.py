@@ -0,0 +1,60 @@
+from checkpoint import RunCheckpointed
+import numpy as np
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+'''
+Checks that a checkpointed run (see checkpoint.py) stops as soon as one of its ranges fails, keeping
+the chunks written so far, and that rerunning it only computes the missing ranges. Run with
+	python -m unittest test_checkpoint
+'''
+
+NUM_ITEMS = 6
+# How long the ranges which are not supposed to finish take, far longer than the test may.
+SLOW_RANGE_SECONDS = 60
+
+def _GetRangeValues(start, end):
+	return np.arange(start, end, dtype=np.int64) * 10
+
+# Ranges 0 and 1 succeed, range 2 fails once both of their chunks are saved, the others are slow.
+def _FailingRange(shared, start, end):
+	directory, = shared
+	if start < 2: return _GetRangeValues(start, end)
+	if start > 2:
+		time.sleep(SLOW_RANGE_SECONDS)
+		return _GetRangeValues(start, end)
+	for _ in range(300):
+		if len([filename for filename in os.listdir(directory) if filename.endswith(".npz")]) == 2: break
+		time.sleep(0.1)
+	raise ValueError("range {0} failed".format(start))
+
+# Records the ranges it computes in the (in-process) |shared| list.
+def _RecordingRange(shared, start, end):
+	computed, = shared
+	computed.append(start)
+	return _GetRangeValues(start, end)
+
+class CheckpointTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def testFailedRunStopsAndResumes(self):
+		directory = os.path.join(self.directory, "checkpoints")
+		os.makedirs(directory)
+		start_time = time.time()
+		self.assertRaises(ValueError, RunCheckpointed, _FailingRange, (directory,), NUM_ITEMS, directory, "test", 1, processes=2)
+		self.assertTrue(time.time() - start_time < SLOW_RANGE_SECONDS / 2)
+		chunks = sorted(filename for filename in os.listdir(directory) if filename.endswith(".npz"))
+		self.assertEqual(chunks, ["chunk-0000000000-0000000001.npz", "chunk-0000000001-0000000002.npz"])
+
+		computed = []
+		results = RunCheckpointed(_RecordingRange, (computed,), NUM_ITEMS, directory, "test", 1, processes=1)
+		self.assertEqual(sorted(computed), range(2, NUM_ITEMS))
+		np.testing.assert_array_equal(np.concatenate(results), _GetRangeValues(0, NUM_ITEMS))
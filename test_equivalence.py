@@ -0,0 +1,204 @@
+from snap import *
+
+from WordNet import WordNet
+from benchmark import CreateFixture
+from branching_engine import ComputeBranchingFactors, ComputeInfluenceSetMeanYears
+from centrality_engine import ComputeClosenessCentralities
+from clustering_engine import ComputeClusteringCoefficients
+from wordnet_csr import GRAPH_NAMES, SYMBOL_CODES
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+'''
+Checks that the CSR graphs of wordnet_csr.py hold the same nodes and edges as the TNEANet graphs they
+replace, that the vectorized engines give the same results as the SNAP code they replace, and that
+incremental updates of a WordNet give the same graphs as a full build, on a downsampled copy (see
+benchmark.CreateFixture) of the verb, adjective and adverb files. Run with
+	python -m unittest test_equivalence
+'''
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATA_FILES = [os.path.join(DATA_DIRECTORY, "dict", "data." + pos) for pos in ["verb", "adj", "adv"]]
+TIME_DATA_FILE = os.path.join(DATA_DIRECTORY, "word_to_year_formatted.txt")
+FIXTURE_DIRECTORY = os.path.join(DATA_DIRECTORY, "cache", "test-fixture")
+
+# Keeps the super-node keys (and so the node ids of every graph) small. Nouns are left out, so verbs
+# can start at 0.
+PARTS_OF_SPEECH_OFFSET = {"n": 0, "v": 0, "a": 5000000, "s": 5000000, "r": 10000000}
+
+# The node_to_word map of every graph variant.
+NODE_TO_WORD_ATTRIBUTES = {"graph": "node_to_word", "time_directed_graph": "node_to_word_directed",
+                           "time_directed_graph_no_supernodes": "node_to_word_directed_no_supernodes"}
+
+_fixture = {}
+
+def setUpModule():
+	_fixture["offsets"] = WordNet.PARTS_OF_SPEECH_OFFSET
+	WordNet.PARTS_OF_SPEECH_OFFSET = PARTS_OF_SPEECH_OFFSET
+	_fixture["files"], _fixture["time_data_file"] = CreateFixture(DATA_FILES, TIME_DATA_FILE, FIXTURE_DIRECTORY, 0.1, 0)
+	_fixture["wordnet"] = WordNet(_fixture["files"], _fixture["time_data_file"])
+
+def tearDownModule():
+	WordNet.PARTS_OF_SPEECH_OFFSET = _fixture["offsets"]
+
+# Returns the sorted (source id, target id, symbol code, weight) of every edge of |csr|, leaving out the
+# symbols unless |symbols|.
+def GetCSREdges(csr, symbols=True):
+	sources, targets = csr.node_ids[csr.GetSources()].tolist(), csr.node_ids[csr.targets].tolist()
+	codes = csr.symbols.tolist() if symbols else [0] * csr.GetEdges()
+	return sorted(zip(sources, targets, codes, csr.weights.astype(np.float64).tolist()))
+
+# Returns the edges of the TNEANet |graph| like GetCSREdges, with the "symbol" or "weight" attributes.
+def GetGraphEdges(graph, symbols=True):
+	edges = []
+	for edge in graph.Edges():
+		code = SYMBOL_CODES.get(graph.GetStrAttrDatE(edge, "symbol"), SYMBOL_CODES["unknown"]) if symbols else 0
+		weight = 1.0 if symbols else graph.GetFltAttrDatE(edge, "weight")
+		edges.append((edge.GetSrcNId(), edge.GetDstNId(), code, weight))
+	return sorted(edges)
+
+# The recursive branching factor of the original branching_factor_stats.py.
+def ComputeBranchingFactor(graph, node, max_depth, weight_multiplier=1.0):
+	if max_depth == 0: return 0
+	branching_factor = 0
+	for neighbor in graph.GetNI(node).GetOutEdges():
+		edge_weight = graph.GetFltAttrDatE(graph.GetEI(node, neighbor), "weight")
+		branching_factor += edge_weight*weight_multiplier
+		branching_factor += ComputeBranchingFactor(graph, neighbor, max_depth-1, edge_weight*weight_multiplier)
+	return branching_factor
+
+# The recursive influence set of the original branching_speed_stats.py.
+def ComputeInfluenceSet(graph, node, max_depth):
+	influence_set = set()
+	if max_depth == 0: return influence_set
+	for neighbor in graph.GetNI(node).GetOutEdges():
+		influence_set.add(neighbor)
+		influence_set.update(ComputeInfluenceSet(graph, neighbor, max_depth-1))
+	return influence_set
+
+class CSRGraphTest(unittest.TestCase):
+
+	def testGraphsMatchTNEANet(self):
+		wordnet = _fixture["wordnet"]
+		for name in GRAPH_NAMES:
+			csr, graph = wordnet.GetCSRGraph(name), getattr(wordnet, name)
+			symbols = name != "time_directed_graph_no_supernodes"
+			self.assertEqual(csr.node_ids.tolist(), sorted(node.GetId() for node in graph.Nodes()))
+			self.assertEqual(dict(csr.node_to_word), getattr(wordnet, NODE_TO_WORD_ATTRIBUTES[name]))
+			self.assertEqual(GetCSREdges(csr, symbols), GetGraphEdges(graph, symbols))
+
+class EngineTest(unittest.TestCase):
+
+	def testBranchingFactors(self):
+		wordnet = _fixture["wordnet"]
+		csr, graph = wordnet.GetCSRGraph(), wordnet.time_directed_graph_no_supernodes
+		depth_to_branching_factors = ComputeBranchingFactors(csr, [1, 2, 3])
+		for depth in [1, 2, 3]:
+			expected = [ComputeBranchingFactor(graph, node_id, depth) for node_id in csr.node_ids.tolist()]
+			np.testing.assert_allclose(depth_to_branching_factors[depth], expected, rtol=1e-12)
+
+	def testInfluenceSetMeanYears(self):
+		wordnet = _fixture["wordnet"]
+		csr, graph, years = wordnet.GetCSRGraph(), wordnet.time_directed_graph_no_supernodes, wordnet.GetNodeYears()
+		depth_to_mean_years = ComputeInfluenceSetMeanYears(csr, years, [1, 2, 3], processes=2)
+		for depth in [1, 2, 3]:
+			expected = []
+			for index, node_id in enumerate(csr.node_ids.tolist()):
+				influence_years = [years[csr.GetIndex(other)] for other in ComputeInfluenceSet(graph, node_id, depth)]
+				influence_years = [year for year in influence_years if year >= years[index]]
+				expected.append(sum(influence_years) / float(len(influence_years)) if len(influence_years) > 0 else 0)
+			np.testing.assert_allclose(depth_to_mean_years[depth], expected, rtol=1e-12)
+
+	def testClosenessCentralities(self):
+		wordnet = _fixture["wordnet"]
+		for name, directed in [("time_directed_graph", True), ("graph", False)]:
+			csr, graph = wordnet.GetCSRGraph(name), getattr(wordnet, name)
+			sources = csr.GetWordIndices()
+			closeness = ComputeClosenessCentralities(csr, sources, directed=directed, processes=2)
+			expected = [GetClosenessCentr(graph, int(csr.node_ids[index]), True, directed) for index in sources.tolist()]
+			np.testing.assert_allclose(closeness, expected, rtol=0, atol=1e-12)
+
+	def testClusteringCoefficients(self):
+		wordnet = _fixture["wordnet"]
+		for name in GRAPH_NAMES:
+			csr, graph = wordnet.GetCSRGraph(name), getattr(wordnet, name)
+			clustering = ComputeClusteringCoefficients(csr, processes=2)
+			expected = [GetNodeClustCf(graph, node_id) for node_id in csr.node_ids.tolist()]
+			np.testing.assert_allclose(clustering, expected, rtol=0, atol=1e-12)
+
+class IncrementalUpdateTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.wordnet = WordNet(_fixture["files"], _fixture["time_data_file"], graphs=[])
+		for name in GRAPH_NAMES: self.wordnet.GetCSRGraph(name)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def assertSameGraphs(self, wordnet, expected):
+		for name in GRAPH_NAMES:
+			csr, expected_csr = wordnet.GetCSRGraph(name), expected.GetCSRGraph(name)
+			self.assertEqual(csr.node_ids.tolist(), expected_csr.node_ids.tolist())
+			self.assertEqual(dict(csr.node_to_word), dict(expected_csr.node_to_word))
+			self.assertEqual(GetCSREdges(csr), GetCSREdges(expected_csr))
+			np.testing.assert_array_equal(wordnet.GetNodeYears(name), expected.GetNodeYears(name))
+			graph, expected_graph = getattr(wordnet, name), getattr(expected, name)
+			self.assertEqual((graph.GetNodes(), graph.GetEdges()), (expected_graph.GetNodes(), expected_graph.GetEdges()))
+
+	def testTimeDataDiff(self):
+		wordnet = self.wordnet
+		random_state = np.random.RandomState(0)
+		dated = sorted(key for key in wordnet.words_with_time_data if (key[:-1], key[-1]) in wordnet.word_and_pos_ids)
+		undated = sorted(set(word for synset in wordnet.synsets.values() if synset["synset_type"] == "v"
+		                     for word in synset["words"] if word + "v" not in wordnet.words_with_time_data))
+		lines = ["{0} <delim> {1} <delim> {2}\n".format(key[:-1], "adj" if key[-1] == "s" else key[-1],
+		                                               wordnet.word_and_pos_to_date[key] - random_state.randint(1, 300))
+		         for key in random_state.choice(dated, 50, replace=False)]
+		lines += ["{0} <delim> v <delim> {1}\n".format(word, random_state.randint(1200, 1990))
+		          for word in random_state.choice(undated, min(50, len(undated)), replace=False)]
+		time_data_file = os.path.join(self.directory, "word_to_year_formatted.txt")
+		with open(_fixture["time_data_file"], 'r') as source, open(time_data_file, 'w') as destination:
+			destination.write(source.read() + "".join(lines))
+
+		old_csr = wordnet.GetCSRGraph()
+		wordnet.ApplyTimeDataDiff(lines)
+		self.assertSameGraphs(wordnet, WordNet(_fixture["files"], time_data_file, graphs=[]))
+
+		# Every word whose edges changed is dirty (words are renumbered when new ones join the graph)
+		csr = wordnet.GetCSRGraph()
+		old_edges = set((old_csr.node_to_word[source], old_csr.node_to_word[target], weight) for source, target, code, weight
+		                in GetCSREdges(old_csr, False))
+		new_edges = set((csr.node_to_word[source], csr.node_to_word[target], weight) for source, target, code, weight
+		                in GetCSREdges(csr, False))
+		changed = set(word for edge in old_edges ^ new_edges for word in edge[:2] if word in csr.word_to_node)
+		dirty = set(csr.node_to_word[node_id] for node_id in wordnet.GetDirtyNodes().tolist())
+		self.assertTrue(len(changed) > 0)
+		self.assertTrue(changed <= dirty)
+
+	def testSynsetDiff(self):
+		wordnet = self.wordnet
+		filename = _fixture["files"][0]
+		with open(filename, 'r') as file:
+			lines = file.read().split("\n")
+		random_state = np.random.RandomState(0)
+		diff = []
+		for index in random_state.choice([index for index, line in enumerate(lines) if len(line) > 0], 20, replace=False):
+			fields = lines[index].split(" ")
+			fields[4] = fields[4] + "_new"
+			lines[index] = " ".join(fields)
+			diff.append(lines[index] + "\n")
+		data_files = [os.path.join(self.directory, os.path.basename(filename))] + _fixture["files"][1:]
+		with open(data_files[0], 'w') as file:
+			file.write("\n".join(lines))
+
+		wordnet.ApplySynsetDiff(diff)
+		self.assertSameGraphs(wordnet, WordNet(data_files, _fixture["time_data_file"], graphs=[]))
+
+	def testNullModelsAreNotUpdated(self):
+		null_model = WordNet(_fixture["files"], _fixture["time_data_file"], True, graphs=[])
+		self.assertRaises(ValueError, null_model.ApplyTimeDataDiff, [])
+		self.assertRaises(ValueError, null_model.ApplySynsetDiff, [])
@@ -0,0 +1,76 @@
+from WordNet import WordNet
+from benchmark import CreateFixture
+from null_model import DecodeEdges, DoubleEdgeSwap, EncodeEdges, GetModelSeed, RunDoubleEdgeSwapEnsemble
+from test_equivalence import DATA_FILES, FIXTURE_DIRECTORY, TIME_DATA_FILE
+from wordnet_csr import CSRFromEdges
+import numpy as np
+import unittest
+
+'''
+Checks that the double-edge-swap null models of null_model.py keep every degree, never add parallel
+edges or self-loops and report the degree assortativity of the graph they return, on the fixture of
+test_equivalence.py. Run with
+	python -m unittest test_null_model
+'''
+
+SWAPS_PER_EDGE = 5
+
+_fixture = {}
+
+def setUpModule():
+	files, time_data_file = CreateFixture(DATA_FILES, TIME_DATA_FILE, FIXTURE_DIRECTORY, 0.1, 0)
+	_fixture["csr"] = WordNet(files, time_data_file, graphs=[]).GetCSRGraph()
+
+# Returns a graph holding every pair of nodes connected in |csr| once in each direction (self-loops
+# once), as DoubleEdgeSwap expects of undirected graphs.
+def GetSymmetricCSR(csr):
+	num_nodes = csr.GetNodes()
+	sources, targets = DecodeEdges(np.unique(EncodeEdges(csr.GetSources(), csr.targets, num_nodes, directed=False)), num_nodes)
+	pairs = sources != targets
+	sources, targets = np.concatenate((sources, targets[pairs])), np.concatenate((targets, sources[pairs]))
+	return CSRFromEdges(csr.node_ids, sources, targets, np.zeros(len(sources), dtype=np.uint8),
+	                    np.ones(len(sources), dtype=np.float32), csr.node_to_word, csr.word_to_node)
+
+# Returns the sorted (directed) edge ids of |csr|.
+def GetEdgeIds(csr, report=None):
+	return np.sort(EncodeEdges(csr.GetSources(), csr.targets, csr.GetNodes()))
+
+class DoubleEdgeSwapTest(unittest.TestCase):
+
+	def assertDegreePreservingSwap(self, csr, randomized, report, directed):
+		np.testing.assert_array_equal(randomized.GetOutDegrees(), csr.GetOutDegrees())
+		np.testing.assert_array_equal(randomized.GetInDegrees(), csr.GetInDegrees())
+		edge_ids = GetEdgeIds(randomized)
+		self.assertEqual(len(np.unique(edge_ids)), len(edge_ids))
+		self.assertTrue(report["accepted"] > 0)
+		self.assertTrue(report["diagnostics"][-1]["original_edges"] < 1)
+
+		sources, targets = randomized.GetSources(), randomized.targets
+		loops = sources == targets
+		original_loops = csr.GetSources()[csr.GetSources() == csr.targets]
+		self.assertTrue(set(sources[loops].tolist()) <= set(original_loops.tolist()))
+		if directed:
+			x, y = randomized.GetOutDegrees()[sources], randomized.GetInDegrees()[targets]
+		else:
+			np.testing.assert_array_equal(edge_ids, np.sort(EncodeEdges(targets, sources, randomized.GetNodes())))
+			np.testing.assert_array_equal(sources[loops], original_loops)
+			x, y = randomized.GetOutDegrees()[sources[~loops]], randomized.GetOutDegrees()[targets[~loops]]
+		self.assertAlmostEqual(report["diagnostics"][-1]["assortativity"], np.corrcoef(x, y)[0, 1], places=10)
+
+	def testDirectedSwap(self):
+		csr = _fixture["csr"]
+		randomized, report = DoubleEdgeSwap(csr, SWAPS_PER_EDGE, np.random.RandomState(0))
+		self.assertDegreePreservingSwap(csr, randomized, report, True)
+
+	def testUndirectedSwap(self):
+		csr = GetSymmetricCSR(_fixture["csr"])
+		randomized, report = DoubleEdgeSwap(csr, SWAPS_PER_EDGE, np.random.RandomState(0), directed=False)
+		self.assertDegreePreservingSwap(csr, randomized, report, False)
+
+	def testEnsemble(self):
+		csr = _fixture["csr"]
+		ensemble = RunDoubleEdgeSwapEnsemble(GetEdgeIds, csr, 3, SWAPS_PER_EDGE, seed=5, processes=2)
+		for index, edge_ids in enumerate(ensemble):
+			randomized, report = DoubleEdgeSwap(csr, SWAPS_PER_EDGE, np.random.RandomState(GetModelSeed(5, index)))
+			np.testing.assert_array_equal(edge_ids, GetEdgeIds(randomized))
+		self.assertFalse(np.array_equal(ensemble[0], ensemble[1]))
@@ -0,0 +1,460 @@
+import numpy as np
+
+'''
+Compact array-backed (CSR) versions of the WordNet graphs. Each graph stores its out-edges as
+int32 offsets/targets arrays indexed by a dense node index, together with a uint8 pointer symbol
+code and a float32 weight per edge. node_ids maps every dense index back to the node id used by
+the corresponding TNEANet graph, so node_to_word/word_to_node are interchangeable with the maps
+on the WordNet instance.
+'''
+
+GRAPH_NAMES = ["graph", "time_directed_graph", "time_directed_graph_no_supernodes"]
+
+# Every symbol which can appear on an edge of one of the WordNet graphs. "synset" connects a word to
+# the super-node of its synset, "synonym" connects two words of the same synset, "unknown" is used
+# by the null model and the rest are the pointer symbols of the WordNet data files.
+EDGE_SYMBOLS = ["synset", "synonym", "unknown", "!", "@", "@i", "~", "~i", "#m", "#s", "#p", "%m", "%s", "%p",
+                "=", "+", ";c", "-c", ";r", "-r", ";u", "-u", "*", ">", "^", "$", "&", "<", "\\"]
+SYMBOL_CODES = {symbol: code for code, symbol in enumerate(EDGE_SYMBOLS)}
+
+'''
+A directed graph in compressed sparse row format. Contains the following instance variables:
+	1. node_ids = int64 array mapping each dense node index to its (sorted) node id
+	2. offsets = int32 array; the out-edges of index i are offsets[i]:offsets[i+1]
+	3. targets = int32 array holding the dense index of the destination of every edge
+	4. symbols = uint8 array holding the code (see EDGE_SYMBOLS) of the pointer symbol on every edge
+	5. weights = float32 array holding the weight of every edge
+	6. node_to_word = A map from node_ids to words
+	7. word_to_node = A map from words to node_ids
+'''
+class CSRGraph:
+
+	def __init__(self, node_ids, offsets, targets, symbols, weights, node_to_word, word_to_node):
+		self.node_ids = node_ids
+		self.offsets = offsets
+		self.targets = targets
+		self.symbols = symbols
+		self.weights = weights
+		self.node_to_word = node_to_word
+		self.word_to_node = word_to_node
+		self.sources = None
+		self.transpose = None
+
+	def GetNodes(self):
+		return len(self.node_ids)
+
+	def GetEdges(self):
+		return len(self.targets)
+
+	'''
+	Returns the dense index of the given node id.
+	'''
+	def GetIndex(self, node_id):
+		return int(self.GetIndices(np.array([node_id]))[0])
+
+	'''
+	Returns the dense indices of an array of node ids.
+	'''
+	def GetIndices(self, node_ids):
+		indices = np.searchsorted(self.node_ids, node_ids)
+		if np.any(indices >= len(self.node_ids)) or np.any(self.node_ids[np.minimum(indices, len(self.node_ids)-1)] != node_ids):
+			raise KeyError("node id not in graph")
+		return indices
+
+	'''
+	Returns the dense indices of all of the word (i.e. non super-) nodes.
+	'''
+	def GetWordIndices(self):
+		return self.GetIndices(np.array(sorted(self.node_to_word.keys()), dtype=np.int64))
+
+	'''
+	Returns the dense indices of the out-neighbors of the node at the given index.
+	'''
+	def GetOutNeighbors(self, index):
+		return self.targets[self.offsets[index]:self.offsets[index+1]]
+
+	'''
+	Returns the indices (into targets/symbols/weights) of every out-edge of the nodes at the given
+	dense indices, grouped by node in the given order.
+	'''
+	def GetOutEdgeIndices(self, indices):
+		starts = self.offsets[indices].astype(np.int64)
+		counts = self.offsets[np.asarray(indices) + 1] - starts
+		prefix = np.cumsum(counts) - counts
+		return np.repeat(starts - prefix, counts) + np.arange(counts.sum(), dtype=np.int64)
+
+	def GetOutDegrees(self):
+		return np.diff(self.offsets)
+
+	def GetInDegrees(self):
+		return np.bincount(self.targets, minlength=self.GetNodes())
+
+	'''
+	Returns the dense index of the source of every edge (the row indices of the matrix).
+	'''
+	def GetSources(self):
+		if self.sources is None:
+			self.sources = np.repeat(np.arange(self.GetNodes(), dtype=np.int32), self.GetOutDegrees())
+		return self.sources
+
+	'''
+	Returns the product of the (weighted, if |weighted|) adjacency matrix with the given vector,
+	i.e. result[i] = sum of weight(i -> j) * vector[j] over all out-edges of i.
+	'''
+	def MatVec(self, vector, weighted=True):
+		values = vector[self.targets]
+		if weighted: values = values * self.weights
+		return np.bincount(self.GetSources(), weights=values, minlength=self.GetNodes())
+
+	'''
+	Returns the graph with all of its edges reversed.
+	'''
+	def Transpose(self):
+		return CSRFromEdges(self.node_ids, self.targets, self.GetSources(), self.symbols, self.weights,
+		                    self.node_to_word, self.word_to_node)
+
+	'''
+	Returns the transpose of this graph, computing it on first use.
+	'''
+	def GetTranspose(self):
+		if self.transpose is None:
+			self.transpose = self.Transpose()
+		return self.transpose
+
+'''
+Assembles a CSRGraph from parallel edge arrays (sources and targets are dense indices). Edges keep
+their relative order within each row.
+'''
+def CSRFromEdges(node_ids, sources, targets, symbols, weights, node_to_word, word_to_node):
+	sources = np.asarray(sources, dtype=np.int32)
+	order = np.argsort(sources, kind='mergesort')
+	counts = np.bincount(sources, minlength=len(node_ids))
+	offsets = np.zeros(len(node_ids) + 1, dtype=np.int32)
+	np.cumsum(counts, out=offsets[1:])
+
+	return CSRGraph(np.asarray(node_ids, dtype=np.int64), offsets,
+	                np.asarray(targets, dtype=np.int32)[order],
+	                np.asarray(symbols, dtype=np.uint8)[order],
+	                np.asarray(weights, dtype=np.float32)[order],
+	                node_to_word, word_to_node)
+
+'''
+Returns the subgraph of |csr| induced by the nodes set in the bool array |node_mask|: the kept nodes
+(in their order) and every edge between two of them, restricted to the edges set in |edge_mask| if
+given. Edges keep their order within each row and the node/word maps only keep the kept words.
+'''
+def GetInducedSubgraph(csr, node_mask, edge_mask=None):
+	node_mask = np.asarray(node_mask, dtype=bool)
+	kept = np.nonzero(node_mask)[0]
+	new_indices = np.full(csr.GetNodes(), -1, dtype=np.int64)
+	new_indices[kept] = np.arange(len(kept))
+
+	sources = csr.GetSources()
+	keep = node_mask[sources] & node_mask[csr.targets]
+	if edge_mask is not None: keep &= edge_mask
+
+	node_ids = csr.node_ids[kept]
+	node_to_word = {node_id: csr.node_to_word[node_id] for node_id in node_ids.tolist() if node_id in csr.node_to_word}
+	word_to_node = {word: node_id for node_id, word in node_to_word.items()}
+	return CSRFromEdges(node_ids, new_indices[sources[keep]], new_indices[csr.targets[keep]], csr.symbols[keep],
+	                    csr.weights[keep], node_to_word, word_to_node)
+
+'''
+Returns (node_mask, edge_mask) for GetInducedSubgraph, selecting the word nodes of |csr| which pass
+every given filter, given the per-node |years| and |parts_of_speech| bitmasks of the graph (as from
+WordNet.GetNodeYears and WordNet.GetNodePartsOfSpeech):
+	first_year, last_year = the inclusive range of years of the kept words (words without time data
+	                        are dropped as soon as either bound is set)
+	parts_of_speech_codes = the bits (see WordNet.PARTS_OF_SPEECH_CODES) of which a kept word must
+	                        have at least one
+	symbols = the pointer symbols (see EDGE_SYMBOLS) of the kept edges (None keeps every edge)
+	include_supernodes = whether to keep every super-node (the filters above only apply to words)
+'''
+def GetSubgraphMasks(csr, years, parts_of_speech, first_year=None, last_year=None, parts_of_speech_codes=None,
+                     symbols=None, include_supernodes=True):
+	is_word = np.zeros(csr.GetNodes(), dtype=bool)
+	is_word[csr.GetWordIndices()] = True
+
+	node_mask = is_word.copy()
+	if first_year is not None or last_year is not None:
+		node_mask &= years >= 0 # Words without time data have a negative year (WordNet.NO_YEAR)
+	if first_year is not None: node_mask &= years >= first_year
+	if last_year is not None: node_mask &= years <= last_year
+	if parts_of_speech_codes is not None: node_mask &= (parts_of_speech & parts_of_speech_codes) != 0
+	if include_supernodes: node_mask |= ~is_word
+
+	edge_mask = None
+	if symbols is not None:
+		edge_mask = np.in1d(csr.symbols, [SYMBOL_CODES[symbol] for symbol in symbols])
+	return node_mask, edge_mask
+
+'''
+Returns the key under which the subgraph with the given filters (see GetSubgraphMasks, with
+|parts_of_speech| as names) is cached; filters which select the same subgraph get the same key.
+'''
+def GetSubgraphKey(name, first_year=None, last_year=None, parts_of_speech=None, symbols=None, include_supernodes=True):
+	if parts_of_speech is not None: parts_of_speech = tuple(sorted(set(parts_of_speech)))
+	if symbols is not None: symbols = tuple(sorted(set(symbols)))
+	return (name, first_year, last_year, parts_of_speech, symbols, bool(include_supernodes))
+
+'''
+Builds the CSR version of the given WordNet graph variant (one of GRAPH_NAMES) directly from the
+synsets of |wordnet|, mirroring the corresponding WordNet.__Create*Graph method.
+'''
+def BuildCSRGraph(wordnet, name):
+	synsets, supernode_keys, words = _GetGraphNodes(wordnet, name)
+	node_ids, node_to_word, word_to_node = _AssignNodeIds(supernode_keys, words)
+	edges = _EdgeList(node_ids)
+	_AddSynsetEdges(wordnet, name, edges, synsets, synsets.keys(), word_to_node)
+	return edges.ToCSR(node_to_word, word_to_node, max_weight=name in MAX_WEIGHT_GRAPHS)
+
+'''
+Returns (graph, dirty) for the graph variant |name| of |wordnet| after its synsets or time data
+changed (see WordNet.ApplyTimeDataDiff and WordNet.ApplySynsetDiff), given |csr|, the variant as it
+was before, and the |words| and synset |keys| (super-nodes) whose edges may have changed, which
+must include every node added or removed. Only the edges touching those nodes are generated again,
+from the synsets which hold them or point to them (|pointing_keys| maps every synset key to the
+keys of the synsets with pointers to it); all other edges are carried over from |csr| with their
+ends renumbered. |dirty| is a bool array marking the nodes of the new graph whose edges changed,
+plus the nodes which were marked in |previous_dirty| (a bool array over the nodes of |csr|).
+'''
+def UpdateCSRGraph(wordnet, name, csr, words, keys, pointing_keys, previous_dirty=None):
+	synsets, supernode_keys, all_words = _GetGraphNodes(wordnet, name)
+	node_ids, node_to_word, word_to_node = _AssignNodeIds(supernode_keys, all_words)
+	node_ids = np.asarray(node_ids, dtype=np.int64)
+	words, keys, new_keys = set(words), set(keys), set(supernode_keys)
+
+	# The id in the new graph (-1 if removed) and whether it changed, for every node of |csr|
+	new_ids = np.full(csr.GetNodes(), -1, dtype=np.int64)
+	changed_before = np.zeros(csr.GetNodes(), dtype=bool)
+	for index, node_id in enumerate(csr.node_ids.tolist()):
+		word = csr.node_to_word.get(node_id)
+		if word is None:
+			if node_id in new_keys: new_ids[index] = node_id
+			changed_before[index] = node_id in keys
+		else:
+			new_ids[index] = word_to_node.get(word, -1)
+			changed_before[index] = word in words
+	new_indices = np.where(new_ids >= 0, np.searchsorted(node_ids, new_ids), -1)
+
+	changed = np.zeros(len(node_ids), dtype=bool)
+	changed_ids = [word_to_node[word] for word in words if word in word_to_node] + [key for key in keys if key in new_keys]
+	changed[np.searchsorted(node_ids, np.array(changed_ids, dtype=np.int64))] = True
+
+	# Carry over the edges between unchanged nodes
+	sources, targets = csr.GetSources(), csr.targets
+	kept = ~changed_before[sources] & ~changed_before[targets]
+	kept_sources, kept_targets = new_indices[sources[kept]], new_indices[targets[kept]]
+	if np.any(kept_sources < 0) or np.any(kept_targets < 0):
+		raise ValueError("a node removed from {0} is not among the changed nodes".format(name))
+
+	# Generate the edges of every synset holding a changed node or pointing to one, and keep the ones
+	# touching a changed node (every other edge they generate is among the carried over edges)
+	holders = set(key for key in keys if key in synsets)
+	for word in words:
+		holders.update(key for key in wordnet.word_to_synsets.get(word, ()) if key in synsets)
+	for key in list(holders):
+		holders.update(pointing_key for pointing_key in pointing_keys.get(key, ()) if pointing_key in synsets)
+	edges = _EdgeList(node_ids)
+	_AddSynsetEdges(wordnet, name, edges, synsets, sorted(holders), word_to_node)
+	new_sources, new_targets, new_symbols, new_weights = edges.GetArrays(max_weight=name in MAX_WEIGHT_GRAPHS)
+	touching = changed[new_sources] | changed[new_targets]
+
+	graph = CSRFromEdges(node_ids, np.concatenate((kept_sources, new_sources[touching])),
+	                     np.concatenate((kept_targets, new_targets[touching])),
+	                     np.concatenate((csr.symbols[kept], new_symbols[touching])),
+	                     np.concatenate((csr.weights[kept], new_weights[touching])), node_to_word, word_to_node)
+
+	# The changed nodes and the other ends of their edges before and after the change
+	dirty = changed.copy()
+	for ends in (new_indices[sources[~kept]], new_indices[targets[~kept]]):
+		dirty[ends[ends >= 0]] = True
+	dirty[new_sources[touching]] = True
+	dirty[new_targets[touching]] = True
+	if previous_dirty is not None:
+		carried = new_indices[previous_dirty]
+		dirty[carried[carried >= 0]] = True
+	return graph, dirty
+
+'''
+Collects the edges of a graph under construction; add() mirrors WordNet.__AddEdge and
+WordNet.__AddEdgeWeight.
+'''
+class _EdgeList:
+
+	def __init__(self, node_ids):
+		self.node_ids = node_ids
+		self.index = {node_id: i for i, node_id in enumerate(node_ids)}
+		self.sources = []
+		self.targets = []
+		self.symbols = []
+		self.weights = []
+
+	def add(self, node1, node2, symbol, weight=1.0, directed=False):
+		index1, index2 = self.index[node1], self.index[node2]
+		code = SYMBOL_CODES.get(symbol, SYMBOL_CODES["unknown"])
+		self.sources.append(index1); self.targets.append(index2)
+		self.symbols.append(code); self.weights.append(weight)
+		if not directed:
+			self.sources.append(index2); self.targets.append(index1)
+			self.symbols.append(code); self.weights.append(weight)
+
+	'''
+	Returns the CSRGraph holding every collected edge. If |max_weight| is set, parallel edges are
+	merged into one edge carrying the largest weight and its symbol; among edges of the same weight
+	the smallest symbol code wins, so the result does not depend on the order the edges were added
+	in (which differs between full builds and UpdateCSRGraph).
+	'''
+	def ToCSR(self, node_to_word, word_to_node, max_weight=False):
+		sources, targets, symbols, weights = self.GetArrays(max_weight)
+		return CSRFromEdges(self.node_ids, sources, targets, symbols, weights, node_to_word, word_to_node)
+
+	'''
+	Returns the (sources, targets, symbols, weights) arrays of the collected edges, with the edges
+	merged as in ToCSR.
+	'''
+	def GetArrays(self, max_weight=False):
+		sources = np.array(self.sources, dtype=np.int64)
+		targets = np.array(self.targets, dtype=np.int64)
+		symbols = np.array(self.symbols, dtype=np.uint8)
+		weights = np.array(self.weights, dtype=np.float32)
+
+		if max_weight and len(sources) > 0:
+			keys = sources * len(self.node_ids) + targets
+			order = np.lexsort((symbols, -weights, keys))
+			first = np.ones(len(order), dtype=bool)
+			first[1:] = keys[order][1:] != keys[order][:-1]
+			keep = order[first]
+			keep.sort()
+			sources, targets, symbols, weights = sources[keep], targets[keep], symbols[keep], weights[keep]
+
+		return sources, targets, symbols, weights
+
+'''
+Assigns node ids exactly like the TNEANet builders do: super-nodes keep their synset keys and the
+words follow (in sorted order) after the largest key.
+'''
+def _AssignNodeIds(supernode_keys, words):
+	supernode_keys = sorted(supernode_keys)
+	next_id = supernode_keys[-1] + 1 if len(supernode_keys) > 0 else 0
+	node_to_word = {}
+	word_to_node = {}
+	for word in sorted(words):
+		node_to_word[next_id] = word
+		word_to_node[word] = next_id
+		next_id += 1
+	return supernode_keys + sorted(node_to_word.keys()), node_to_word, word_to_node
+
+def _GetWordsInAgeOrder(word1, word2, id1, id2, years):
+	if years[id1] > years[id2]:
+		return word2, word1, False
+	return word1, word2, years[id1] == years[id2]
+
+# Adds the edges of the synset with the given key of the undirected graph to |edges|.
+def _AddGraphEdges(wordnet, edges, key, synset, word_to_node, years, has_time_data):
+	synsets = wordnet.synsets
+	for word in synset["words"]:
+		edges.add(key, word_to_node[word], "synset")
+
+	for word1 in synset["words"]:
+		for word2 in synset["words"]:
+			if word1 == word2: continue
+			edges.add(word_to_node[word1], word_to_node[word2], "synonym")
+
+	for pointer in synset["pointers"]:
+		if pointer["pos"] not in wordnet.parts_of_speech: continue
+
+		_, src, key2, dst = pointer["connection"]
+		if src == 0 and dst == 0:
+			edges.add(key, key2, pointer["symbol"], directed=True)
+		else:
+			node1 = word_to_node[synset["words"][src-1]]
+			node2 = word_to_node[synsets[key2]["words"][dst-1]]
+			edges.add(node1, node2, pointer["symbol"], directed=True)
+
+# Adds the edges of the directed synset with the given key of the time directed graph to |edges|.
+def _AddTimeDirectedEdges(wordnet, edges, key, synset, word_to_node, years, has_time_data):
+	synsets = wordnet.synsets
+	for word in synset["words"]:
+		edges.add(key, word_to_node[word], "synset")
+
+	for word1, id1 in zip(synset["words"], synset["word_ids"]):
+		for word2, id2 in zip(synset["words"], synset["word_ids"]):
+			if word1 == word2: continue
+			older, newer, same_age = _GetWordsInAgeOrder(word1, word2, id1, id2, years)
+			edges.add(word_to_node[older], word_to_node[newer], "synonym", directed=not same_age)
+
+	for pointer in synset["pointers"]:
+		if pointer["pos"] not in wordnet.parts_of_speech: continue
+
+		key1, src, key2, dst = pointer["connection"]
+		if src == 0 and dst == 0:
+			edges.add(key1, key2, pointer["symbol"])
+		else:
+			word1 = synsets[key1]["words"][src-1]
+			word2 = synsets[key2]["words"][dst-1]
+			id1 = synsets[key1]["word_ids"][src-1]
+			id2 = synsets[key2]["word_ids"][dst-1]
+			if not has_time_data[id1] or not has_time_data[id2]: continue
+			older, newer, same_age = _GetWordsInAgeOrder(word1, word2, id1, id2, years)
+			edges.add(word_to_node[older], word_to_node[newer], pointer["symbol"], directed=not same_age)
+
+# Adds the edges of the directed synset with the given key of the time directed graph without super-nodes to |edges|.
+def _AddTimeDirectedNoSuperNodesEdges(wordnet, edges, key, synset, word_to_node, years, has_time_data):
+	synsets = wordnet.synsets
+	synsets_directed = wordnet.synsets_directed
+	for word1, id1 in zip(synset["words"], synset["word_ids"]):
+		for word2, id2 in zip(synset["words"], synset["word_ids"]):
+			if word1 == word2: continue
+			older, newer, same_age = _GetWordsInAgeOrder(word1, word2, id1, id2, years)
+			edges.add(word_to_node[older], word_to_node[newer], "synonym", 1, directed=not same_age)
+
+	for pointer in synset["pointers"]:
+		if pointer["pos"] not in wordnet.parts_of_speech: continue
+
+		key1, src, key2, dst = pointer["connection"]
+		# if 2 supernodes are connected, connect all words in each synset with weight .5
+		if src == 0 and dst == 0:
+			for word1, id1 in zip(synset["words"], synset["word_ids"]):
+				for word2, id2 in zip(synsets_directed[key2]["words"], synsets_directed[key2]["word_ids"]):
+					if not has_time_data[id1] or not has_time_data[id2]: continue
+					older, newer, same_age = _GetWordsInAgeOrder(word1, word2, id1, id2, years)
+					edges.add(word_to_node[older], word_to_node[newer], pointer["symbol"], .5, directed=not same_age)
+		else:
+			word1 = synsets[key1]["words"][src-1]
+			word2 = synsets[key2]["words"][dst-1]
+			id1 = synsets[key1]["word_ids"][src-1]
+			id2 = synsets[key2]["word_ids"][dst-1]
+			if not has_time_data[id1] or not has_time_data[id2]: continue
+			older, newer, same_age = _GetWordsInAgeOrder(word1, word2, id1, id2, years)
+			edges.add(word_to_node[older], word_to_node[newer], pointer["symbol"], 1, directed=not same_age)
+
+# The function adding the edges of one synset to every graph variant.
+_SYNSET_EDGES = {
+	"graph": _AddGraphEdges,
+	"time_directed_graph": _AddTimeDirectedEdges,
+	"time_directed_graph_no_supernodes": _AddTimeDirectedNoSuperNodesEdges
+}
+
+# The graph variants which merge parallel edges into the one with the largest weight.
+MAX_WEIGHT_GRAPHS = ["time_directed_graph_no_supernodes"]
+
+# Returns (synsets, super-node keys, words) of the graph variant |name|: the synsets it is built
+# from, and the keys and words which become its nodes.
+def _GetGraphNodes(wordnet, name):
+	if name not in _SYNSET_EDGES:
+		raise ValueError("unknown graph variant: {0}".format(name))
+	synsets = wordnet.synsets if name == "graph" else wordnet.synsets_directed
+	words = set()
+	for synset in synsets.values():
+		words.update(synset["words"])
+	return synsets, (synsets.keys() if name != "time_directed_graph_no_supernodes" else []), words
+
+# Adds the edges of the synsets with the given |keys| of the graph variant |name| to |edges|.
+def _AddSynsetEdges(wordnet, name, edges, synsets, keys, word_to_node):
+	add_edges = _SYNSET_EDGES[name]
+	# Years and time data flags by interned (word, pos) id, as lists for fast scalar access
+	years = wordnet.word_and_pos_years.tolist()
+	has_time_data = wordnet.word_and_pos_has_time_data.tolist()
+	for key in keys:
+		add_edges(wordnet, edges, key, synsets[key], word_to_node, years, has_time_data)
@@ -2,12 +2,15 @@ from snap import *
 
 import time
 from WordNet import WordNet
+from clustering_engine import GetAverageClusteringCoefficient
+from era_stats import AggregateByEra, GetEraMap
+from node_stats_engine import ComputeNodeStatistics
 import matplotlib.pyplot as plt
 import numpy as np
 from collections import defaultdict
 
 def __main__():
-	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt")
+	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", cache_dir="data/cache", graphs=["time_directed_graph_no_supernodes"])
 	
 	node_to_out_deg, node_to_in_deg = getGeneralStats(wordnet)
 
@@ -42,7 +45,10 @@ def getGeneralStats(wordnet):
 	plt.close()
 
 	print
+	# SNAP's whole-graph value counts the parallel edges of the multigraph; the per-node coefficients of the
+	# by-year stats (see clustering_engine.py) are those of the simple graph
 	print "Average Clustering Coefficient: {0}".format(GetClustCf(g))
+	print "Average Clustering Coefficient (simple graph): {0}".format(GetAverageClusteringCoefficient(wordnet.GetCSRGraph("time_directed_graph_no_supernodes")))
 	return node_to_out_deg, node_to_in_deg
 
 def getStatsByYear(node_to_out, node_to_in, wordnet, calc_btw_centr=True):
@@ -64,33 +70,10 @@ def getStatsByYear(node_to_out, node_to_in, wordnet, calc_btw_centr=True):
 		plotAndPrintYearData(decade_to_btw_centr, "Average Node Betweenness Centrality by Year")
 
 def getInAndOutAvgByDecade(wordnet, node_to_out, node_to_in):
-	word_node_ids = set(wordnet.node_to_word_directed_no_supernodes.keys())
-	min_decade = 600
-	max_decade = 2000
-	year = min_decade
-	decade_to_out_deg = {}
-	decade_to_in_deg = {}
-	while(year <= max_decade):
-		decade_to_out_deg[year] = []
-		decade_to_in_deg[year] = []
-		year += 10
-
-	for nId, out_deg in node_to_out.items():
-		word, year, decade = getWordAndDecade(nId, wordnet)
-		decade_to_out_deg[decade].append(out_deg)
-
-	for nId, in_deg in node_to_in.items():
-		word, year, decade = getWordAndDecade(nId, wordnet)
-		decade_to_in_deg[decade].append(in_deg)
-
-	out_res = {}
-	in_res = {}
-	for decade in decade_to_out_deg.keys():
-		avg_out = getListAvg(decade_to_out_deg[decade])
-		out_res[decade] = avg_out
-
-		avg_in = getListAvg(decade_to_in_deg[decade])
-		in_res[decade] = avg_in
+	# Node ids of the no-supernodes graph index the per-node arrays directly
+	years = wordnet.GetNodeYears()
+	out_res = GetEraMap(AggregateByEra(node_to_out.values(), years[node_to_out.keys()]))
+	in_res = GetEraMap(AggregateByEra(node_to_in.values(), years[node_to_in.keys()]))
 
 	print "dec to out:", out_res
 	print
@@ -98,75 +81,28 @@ def getInAndOutAvgByDecade(wordnet, node_to_out, node_to_in):
 	return out_res, in_res
 
 
-def getWordAndDecade(node_id, wordnet):
-	word = wordnet.node_to_word_directed_no_supernodes[node_id]
-	year = wordnet.word_to_date[word]
-	decade = year - year%10
-
-	return word, year, decade
-
-def getListAvg(list_of_values):
-	if len(list_of_values) == 0: return 0
-	return float(sum(list_of_values))/float(len(list_of_values))
-
-
 def getAveragesByDecade(wordnet, calculate_betweenness=False):
 	word_node_ids = set(wordnet.node_to_word_directed_no_supernodes.keys())
-	min_decade = 600
-	max_decade = 2000
-	year = min_decade
-	decade_to_cc = {}
-	decade_to_deg_centr = {}
-	decade_to_btw_centr = {}
-	decade_to_close_centr = {}
-	while(year <= max_decade):
-		decade_to_cc[year] = []
-		decade_to_deg_centr[year] = []
-		decade_to_btw_centr[year] = []
-		decade_to_close_centr[year] = []
-		year += 10
-
-	undir_graph_copy = ConvertGraph(PUNGraph, wordnet.time_directed_graph_no_supernodes)
-
-	for node in wordnet.time_directed_graph_no_supernodes.Nodes():
-		node_id = node.GetId()
-		if node_id not in word_node_ids: continue
-
-		word,year,decade = getWordAndDecade(node_id, wordnet)
-
-		close_centr = GetClosenessCentr(wordnet.time_directed_graph_no_supernodes, node_id, True, True)
-		cc = GetNodeClustCf(wordnet.time_directed_graph_no_supernodes, node_id)
-		deg_centr = GetDegreeCentr(undir_graph_copy, node_id)
-		
-		decade_to_close_centr[decade].append(close_centr)
-		decade_to_deg_centr[decade].append(deg_centr)
-		decade_to_cc[decade].append(cc)
+	csr = wordnet.GetCSRGraph("time_directed_graph_no_supernodes")
+	word_indices = csr.GetWordIndices()
+	node_years = wordnet.GetNodeYears("time_directed_graph_no_supernodes")[word_indices]
+
+	# Degrees, degree centrality, clustering and closeness of every word node in one pass (see node_stats_engine.py)
+	node_stats = ComputeNodeStatistics(csr, word_indices, verbose=True)[word_indices]
+
+	# Per-decade averages of every statistic (0 for decades without words, see era_stats.py)
+	decade_to_cc = GetEraMap(AggregateByEra(node_stats["clustering"], node_years))
+	decade_to_deg_centr = GetEraMap(AggregateByEra(node_stats["degree_centrality"], node_years))
+	decade_to_close_centr = GetEraMap(AggregateByEra(node_stats["closeness"], node_years))
+	decade_to_btw_centr = {decade: [] for decade in decade_to_cc.keys()}
 
 	if calculate_betweenness:
 		nodes = TIntFltH()
 		edges = TIntPrFltH()
 		GetBetweennessCentr(wordnet.time_directed_graph_no_supernodes, nodes, edges, 1, True)
-		for node_id in nodes:
-			if node_id not in word_node_ids: continue
-			btw_centr = nodes[node_id]
-
-			word,year,decade = getWordAndDecade(node_id, wordnet)
-
-			decade_to_btw_centr[decade].append(btw_centr)
-
-	for decade in decade_to_cc.keys():
-		avg_cc = getListAvg(decade_to_cc[decade])
-		decade_to_cc[decade] = avg_cc
-
-		avg_close_centr = getListAvg(decade_to_close_centr[decade])
-		decade_to_close_centr[decade] = avg_close_centr
-
-		avg_deg_centr = getListAvg(decade_to_deg_centr[decade])
-		decade_to_deg_centr[decade] = avg_deg_centr
-
-		if calculate_betweenness:
-			avg_btw_centr = getListAvg(decade_to_btw_centr[decade])
-			decade_to_btw_centr[decade] = avg_btw_centr
+		btw_node_ids = [node_id for node_id in nodes if node_id in word_node_ids]
+		btw_centrs = [nodes[node_id] for node_id in btw_node_ids]
+		decade_to_btw_centr = GetEraMap(AggregateByEra(btw_centrs, wordnet.GetNodeYears()[btw_node_ids]))
 
 	print "cc ", decade_to_cc
 	print 
@@ -191,18 +127,8 @@ def plotAndPrintYearData(decade_to_avg, title):
 	plt.close()
 
 def getWordsPerDecade(wordnet):
-	min_decade = 600
-	max_decade = 2000
-	year = min_decade
-	decade_to_words= {}
-	while(year <= max_decade):
-		decade_to_words[year] = 0
-		year += 10
-	for word in wordnet.all_words_directed:
-		year = wordnet.word_to_date[word]
-		decade = year - year%10
-		decade_to_words[decade] += 1
-	return decade_to_words
+	word_years = wordnet.GetNodeYears("time_directed_graph_no_supernodes")
+	return GetEraMap(AggregateByEra(np.ones(len(word_years)), word_years), "count")
 
 def GetDegreeDistribution(graph):
 	node_to_out_deg = defaultdict(float)
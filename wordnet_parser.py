@@ -0,0 +1,206 @@
+import numpy as np
+
+from parallel import RunParallel
+
+'''
+Streaming parser for the WordNet data.* files. Synsets come out of generators one line at a time
+as compact records (classes with __slots__ instead of one dict per synset and per pointer), so no
+file is ever held in memory as a whole and the synset maps can be filled one POS file at a time.
+The records still support synset["words"] style access, so code written against the old dict
+representation keeps working.
+'''
+
+'''
+A pointer from one synset (or one of its words) to another:
+	1. symbol = the WordNet pointer symbol (e.g. "@" for hypernyms).
+	2. pos = the part of speech of the target synset.
+	3. connection = (source key, source word number, target key, target word number), where word
+	                numbers start at 1 and 0 means the synset itself.
+'''
+class Pointer(object):
+	__slots__ = ("symbol", "pos", "connection")
+
+	def __init__(self, symbol, pos, connection):
+		self.symbol = symbol
+		self.pos = pos
+		self.connection = connection
+
+	__getitem__ = object.__getattribute__
+
+	def __reduce__(self):
+		return (Pointer, (self.symbol, self.pos, self.connection))
+
+'''
+A single synset:
+	1. synset_type = the part of speech of synset.
+	2. words = tuple of the words in the synset.
+	3. pointers = list of pointers between this synset and others.
+	4. description = given description for the synset.
+	5. word_ids = tuple with the interned (word, pos) id of every word (see WordNet.word_and_pos_ids),
+	              or None until the synset has been added to a WordNet.
+'''
+class Synset(object):
+	__slots__ = ("synset_type", "words", "pointers", "description", "word_ids")
+
+	def __init__(self, synset_type, words, pointers, description, word_ids=None):
+		self.synset_type = synset_type
+		self.words = words
+		self.pointers = pointers
+		self.description = description
+		self.word_ids = word_ids
+
+	# record["name"] is record.name, without a Python level call.
+	__getitem__ = object.__getattribute__
+	__setitem__ = object.__setattr__
+
+	def __reduce__(self):
+		return (Synset, (self.synset_type, self.words, self.pointers, self.description, self.word_ids))
+
+'''
+Yields the synset lines of a data.* file, skipping the license agreement at its beginning (the
+lines starting with two spaces).
+'''
+def IterSynsetLines(filename):
+	with open(filename, 'r') as file:
+		for line in file:
+			if line[0:2] != "  ":
+				yield line
+				break
+		for line in file:
+			yield line
+
+'''
+Splits a single line of a data file into (key, synset type, words, pointers, description), where
+pointers is a list of (symbol, pos, connection) tuples. Keys are the synset offsets shifted by
+|pos_offsets| (a map from part of speech to offset) so that keys of different files never clash.
+'''
+def SplitSynsetLine(line, pos_offsets):
+	line = line.split(' ')
+	synset_type = line[2]
+	key = int(line[0]) + pos_offsets[synset_type]
+
+	word_count = int(line[3], 16)
+	word_start_index = 4
+	pointer_count = int(line[word_start_index + 2 * word_count])
+	pointer_start_index = word_start_index + 2 * word_count + 1
+
+	words = tuple(line[word_start_index:word_start_index + 2 * word_count:2])
+
+	pointers = []
+	for index in range(pointer_start_index, pointer_start_index + 4 * pointer_count, 4):
+		src = int(line[index+3][0:2], 16)
+		dst = int(line[index+3][2:], 16)
+		pos = line[index+2]
+		dst_key = int(line[index+1]) + pos_offsets[pos]
+		pointers.append((line[index], pos, (key, src, dst_key, dst)))
+
+	description = " ".join(line[line.index("|")+1:]).strip()
+
+	return key, synset_type, words, pointers, description
+
+'''
+Converts a single line of a data file into (key, Synset).
+'''
+def ParseSynsetLine(line, pos_offsets):
+	key, synset_type, words, pointers, description = SplitSynsetLine(line, pos_offsets)
+	return key, Synset(synset_type, words, [Pointer(*pointer) for pointer in pointers], description)
+
+'''
+Yields (key, Synset) for every synset in the given data.* files, one file after another.
+'''
+def IterSynsets(filenames, pos_offsets):
+	for filename in filenames:
+		for line in IterSynsetLines(filename):
+			yield ParseSynsetLine(line, pos_offsets)
+
+'''
+The synsets of one data.* file in columnar form, which is how worker processes hand parsed files
+back to the parent: a few arrays and strings pickle far faster and smaller than one record per
+synset and pointer. Contains the following instance variables:
+	1. keys = int64 array with the key of every synset
+	2. synset_types = the part of speech of every synset, one character each
+	3. word_counts = int32 array with the number of words in every synset
+	4. words = the words of all synsets, separated by spaces
+	5. pointer_counts = int32 array with the number of pointers of every synset
+	6. pointer_symbols = the symbols of all pointers, separated by spaces
+	7. pointer_pos = the part of speech of the target of every pointer, one character each
+	8. connections = int64 array with one (source key, source word, target key, target word) row
+	                 per pointer
+	9. descriptions = the descriptions of all synsets, separated by newlines
+'''
+class SynsetArrays:
+
+	def __init__(self, keys, synset_types, word_counts, words, pointer_counts, pointer_symbols, pointer_pos,
+	             connections, descriptions):
+		self.keys = keys
+		self.synset_types = synset_types
+		self.word_counts = word_counts
+		self.words = words
+		self.pointer_counts = pointer_counts
+		self.pointer_symbols = pointer_symbols
+		self.pointer_pos = pointer_pos
+		self.connections = connections
+		self.descriptions = descriptions
+
+	'''
+	Yields (key, Synset) for every synset, in file order.
+	'''
+	def IterSynsets(self):
+		words = self.words.split(' ') if len(self.words) > 0 else []
+		symbols = self.pointer_symbols.split(' ') if len(self.pointer_symbols) > 0 else []
+		connections = [tuple(connection) for connection in self.connections.tolist()]
+		descriptions = self.descriptions.split('\n')
+		word_counts = self.word_counts.tolist()
+		pointer_counts = self.pointer_counts.tolist()
+
+		word_index = 0
+		pointer_index = 0
+		for index, key in enumerate(self.keys.tolist()):
+			word_count = word_counts[index]
+			pointer_count = pointer_counts[index]
+			pointers = [Pointer(symbols[i], self.pointer_pos[i], connections[i])
+			            for i in range(pointer_index, pointer_index + pointer_count)]
+			yield key, Synset(self.synset_types[index], tuple(words[word_index:word_index + word_count]), pointers,
+			                  descriptions[index])
+			word_index += word_count
+			pointer_index += pointer_count
+
+'''
+Parses a whole data.* file into SynsetArrays.
+'''
+def ParseSynsetFile(filename, pos_offsets):
+	keys, synset_types, word_counts, words = [], [], [], []
+	pointer_counts, pointer_symbols, pointer_pos, connections, descriptions = [], [], [], [], []
+	for line in IterSynsetLines(filename):
+		key, synset_type, synset_words, pointers, description = SplitSynsetLine(line, pos_offsets)
+		keys.append(key)
+		synset_types.append(synset_type)
+		word_counts.append(len(synset_words))
+		words.extend(synset_words)
+		pointer_counts.append(len(pointers))
+		for symbol, pos, connection in pointers:
+			pointer_symbols.append(symbol)
+			pointer_pos.append(pos)
+			connections.append(connection)
+		descriptions.append(description)
+
+	return SynsetArrays(np.array(keys, dtype=np.int64), "".join(synset_types), np.array(word_counts, dtype=np.int32),
+	                    " ".join(words), np.array(pointer_counts, dtype=np.int32), " ".join(pointer_symbols),
+	                    "".join(pointer_pos), np.array(connections, dtype=np.int64).reshape(-1, 4),
+	                    "\n".join(descriptions))
+
+def _ParseSynsetFileRange(shared, start, end):
+	filenames, pos_offsets = shared
+	return [ParseSynsetFile(filename, pos_offsets) for filename in filenames[start:end]]
+
+'''
+Yields the same (key, Synset) pairs as IterSynsets, but every file is parsed in its own worker
+process (up to |processes| at once, see parallel.py). The parsed files are then merged in the
+parent in the given file order.
+'''
+def IterSynsetsParallel(filenames, pos_offsets, processes=None):
+	filenames = list(filenames)
+	for file_arrays in RunParallel(_ParseSynsetFileRange, (filenames, pos_offsets), len(filenames), processes, chunk_size=1):
+		for arrays in file_arrays:
+			for key, synset in arrays.IterSynsets():
+				yield key, synset
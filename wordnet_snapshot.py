@@ -0,0 +1,138 @@
+from snap import *
+
+import cPickle as pickle
+import gc
+import hashlib
+import os
+import shutil
+import tempfile
+
+'''
+Persistent snapshots of built WordNet instances. A snapshot is a directory holding a pickle of every
+plain instance variable (synsets, time maps, ...) and, for every graph variant that has been built,
+the SNAP binary file of the graph together with a pickle of its node/word maps. Graph variants are
+stored and loaded one at a time, so a snapshot only ever pays for the graphs that were asked for and
+can gain the others later. Snapshots are keyed by a hash of the input files and the null-model
+flag, so a change to any data.* file or to the time data file results in a fresh build.
+'''
+
+# Bump whenever the layout of the pickled instance state, or the graphs cached in it, change.
+SNAPSHOT_VERSION = 11
+
+SNAPSHOT_GRAPHS = ["graph", "time_directed_graph", "time_directed_graph_no_supernodes"]
+STATE_FILENAME = "state.pkl"
+
+'''
+Returns the hex digest identifying a WordNet built from the given data.* files and time data file
+(both names and contents are hashed) with the given null-model flag and, for null models, seed.
+'''
+def GetSnapshotKey(filenames, time_data_file, is_null_model, null_model_seed=None):
+	digest = hashlib.sha1()
+	digest.update("version={0};null={1};".format(SNAPSHOT_VERSION, bool(is_null_model)))
+	if is_null_model: digest.update("seed={0};".format(null_model_seed))
+	for filename in list(filenames) + [time_data_file]:
+		digest.update(os.path.basename(filename) + ";")
+		with open(filename, 'rb') as file:
+			for block in iter(lambda: file.read(1 << 20), ""):
+				digest.update(block)
+	return digest.hexdigest()
+
+'''
+Returns the directory in which the snapshot with the given key lives.
+'''
+def GetSnapshotDirectory(cache_dir, key):
+	return os.path.join(cache_dir, "wordnet-" + key)
+
+def _GetGraphAttributes(wordnet):
+	graph_attributes = set()
+	for attributes in wordnet.GRAPH_ATTRIBUTES.values():
+		graph_attributes.update(attributes)
+	return graph_attributes
+
+'''
+Writes the given WordNet to |directory|, including every graph variant built so far but none of
+its TRANSIENT_ATTRIBUTES. The snapshot is assembled in a temporary directory and then renamed into
+place so that a crash never leaves a half-written snapshot behind.
+'''
+def SaveSnapshot(wordnet, directory):
+	parent = os.path.dirname(os.path.abspath(directory))
+	if not os.path.isdir(parent):
+		os.makedirs(parent)
+
+	temp_directory = tempfile.mkdtemp(dir=parent)
+	try:
+		graph_attributes = _GetGraphAttributes(wordnet)
+		state = {}
+		for name, value in wordnet.__dict__.items():
+			if name in graph_attributes or name in wordnet.TRANSIENT_ATTRIBUTES: continue
+			state[name] = value
+		with open(os.path.join(temp_directory, STATE_FILENAME), 'wb') as file:
+			pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+
+		for name in SNAPSHOT_GRAPHS:
+			if name in wordnet.__dict__:
+				SaveSnapshotGraph(wordnet, temp_directory, name)
+
+		if os.path.isdir(directory):
+			shutil.rmtree(directory)
+		os.rename(temp_directory, directory)
+	except:
+		shutil.rmtree(temp_directory, ignore_errors=True)
+		raise
+
+'''
+Adds the graph variant with the given name (which must have been built) and its node/word maps to
+the snapshot in |directory|. Both files are written under temporary names and renamed into place,
+the map pickle last, so that a graph only counts as saved once both files are complete.
+'''
+def SaveSnapshotGraph(wordnet, directory, name):
+	graph_filename = os.path.join(directory, name + ".graph")
+	maps_filename = os.path.join(directory, name + ".pkl")
+
+	out = TFOut(graph_filename + ".tmp")
+	wordnet.__dict__[name].Save(out)
+	out.Flush()
+	del out
+	os.rename(graph_filename + ".tmp", graph_filename)
+
+	maps = {attribute: wordnet.__dict__[attribute] for attribute in wordnet.GRAPH_ATTRIBUTES[name] if attribute != name}
+	with open(maps_filename + ".tmp", 'wb') as file:
+		pickle.dump(maps, file, pickle.HIGHEST_PROTOCOL)
+	os.rename(maps_filename + ".tmp", maps_filename)
+
+'''
+Restores the plain instance variables of the WordNet snapshot stored in |directory| into the given
+(uninitialized) instance; graph variants are restored separately with LoadSnapshotGraph.
+Returns False if no snapshot exists there.
+'''
+def LoadSnapshot(wordnet, directory):
+	state_filename = os.path.join(directory, STATE_FILENAME)
+	if not os.path.isfile(state_filename):
+		return False
+
+	wordnet.__dict__.update(_LoadPickle(state_filename))
+	return True
+
+'''
+Restores the graph variant with the given name and its node/word maps from the snapshot in
+|directory|. Returns False if the snapshot does not hold that graph.
+'''
+def LoadSnapshotGraph(wordnet, directory, name):
+	graph_filename = os.path.join(directory, name + ".graph")
+	maps_filename = os.path.join(directory, name + ".pkl")
+	if not os.path.isfile(maps_filename) or not os.path.isfile(graph_filename):
+		return False
+
+	wordnet.__dict__.update(_LoadPickle(maps_filename))
+	wordnet.__dict__[name] = TNEANet.Load(TFIn(graph_filename))
+	return True
+
+def _LoadPickle(filename):
+	# Unpickling allocates millions of small containers; pausing the cyclic garbage collector
+	# roughly halves the load time.
+	gc.disable()
+	try:
+		with open(filename, 'rb') as file:
+			return pickle.load(file)
+	finally:
+		gc.enable()
@@ -2,11 +2,14 @@ from snap import *
 
 import time
 from WordNet import WordNet
+from clustering_engine import GetAverageClusteringCoefficient
+from era_stats import AggregateByEra, GetEraMap
+from node_stats_engine import ComputeNodeStatistics
 import matplotlib.pyplot as plt
 import numpy as np
 
 def __main__():
-	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt")
+	wordnet = WordNet(["data/dict/data.noun", "data/dict/data.verb", "data/dict/data.adj", "data/dict/data.adv"], "data/word_to_year_formatted.txt", cache_dir="data/cache", graphs=["graph", "time_directed_graph"])
 	#getStatsForWordNetGraph(wordnet)
 	print
 	getStatsForDirectedGraph(wordnet)
@@ -27,7 +30,10 @@ def getStatsForWordNetGraph(wordnet):
 	plt.xscale('log'); plt.yscale('log');
 	plt.show()
 
+	# SNAP's whole-graph value counts the parallel edges of the multigraph; the per-node coefficients of the
+	# by-year stats (see clustering_engine.py) are those of the simple graph
 	print "Average Clustering Coefficient: {0}".format(GetClustCf(wordnet.graph))
+	print "Average Clustering Coefficient (simple graph): {0}".format(GetAverageClusteringCoefficient(wordnet.GetCSRGraph("graph")))
 
 def getStatsForDirectedGraph(wordnet):
 	print "Directed WordNet graph stats:"
@@ -46,104 +52,40 @@ def getStatsForDirectedGraph(wordnet):
 	#plt.show()
 
 	print "Average Clustering Coefficient: {0}".format(GetClustCf(wordnet.time_directed_graph))
+	print "Average Clustering Coefficient (simple graph): {0}".format(GetAverageClusteringCoefficient(wordnet.GetCSRGraph("time_directed_graph")))
 	print
 
 	getStatsByYear(wordnet, calc_btw_centr=True)
 
-def getWordAndDecade(node_id, wordnet):
-	word = wordnet.node_to_word_directed[node_id]
-	year = wordnet.word_to_date[word]
-	decade = year - year%10
-
-	return word, decade
-
-def getListAvg(list_of_values):
-	if len(list_of_values) == 0: return 0
-	return float(sum(list_of_values))/float(len(list_of_values))
-
+# Returns the years of the nodes with the given SNAP |node_ids| in the time directed graph
+def getNodeYears(node_ids, wordnet):
+	csr = wordnet.GetCSRGraph("time_directed_graph")
+	return wordnet.GetNodeYears("time_directed_graph")[csr.GetIndices(np.array(node_ids))]
 
 def getAveragesByDecade(wordnet, calculate_betweenness=False):
 	word_node_ids = set(wordnet.node_to_word_directed.keys())
-	min_decade = 600
-	max_decade = 2000
-	year = min_decade
-	decade_to_out_deg = {}
-	decade_to_in_deg = {}
-	decade_to_cc = {}
-	decade_to_deg_centr = {}
-	decade_to_btw_centr = {}
-	decade_to_close_centr = {}
-	while(year <= max_decade):
-		decade_to_out_deg[year] = []
-		decade_to_in_deg[year] = []
-		decade_to_cc[year] = []
-		decade_to_deg_centr[year] = []
-		decade_to_btw_centr[year] = []
-		decade_to_close_centr[year] = []
-		year += 10
-
-	node_out_deg = TIntPrV()
-	GetNodeOutDegV(wordnet.time_directed_graph, node_out_deg)
-	undir_graph_copy = ConvertGraph(PUNGraph, wordnet.time_directed_graph)
-
-	for item in node_out_deg:
-		node_id = item.GetVal1()
-		out_deg = item.GetVal2()
-		if node_id not in word_node_ids: continue
-
-		word,decade = getWordAndDecade(node_id, wordnet)
-
-		close_centr = GetClosenessCentr(wordnet.time_directed_graph, node_id, True, True)
-		cc = GetNodeClustCf(wordnet.time_directed_graph, node_id)
-		deg_centr = GetDegreeCentr(undir_graph_copy, node_id)
-		
-		decade_to_out_deg[decade].append(out_deg)
-		decade_to_close_centr[decade].append(close_centr)
-		decade_to_deg_centr[decade].append(deg_centr)
-		decade_to_cc[decade].append(cc)
-
-	node_in_deg = TIntPrV()
-	GetNodeInDegV(wordnet.time_directed_graph, node_in_deg)
-	for item in node_in_deg:
-		node_id = item.GetVal1()
-		in_deg = item.GetVal2()
-		if node_id not in word_node_ids: continue
-
-		word,decade = getWordAndDecade(node_id, wordnet)
-	
-		decade_to_in_deg[decade].append(in_deg)
+	csr = wordnet.GetCSRGraph("time_directed_graph")
+	word_indices = csr.GetWordIndices()
+	node_years = wordnet.GetNodeYears("time_directed_graph")[word_indices]
+
+	# Degrees, degree centrality, clustering and closeness of every word node in one pass (see node_stats_engine.py)
+	node_stats = ComputeNodeStatistics(csr, word_indices, verbose=True)[word_indices]
+
+	# Per-decade averages of every statistic (0 for decades without words, see era_stats.py)
+	decade_to_in_deg = GetEraMap(AggregateByEra(node_stats["in_degree"], node_years))
+	decade_to_out_deg = GetEraMap(AggregateByEra(node_stats["out_degree"], node_years))
+	decade_to_cc = GetEraMap(AggregateByEra(node_stats["clustering"], node_years))
+	decade_to_deg_centr = GetEraMap(AggregateByEra(node_stats["degree_centrality"], node_years))
+	decade_to_close_centr = GetEraMap(AggregateByEra(node_stats["closeness"], node_years))
+	decade_to_btw_centr = {decade: [] for decade in decade_to_cc.keys()}
 
 	if calculate_betweenness:
 		nodes = TIntFltH()
 		edges = TIntPrFltH()
 		GetBetweennessCentr(wordnet.time_directed_graph, nodes, edges, 1, True)
-		for node_id in nodes:
-			if node_id not in word_node_ids: continue
-			btw_centr = nodes[node_id]
-
-			word,decade = getWordAndDecade(node_id, wordnet)
-
-			decade_to_btw_centr[decade].append(btw_centr)
-
-	for decade in decade_to_out_deg.keys():
-		avg_in_deg = getListAvg(decade_to_in_deg[decade])
-		decade_to_in_deg[decade] = avg_in_deg
-
-		avg_out_deg = getListAvg(decade_to_out_deg[decade])
-		decade_to_out_deg[decade] = avg_out_deg
-
-		avg_cc = getListAvg(decade_to_cc[decade])
-		decade_to_cc[decade] = avg_cc
-
-		avg_close_centr = getListAvg(decade_to_close_centr[decade])
-		decade_to_close_centr[decade] = avg_close_centr
-
-		avg_deg_centr = getListAvg(decade_to_deg_centr[decade])
-		decade_to_deg_centr[decade] = avg_deg_centr
-
-		if calculate_betweenness:
-			avg_btw_centr = getListAvg(decade_to_btw_centr[decade])
-			decade_to_btw_centr[decade] = avg_btw_centr
+		btw_node_ids = [node_id for node_id in nodes if node_id in word_node_ids]
+		btw_centrs = [nodes[node_id] for node_id in btw_node_ids]
+		decade_to_btw_centr = GetEraMap(AggregateByEra(btw_centrs, getNodeYears(btw_node_ids, wordnet)))
 
 	print "in-deg", decade_to_in_deg
 	print 
@@ -175,18 +117,8 @@ def plotAndPrintYearData(decade_to_avg, title):
 	plt.close()
 
 def getWordsPerDecade(wordnet):
-	min_decade = 600
-	max_decade = 2000
-	year = min_decade
-	decade_to_words= {}
-	while(year <= max_decade):
-		decade_to_words[year] = 0
-		year += 10
-	for word in wordnet.all_words_directed:
-		year = wordnet.word_to_date[word]
-		decade = year - year%10
-		decade_to_words[decade] += 1
-	return decade_to_words
+	word_years = wordnet.GetNodeYears("time_directed_graph")
+	return GetEraMap(AggregateByEra(np.ones(len(word_years)), word_years), "count")
 
 def getStatsByYear(wordnet, calc_btw_centr=False):
 	print "Directed WordNet graph stats by year:"